@@ -2,19 +2,43 @@ import axios from "axios";
 
 const API_BASE = "http://127.0.0.1:8001";
 
-export async function fetchMachines() {
-  const res = await axios.get(`${API_BASE}/machines`);
-  return res.data;
+const PAGE_SIZE = 200;
+
+// One page, newest first; `cursor` (undefined on the last page) fetches the
+// next. The table loads further pages on demand and takes later changes from
+// the live feed. Responses carry an ETag, so the browser revalidates
+// unchanged pages with If-None-Match and gets a 304.
+async function fetchPage(path: string, params: URLSearchParams, cursor?: string) {
+  const query = new URLSearchParams(params);
+  query.set("limit", String(PAGE_SIZE));
+  if (cursor) query.set("cursor", cursor);
+  const res = await axios.get(`${API_BASE}${path}?${query.toString()}`);
+  return { machines: res.data, cursor: res.headers["x-next-cursor"] as string | undefined };
+}
+
+export async function fetchMachines(cursor?: string) {
+  return fetchPage("/machines", new URLSearchParams(), cursor);
+}
+
+export interface MachineFilters {
+  os?: string;
+  outdated?: boolean;
+  unencrypted?: boolean;
+  noncompliant?: boolean;
 }
 
-export async function filterMachines(filters: { os?: string; outdated?: boolean; unencrypted?: boolean }) {
+// Query parameters shared by /machines/filter and /machines/stream.
+function filterParams(filters: MachineFilters) {
   const params = new URLSearchParams();
   if (filters.os) params.append("os", filters.os);
   if (filters.outdated !== undefined) params.append("outdated", String(filters.outdated));
   if (filters.unencrypted !== undefined) params.append("unencrypted", String(filters.unencrypted));
+  if (filters.noncompliant !== undefined) params.append("noncompliant", String(filters.noncompliant));
+  return params;
+}
 
-  const res = await axios.get(`${API_BASE}/machines/filter?${params.toString()}`);
-  return res.data;
+export async function filterMachines(filters: MachineFilters, cursor?: string) {
+  return fetchPage("/machines/filter", filterParams(filters), cursor);
 }
 
 export async function exportMachinesCSV() {
@@ -28,3 +52,25 @@ export async function exportMachinesCSV() {
   document.body.appendChild(link);
   link.click();
 }
+
+// Live per-machine changes matching `filters` from the backend's SSE feed.
+// `onLeave` is called with a machine that no longer matches them, and
+// `onResync` when many rows changed at once (a compliance policy was
+// re-applied) and the view should be reloaded. Returns a function that
+// closes the connection; EventSource reconnects on its own.
+export function subscribeMachines(
+  filters: MachineFilters,
+  onChange: (change: { machine_id: string } & Record<string, unknown>) => void,
+  onLeave: (machineId: string) => void,
+  onResync?: () => void,
+) {
+  const source = new EventSource(`${API_BASE}/machines/stream?${filterParams(filters).toString()}`);
+  source.addEventListener("machine", (event) => {
+    onChange(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener("leave", (event) => {
+    onLeave(JSON.parse((event as MessageEvent).data).machine_id);
+  });
+  if (onResync) source.addEventListener("resync", () => onResync());
+  return () => source.close();
+}
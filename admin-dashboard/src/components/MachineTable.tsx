@@ -3,7 +3,9 @@ import {
   fetchMachines,
   filterMachines,
   exportMachinesCSV,
+  subscribeMachines,
 } from "../api";
+import type { MachineFilters } from "../api";
 import {
   Table, TableBody, TableCell, TableContainer,
   TableHead, TableRow, Paper, Button, Select, MenuItem, Typography, Chip
@@ -18,31 +20,67 @@ interface Machine {
   disk_encryption?: any;
   os_update?: any;
   antivirus?: any;
+  encrypted?: boolean | null;
+  up_to_date?: boolean | null;
+  av_present?: boolean | null;
+  sleep_compliant?: boolean | null;
+  compliance_score?: number | null;
 }
 
 export default function MachineTable() {
   const [machines, setMachines] = useState<Machine[]>([]);
+  // The Select's value; it takes effect when Apply is clicked.
   const [osFilter, setOsFilter] = useState<string>("");
+  const [applied, setApplied] = useState<MachineFilters>({});
+  const [cursor, setCursor] = useState<string | undefined>();
   const [loading, setLoading] = useState(false);
 
-  const loadMachines = async () => {
+  const fetchPage = (filters: MachineFilters, after?: string) =>
+    Object.keys(filters).length ? filterMachines(filters, after) : fetchMachines(after);
+
+  const loadMachines = async (filters: MachineFilters) => {
     setLoading(true);
     try {
-      const data = await fetchMachines();
-      setMachines(data);
+      const page = await fetchPage(filters);
+      setMachines(page.machines);
+      setCursor(page.cursor);
     } finally {
       setLoading(false);
     }
   };
 
-  const applyFilter = async () => {
-    const data = await filterMachines({ os: osFilter });
-    setMachines(data);
+  const applyFilter = () => {
+    setApplied(osFilter ? { os: osFilter } : {});
+  };
+
+  // The next page on demand. Machines already shown came from the live feed
+  // after that page was cut, so their rows are newer; keep those.
+  const loadMore = async () => {
+    const page = await fetchPage(applied, cursor);
+    setMachines((current) => {
+      const shown = new Set(current.map((m) => m.machine_id));
+      return [...current, ...page.machines.filter((m: Machine) => !shown.has(m.machine_id))];
+    });
+    setCursor(page.cursor);
   };
 
+  // Reload and resubscribe only when a filter set is applied, not as the
+  // inputs change. Live changes are merged into the table instead of
+  // refetching the whole fleet; a row that stops matching is dropped.
   useEffect(() => {
-    loadMachines();
-  }, []);
+    loadMachines(applied);
+    return subscribeMachines(applied, (change) => {
+      setMachines((current) => {
+        const index = current.findIndex((m) => m.machine_id === change.machine_id);
+        if (index === -1) return [change as unknown as Machine, ...current];
+        const next = [...current];
+        next[index] = { ...next[index], ...change };
+        return next;
+      });
+    }, (machineId) => {
+      setMachines((current) => current.filter((m) => m.machine_id !== machineId));
+    }, () => loadMachines(applied));
+  }, [applied]);
 
   return (
     <Paper sx={{ padding: 2 }}>
@@ -90,14 +128,14 @@ export default function MachineTable() {
                   <TableCell>{m.arch}</TableCell>
                   <TableCell>{new Date(m.reported_at).toLocaleString()}</TableCell>
                   <TableCell>
-                    {m.disk_encryption?.status === "true" ? (
+                    {m.encrypted ? (
                       <Chip label="Encrypted" color="success" size="small" />
                     ) : (
                       <Chip label="Not Encrypted" color="error" size="small" />
                     )}
                   </TableCell>
                   <TableCell>
-                    {m.os_update?.up_to_date === "true" ? (
+                    {m.up_to_date ? (
                       <Chip label="Up-to-date" color="success" size="small" />
                     ) : (
                       <Chip label="Outdated" color="warning" size="small" />
@@ -109,6 +147,9 @@ export default function MachineTable() {
           </Table>
         </TableContainer>
       )}
+      {!loading && cursor && (
+        <Button sx={{ marginTop: 1 }} onClick={loadMore}>Load more</Button>
+      )}
     </Paper>
   );
 }
@@ -0,0 +1,117 @@
+"""
+Content-addressed raw command output.
+
+A check document refers to its raw output as `raw_sha256`, the SHA-256 of
+the output's canonical JSON text, instead of carrying it inline. The text
+is stored once per distinct output, zlib-compressed, in storage's
+raw_blobs table: thousands of machines printing the same `pmset -g` share
+one blob. Agents send the hash and upload the text only when an ingest
+response lists it under `missing_blobs`; inline output from older agents
+is moved out on ingest. Output no longer than a hash stays inline.
+"""
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+from storage import CHECK_COLUMNS
+
+INLINE_RAW_BYTES = 64
+MAX_BLOB_BYTES = 4 * 1024 * 1024
+# Hashes remembered as stored, so most reports never touch storage for them.
+KNOWN_CAPACITY = 50000
+
+
+def encode(value):
+    """Canonical text of a raw value; must match system_utility/blobs.py on agents."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def offload(row):
+    """
+    Replace large inline `raw` values in `row`'s check documents with their
+    hash, in place. Returns {sha256: text} for what was moved out.
+    """
+    moved = {}
+    for column in CHECK_COLUMNS:
+        doc = row.get(column)
+        if not isinstance(doc, dict) or "raw" not in doc:
+            continue
+        text = encode(doc["raw"])
+        if len(text.encode()) <= INLINE_RAW_BYTES:
+            continue
+        sha = digest(text)
+        moved[sha] = text
+        row[column] = {**{k: v for k, v in doc.items() if k != "raw"}, "raw_sha256": sha}
+    return moved
+
+
+def referenced(row):
+    """Blob hashes `row`'s check documents refer to."""
+    return {doc["raw_sha256"] for column in CHECK_COLUMNS
+            if isinstance(doc := row.get(column), dict) and isinstance(doc.get("raw_sha256"), str)}
+
+
+class BlobStore:
+    """Blob reads and writes through storage, with an LRU set of hashes known to be stored."""
+
+    def __init__(self, storage, capacity=KNOWN_CAPACITY):
+        self.storage = storage
+        self.capacity = capacity
+        self._known = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, hashes):
+        with self._lock:
+            for sha in hashes:
+                self._known[sha] = None
+                self._known.move_to_end(sha)
+            while len(self._known) > self.capacity:
+                self._known.popitem(last=False)
+
+    def unknown(self, hashes):
+        """The hashes not known to be stored; in memory only, cheap enough for the event loop."""
+        with self._lock:
+            return [sha for sha in hashes if sha not in self._known]
+
+    def missing(self, hashes):
+        """The hashes storage does not have; blocking."""
+        unknown = self.unknown(hashes)
+        if not unknown:
+            return []
+        present = self.storage.existing_blobs(unknown)
+        self._remember(present)
+        return sorted(set(unknown) - present)
+
+    def put(self, blobs):
+        """Store {sha256: text} not already known to be stored; blocking."""
+        new = {sha: blobs[sha] for sha in self.unknown(blobs)}
+        if not new:
+            return 0
+        self.storage.put_blobs([
+            {"sha256": sha, "size": len(data), "data": zlib.compress(data, 9)}
+            for sha, data in ((sha, text.encode()) for sha, text in new.items())
+        ])
+        self._remember(new)
+        return len(new)
+
+    def get_many(self, hashes):
+        """{sha256: raw value} for the stored blobs among `hashes`; blocking."""
+        return {sha: json.loads(zlib.decompress(data))
+                for sha, data in self.storage.get_blobs(list(hashes)).items()}
+
+    def hydrate(self, row):
+        """`row` with each `raw_sha256` reference replaced by the raw value it names."""
+        values = self.get_many(referenced(row))
+        hydrated = dict(row)
+        for column in CHECK_COLUMNS:
+            doc = row.get(column)
+            if isinstance(doc, dict) and doc.get("raw_sha256") in values:
+                hydrated[column] = {**{k: v for k, v in doc.items() if k != "raw_sha256"},
+                                    "raw": values[doc["raw_sha256"]]}
+        return hydrated
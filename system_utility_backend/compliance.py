@@ -0,0 +1,321 @@
+"""
+Typed compliance fields materialized from each report's check documents,
+and verdicts on them judged against the fleet's compliance policy.
+
+The fact columns (encrypted, up_to_date, av_present, sleep_compliant) hold
+what the agent reported, whatever the policy says. The verdict columns
+(encryption_ok, updates_ok, antivirus_ok, sleep_ok) and compliance_score
+hold whether that passes the policy.
+
+The policy is a JSON file (POLICY_FILE), re-read when it changes:
+
+    {"default": {"max_sleep_seconds": 900},
+     "systems": {"Linux": {"require_antivirus": false},
+                 "Windows": {"max_sleep_seconds": 300}}}
+
+OS entries win over the default, which wins over DEFAULT_SETTINGS; without
+a file the agents' own thresholds apply and verdicts match what they sent.
+Each OS group's settings are compiled once into one predicate per verdict
+column, and into the SQL that re-judges the stored fleet in a single
+statement when the policy changes (Storage.apply_policy).
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+
+from logs import get_logger
+
+log = get_logger("compliance")
+
+POLICY_FILE = os.environ.get("POLICY_FILE")
+RELOAD_CHECK_INTERVAL = 5.0
+# Worker 0 re-judges rows written by workers that had not reloaded the policy yet.
+SWEEP_INTERVAL = 300
+
+DEFAULT_SETTINGS = {
+    "require_encryption": True,
+    "require_updates": True,
+    "require_antivirus": True,
+    "max_sleep_seconds": 600,  # system_utility.checks.common.MAX_SLEEP_SECONDS
+}
+
+# Fact column -> (check document, the agent's own verdict key); None when
+# the check timed out or gave no verdict.
+FACTS = {
+    "encrypted": ("disk_encryption", "status"),
+    "up_to_date": ("os_update", "up_to_date"),
+    "av_present": ("antivirus", "present"),
+    "sleep_compliant": ("inactivity_sleep", "compliant"),
+}
+COMPLIANCE_COLUMNS = tuple(FACTS)
+
+# Verdict column -> (check document, the agent's own verdict key, policy setting).
+RULES = {
+    "encryption_ok": ("disk_encryption", "status", "require_encryption"),
+    "updates_ok": ("os_update", "up_to_date", "require_updates"),
+    "antivirus_ok": ("antivirus", "present", "require_antivirus"),
+    "sleep_ok": ("inactivity_sleep", "compliant", "max_sleep_seconds"),
+}
+VERDICT_COLUMNS = tuple(RULES)
+
+# Sleep timeouts as agents report them: Linux and Windows in seconds, macOS
+# as lists of pmset minutes.
+SLEEP_SECONDS_KEYS = ("sleep_ac_seconds", "sleep_dc_seconds")
+SLEEP_MINUTES_KEYS = ("sleep_values_minutes", "display_sleep_values_minutes")
+
+
+def _flag(value):
+    """Normalize the agent's True/False/None (or their string forms) to a bool or None."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, str):
+        return {"true": True, "false": False}.get(value.strip().lower())
+    if isinstance(value, (int, float)):
+        return bool(value)
+    return None
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _clean(settings):
+    """Keep only known settings of the right type; max_sleep_seconds may be null for no limit."""
+    if not isinstance(settings, dict):
+        return {}
+    cleaned = {}
+    for key, value in settings.items():
+        if key == "max_sleep_seconds":
+            if value is None or (_number(value) and math.isfinite(value) and value >= 0):
+                cleaned[key] = value
+        elif key in DEFAULT_SETTINGS and isinstance(value, bool):
+            cleaned[key] = value
+    return cleaned
+
+
+# ---------------- Predicates ----------------
+# Each takes a check document ({} when missing) and returns True, False or
+# None (unknown: timed out or no verdict), which counts against the score.
+
+def _required_rule(key, required):
+    if not required:
+        return lambda doc: True
+
+    def rule(doc):
+        return None if _flag(doc.get("timed_out")) else _flag(doc.get(key))
+    return rule
+
+
+def _sleep_rule(key, max_seconds):
+    if max_seconds is None:
+        return lambda doc: True
+
+    def rule(doc):
+        if _flag(doc.get("timed_out")):
+            return None
+        ac, dc = (doc.get(k) for k in SLEEP_SECONDS_KEYS)
+        if _number(ac) or _number(dc):
+            return _number(ac) and _number(dc) and ac <= max_seconds and dc <= max_seconds
+        minutes = [v for k in SLEEP_MINUTES_KEYS if isinstance(doc.get(k), list) for v in doc[k] if _number(v)]
+        if minutes:
+            return all(v * 60 <= max_seconds for v in minutes)
+        # No timeouts to judge (e.g. an older agent): trust its verdict.
+        return _flag(doc.get(key))
+    return rule
+
+
+# ---------------- The same rules as SQLite expressions ----------------
+# Check columns hold the documents as JSON text; booleans come out as 1/0.
+
+def _sql_flag(check, key):
+    path = f"'$.{key}'"
+    value = f"json_extract({check}, {path})"
+    return (f"(case json_type({check}, {path}) when 'true' then 1 when 'false' then 0 "
+            f"when 'integer' then {value} != 0 when 'real' then {value} != 0 "
+            f"when 'text' then (case lower(trim({value})) when 'true' then 1 when 'false' then 0 end) end)")
+
+
+def _sql_timed_out(check):
+    return f"coalesce({_sql_flag(check, 'timed_out')}, 0)"
+
+
+def _sql_required(check, key, required):
+    if not required:
+        return "1"
+    return f"(case when {_sql_timed_out(check)} then null else {_sql_flag(check, key)} end)"
+
+
+def _sql_sleep(check, key, max_seconds):
+    if max_seconds is None:
+        return "1"
+    limit = repr(max_seconds)
+    numeric = [f"json_type({check}, '$.{k}') in ('integer', 'real')" for k in SLEEP_SECONDS_KEYS]
+    within = [f"json_extract({check}, '$.{k}') <= {limit}" for k in SLEEP_SECONDS_KEYS]
+
+    def minutes(k, condition=""):
+        return (f"exists (select 1 from json_each({check}, '$.{k}') "
+                f"where json_type({check}, '$.{k}') = 'array' and type in ('integer', 'real'){condition})")
+    return (f"(case when {_sql_timed_out(check)} then null "
+            f"when {numeric[0]} or {numeric[1]} then coalesce({' and '.join([*numeric, *within])}, 0) "
+            f"when {' or '.join(minutes(k) for k in SLEEP_MINUTES_KEYS)} then "
+            + " and ".join(f"not {minutes(k, f' and value * 60 > {limit}')}" for k in SLEEP_MINUTES_KEYS)
+            + f" else {_sql_flag(check, key)} end)")
+
+
+def sqlite_facts():
+    """{fact column: SQLite expression} deriving it from the stored check documents."""
+    return {column: _sql_required(check, key, True) for column, (check, key) in FACTS.items()}
+
+
+class Policy:
+    """A policy document compiled per OS group into predicates and SQL."""
+
+    def __init__(self, doc=None):
+        doc = doc if isinstance(doc, dict) else {}
+        self.default = {**DEFAULT_SETTINGS, **_clean(doc.get("default"))}
+        systems = doc.get("systems") if isinstance(doc.get("systems"), dict) else {}
+        self.systems = {s: {**self.default, **_clean(settings)} for s, settings in systems.items()}
+        canonical = json.dumps(self.document(), sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode()).hexdigest()[:12]
+        self._compiled = {}
+
+    def document(self):
+        """The resolved settings of the default and of each OS group."""
+        return {"default": self.default, "systems": self.systems}
+
+    def settings(self, system):
+        return self.systems.get(system, self.default)
+
+    def rules(self, system):
+        """
+        {check: ((column, predicate), ...)} for `system`, compiled on first
+        use: the check's fact column, then its verdict column.
+        """
+        key = system if system in self.systems else None
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            settings = self.settings(system)
+            compiled = {check: [(column, _required_rule(verdict, True))] for column, (check, verdict) in FACTS.items()}
+            for column, (check, verdict, setting) in RULES.items():
+                compiled[check].append((column, _sleep_rule(verdict, settings[setting])
+                                        if setting == "max_sleep_seconds"
+                                        else _required_rule(verdict, settings[setting])))
+            self._compiled[key] = compiled
+        return compiled
+
+    def evaluate(self, row, changed=None):
+        """
+        The fact and verdict columns, compliance_score (0-100) and
+        policy_version for `row`. With `changed`, the columns a delta
+        replaced, only the rules reading a changed check run, as long as the
+        row's other verdicts are from this same policy; they are kept as
+        they are.
+        """
+        rules = self.rules(row.get("system"))
+        if changed is not None and row.get("policy_version") == self.version and "system" not in changed:
+            fields = {column: row.get(column) for column in (*COMPLIANCE_COLUMNS, *VERDICT_COLUMNS)}
+            checks = [check for check in changed if check in rules]
+        else:
+            fields, checks = {}, rules
+        for check in checks:
+            doc = row.get(check)
+            doc = doc if isinstance(doc, dict) else {}
+            for column, rule in rules[check]:
+                fields[column] = rule(doc)
+        passed = sum(1 for column in VERDICT_COLUMNS if fields[column] is True)
+        fields["compliance_score"] = round(100 * passed / len(VERDICT_COLUMNS))
+        fields["policy_version"] = self.version
+        return fields
+
+    def apply(self, row, changed=None):
+        return {**row, **self.evaluate(row, changed)}
+
+    def sqlite_columns(self):
+        """
+        {column: (SQLite expression, params)}: each verdict as one CASE over
+        the row's `system`, the OS groups' rules inlined. The fact columns
+        do not depend on the policy and are left alone.
+        """
+        def expr(settings, check, key, setting):
+            if setting == "max_sleep_seconds":
+                return _sql_sleep(check, key, settings[setting])
+            return _sql_required(check, key, settings[setting])
+
+        columns = {}
+        for column, (check, key, setting) in RULES.items():
+            default = expr(self.default, check, key, setting)
+            branches = [(s, expr(settings, check, key, setting)) for s, settings in self.systems.items()]
+            branches = [(s, e) for s, e in branches if e != default]
+            if not branches:
+                columns[column] = (default, [])
+                continue
+            sql = "(case system " + " ".join(f"when ? then {e}" for _, e in branches) + f" else {default} end)"
+            columns[column] = (sql, [s for s, _ in branches])
+        return columns
+
+
+class PolicyFile:
+    """The current Policy, re-read from `path` when the file changes; the defaults without one."""
+
+    def __init__(self, path=POLICY_FILE):
+        self.path = path
+        self.policy = Policy()
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _reload(self):
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        doc = {}
+        if mtime is not None:
+            try:
+                with open(self.path) as f:
+                    doc = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("policy file unreadable, keeping previous policy", extra={"error": str(e)})
+                return
+        policy = Policy(doc)
+        if policy.version != self.policy.version:
+            self.policy = policy
+            log.info("compliance policy loaded", extra={"version": policy.version, "systems": len(policy.systems)})
+
+    def current(self):
+        self._reload()
+        return self.policy
+
+
+async def policy_loop(policies, storage, applied=None, interval=RELOAD_CHECK_INTERVAL, sweep=SWEEP_INTERVAL):
+    """
+    Re-judge the stored fleet as soon as the policy changes, and every
+    `sweep` seconds for rows judged under an older one. `applied(policy,
+    rows)` is awaited after rows changed. Runs on worker 0.
+    """
+    version, swept_at = None, 0.0
+    while True:
+        try:
+            policy = policies.current()
+            now = time.monotonic()
+            if policy.version != version or now - swept_at >= sweep:
+                started = time.perf_counter()
+                updated = await asyncio.to_thread(storage.apply_policy, policy)
+                version, swept_at = policy.version, now
+                if updated:
+                    log.info("fleet re-judged", extra={"version": policy.version, "rows": updated,
+                                                       "seconds": round(time.perf_counter() - started, 3)})
+                    if applied is not None:
+                        await applied(policy, updated)
+        except Exception:
+            log.exception("policy re-evaluation failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,140 @@
+"""Streaming encoders for /machines/export: rows are paged out of storage and
+encoded chunk by chunk, so memory stays flat regardless of fleet size."""
+import csv
+import io
+import json
+
+from compliance import COMPLIANCE_COLUMNS, VERDICT_COLUMNS
+from storage import CHECK_COLUMNS, COLUMNS
+
+EXPORT_PAGE_SIZE = 1000
+DEFAULT_EXPORT_COLUMNS = ["machine_id", "system", "release", "arch", "reported_at"]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def iter_rows(storage, filters, columns, include_raw=False, page_size=EXPORT_PAGE_SIZE):
+    """Yield pages of rows, walking the (reported_at, machine_id) keyset."""
+    fields = list(dict.fromkeys([*columns, "reported_at", "machine_id"]))
+    after = None
+    while True:
+        page = storage.list_machines(filters, fields=fields, limit=page_size, after=after,
+                                     include_raw=include_raw)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1]["reported_at"], page[-1]["machine_id"])
+
+
+def _cell(row, column):
+    value = row.get(column)
+    return json.dumps(value) if column in CHECK_COLUMNS and value is not None else value
+
+
+def encode_csv(pages, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for page in pages:
+        for row in page:
+            writer.writerow([_cell(row, c) for c in columns])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def encode_ndjson(pages, columns):
+    for page in pages:
+        yield "".join(json.dumps({c: row.get(c) for c in columns}) + "\n" for row in page)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out whatever was written since the last take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _arrow_schema(pa, columns):
+    def arrow_type(column):
+        if column in COMPLIANCE_COLUMNS or column in VERDICT_COLUMNS:
+            return pa.bool_()
+        if column in ("compliance_score", "report_version"):
+            return pa.int64()
+        return pa.string()
+    return pa.schema([(c, arrow_type(c)) for c in columns])
+
+
+def encode_columnar(pages, columns, fmt):
+    """One Parquet row group / Arrow record batch per storage page."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, columns)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for page in pages:
+        batch = pa.RecordBatch.from_pydict({c: [_cell(r, c) for r in page] for c in columns}, schema=schema)
+        if fmt == "parquet":
+            writer.write_batch(batch, row_group_size=len(page))
+        else:
+            writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def columnar_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def parse_columns(columns):
+    """Validate `columns=`; unknown names are rejected with ValueError."""
+    if not columns:
+        return list(DEFAULT_EXPORT_COLUMNS)
+    names = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in names if c not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return names
+
+
+def stream(storage, filters, columns, fmt):
+    pages = iter_rows(storage, filters, columns)
+    if fmt == "csv":
+        return encode_csv(pages, columns)
+    if fmt == "ndjson":
+        return encode_ndjson(pages, columns)
+    return encode_columnar(pages, columns, fmt)
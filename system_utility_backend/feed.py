@@ -0,0 +1,112 @@
+"""In-process pub/sub that fans ingested machine changes out to live subscribers."""
+import asyncio
+import json
+
+from compliance import COMPLIANCE_COLUMNS, VERDICT_COLUMNS
+from storage import EQUALITY_FILTERS, strip_raw
+
+# Always sent with an event so filtered subscribers can match partial updates.
+MATCH_COLUMNS = ("system", *COMPLIANCE_COLUMNS, *VERDICT_COLUMNS, "compliance_score", "reported_at")
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def matches(row, filters):
+    """Evaluate /machines/filter style filters against one row."""
+    for column, value in filters.items():
+        if column in EQUALITY_FILTERS and row.get(column) != value:
+            return False
+        score = row.get("compliance_score")
+        if column == "min_score" and (score is None or score < value):
+            return False
+        if column == "max_score" and (score is None or score > value):
+            return False
+    return True
+
+
+class Subscription:
+    def __init__(self, filters):
+        self.filters = filters
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, event):
+        # A slow client loses its oldest events rather than stalling ingest.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class Broker:
+    """Publish per-machine change events; each subscriber gets the ones matching its filters."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.closed = False
+
+    def subscribe(self, filters):
+        sub = Subscription(filters)
+        self.subscribers.add(sub)
+        if self.closed:
+            sub.offer(None)
+        return sub
+
+    def close(self):
+        """End every stream (clients reconnect, elsewhere if this worker is draining)."""
+        self.closed = True
+        for sub in list(self.subscribers):
+            sub.offer(None)
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def resync(self, reason):
+        """Tell every subscriber that rows changed without per-machine events, so views reload."""
+        event = f"event: resync\ndata: {json.dumps(reason, default=str)}\n\n"
+        for sub in list(self.subscribers):
+            sub.offer(event)
+
+    def publish(self, row, changed=None, previous=None):
+        """
+        Announce a new state for `row["machine_id"]`. `changed` names the
+        columns that changed (a delta); None means the whole row is new.
+        `previous` holds the filterable columns of the machine's prior state
+        (None if it had none): subscribers it matched but `row` does not get
+        a `leave` event, so their views drop the machine.
+        """
+        if not self.subscribers:
+            return
+        columns = row.keys() if changed is None else set(changed) | set(MATCH_COLUMNS)
+        payload = strip_raw({c: row.get(c) for c in columns})
+        payload["machine_id"] = row.get("machine_id")
+        event = f"event: machine\ndata: {json.dumps(payload, default=str)}\n\n"
+        leave = f"event: leave\ndata: {json.dumps({'machine_id': row.get('machine_id')})}\n\n"
+        for sub in list(self.subscribers):
+            if matches(row, sub.filters):
+                sub.offer(event)
+            elif previous is not None and matches(previous, sub.filters):
+                sub.offer(leave)
+
+
+async def sse_events(request, broker, filters, heartbeat=15.0):
+    """
+    Server-Sent Events stream of matching `machine` changes, `leave` events
+    for machines that stopped matching, and fleet-wide `resync` notices,
+    with periodic keep-alive comments.
+    """
+    sub = broker.subscribe(filters)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                return
+            yield event
+    finally:
+        broker.unsubscribe(sub)
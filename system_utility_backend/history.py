@@ -0,0 +1,64 @@
+"""Per-check state transitions and the daily compliance rollups built from the fleet."""
+import asyncio
+import datetime
+
+from compliance import FACTS
+from logs import get_logger
+from storage import CHECK_COLUMNS
+
+log = get_logger("history")
+
+# Check document keys that are not part of a check's state.
+NON_STATE_KEYS = {"raw", "raw_sha256", "cached", "checked_at"}
+
+# Check name -> materialized fact column used by the rollups and fleet counters.
+CHECK_VERDICTS = {check: column for column, (check, _) in FACTS.items()}
+
+ROLLUP_INTERVAL = 600
+
+
+def check_state(doc):
+    if not isinstance(doc, dict):
+        return doc
+    return {k: v for k, v in doc.items() if k not in NON_STATE_KEYS}
+
+
+def transitions(previous, row):
+    """History entries for each check whose state differs from `previous` (None for a new machine)."""
+    entries = []
+    for check in CHECK_COLUMNS:
+        state = check_state(row.get(check))
+        if previous is not None and check_state(previous.get(check)) == state:
+            continue
+        if state is None and previous is None:
+            continue
+        entries.append({
+            "machine_id": row["machine_id"],
+            "check_name": check,
+            "changed_at": row.get("reported_at"),
+            "state": state,
+        })
+    return entries
+
+
+def rollup_rows(day, counts):
+    """Turn {(system, check): {"compliant": n, ...}} into compliance_daily rows for `day`."""
+    return [
+        {"day": day, "system": system or "Unknown", "check_name": check, **tally}
+        for (system, check), tally in counts.items()
+    ]
+
+
+def roll_up(storage, day=None):
+    day = day or datetime.datetime.utcnow().date().isoformat()
+    storage.upsert_rollups(rollup_rows(day, storage.compliance_counts(CHECK_VERDICTS)))
+
+
+async def rollup_loop(storage, interval=ROLLUP_INTERVAL):
+    """Refresh today's rollup periodically; past days stay as last computed."""
+    while True:
+        try:
+            await asyncio.to_thread(roll_up, storage)
+        except Exception:
+            log.exception("compliance rollup failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,137 @@
+"""
+Local pub/sub between the worker processes of one host.
+
+serve.py runs `serve_hub` in its own process on a Unix socket; every
+worker connects with a `Hub` and publishes what the others need to know
+(ingested rows for their live feeds and fleet counters, metrics
+snapshots). The hub relays each line to every other connected worker
+without decoding it. Delivery is best effort: a worker that falls behind
+loses messages rather than stalling the rest.
+"""
+import asyncio
+import os
+
+from logs import get_logger
+
+try:
+    import orjson
+
+    def _dumps(doc):
+        return orjson.dumps(doc, default=str)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(doc):
+        return json.dumps(doc, default=str, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+log = get_logger("hub")
+
+HUB_SOCKET = os.environ.get("BACKEND_HUB")
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# Bytes queued for one peer before messages to it are dropped.
+MAX_BACKLOG_BYTES = 32 * 1024 * 1024
+RECONNECT_DELAY = 1.0
+
+
+async def serve_hub(path):
+    """Relay every line a worker sends to all other connected workers."""
+    clients = {}  # writer -> messages dropped for it
+
+    async def relay(reader, writer):
+        clients[writer] = 0
+        try:
+            while line := await reader.readline():
+                for other in list(clients):
+                    if other is writer:
+                        continue
+                    if other.transport.get_write_buffer_size() > MAX_BACKLOG_BYTES:
+                        clients[other] += 1
+                        continue
+                    other.write(line)
+        except (OSError, ValueError) as e:
+            log.warning("hub client failed", extra={"error": str(e)})
+        finally:
+            dropped = clients.pop(writer, 0)
+            if dropped:
+                log.warning("hub client fell behind", extra={"dropped": dropped})
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(relay, path, limit=MAX_MESSAGE_BYTES)
+    async with server:
+        await server.serve_forever()
+
+
+class Hub:
+    """
+    A worker's connection to the hub. Messages from the other workers are
+    passed to the handler registered for their kind as handler(worker, data);
+    the connection is re-established if it drops.
+    """
+
+    def __init__(self, path, worker):
+        self.path, self.worker = path, worker
+        self.handlers = {}
+        self.dropped = 0
+        self._writer = None
+        self._task = None
+
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, kind, data):
+        """Queue a message for the other workers; dropped while disconnected or backlogged."""
+        writer = self._writer
+        if writer is None or writer.transport.get_write_buffer_size() > MAX_BACKLOG_BYTES:
+            self.dropped += 1
+            return
+        writer.write(_dumps({"kind": kind, "from": self.worker, "data": data}) + b"\n")
+
+    def _dispatch(self, line):
+        message = _loads(line)
+        handler = self.handlers.get(message.get("kind"))
+        if handler is not None:
+            handler(message.get("from"), message.get("data"))
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._writer = writer
+            try:
+                while line := await reader.readline():
+                    try:
+                        self._dispatch(line)
+                    except Exception:
+                        log.exception("hub message handler failed")
+            except (OSError, ValueError) as e:
+                log.warning("hub connection failed", extra={"error": str(e)})
+            finally:
+                self._writer = None
+                writer.close()
+            log.warning("hub connection lost, reconnecting")
+            await asyncio.sleep(RECONNECT_DELAY)
@@ -0,0 +1,152 @@
+"""Write-behind buffer that coalesces report rows and flushes them in bulk."""
+import asyncio
+import time
+
+from logs import get_logger
+
+log = get_logger("buffer")
+
+# Attempts stop() makes at writing what is left before giving up on it.
+STOP_ATTEMPTS = 3
+
+
+class BufferFull(Exception):
+    """Raised when the buffer stays full for longer than the caller will wait."""
+
+
+class WriteBuffer:
+    """
+    Collect rows keyed on `machine_id` and hand them to `flush_fn` in batches.
+
+    A newer row for a machine replaces the pending one, so a chatty agent
+    costs one write per flush. A flush happens when `max_rows` rows are
+    pending or `max_delay` seconds after the first pending row, whichever
+    comes first. `flush_fn` is blocking and runs in a worker thread so the
+    event loop is never held up by a storage round trip. Once `capacity`
+    rows are pending, `put` waits for a flush (backpressure) and raises
+    BufferFull after `put_timeout` seconds.
+    """
+
+    def __init__(self, flush_fn, max_rows=500, max_delay=0.5, capacity=20000, put_timeout=5.0):
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.pending = {}
+        self.inflight = {}
+        self._first_pending_at = None
+        self._wakeup = None
+        self._drained = None
+        self._stopping = None
+        self._task = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the worker and flush everything still pending. A flush in
+        flight is let finish (and requeues its rows if it fails) rather than
+        cancelled, so when this returns no worker thread is still writing.
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        for attempt in range(STOP_ATTEMPTS):
+            if not self.pending:
+                return
+            try:
+                await self._flush()
+            except Exception:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        if self.pending:
+            log.error("rows not written at shutdown", extra={"rows": len(self.pending)})
+
+    def get(self, machine_id):
+        """The not-yet-stored row for `machine_id`, if any."""
+        return self.pending.get(machine_id) or self.inflight.get(machine_id)
+
+    def unflushed(self):
+        """Rows accepted but not yet confirmed written."""
+        return [*self.inflight.values(), *self.pending.values()]
+
+    async def put(self, row):
+        await self.put_many([row])
+
+    async def put_many(self, rows):
+        deadline = time.monotonic() + self.put_timeout
+        for row in rows:
+            while len(self.pending) >= self.capacity and row["machine_id"] not in self.pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BufferFull(f"{len(self.pending)} rows waiting to be written")
+                self._drained.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(self._drained.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            self.pending[row["machine_id"]] = row
+            if self._first_pending_at is None:
+                # Let the worker start the max_delay clock for this batch.
+                self._first_pending_at = time.monotonic()
+                self._wakeup.set()
+        if len(self.pending) >= self.max_rows:
+            self._wakeup.set()
+
+    async def _flush(self):
+        batch, self.pending = self.pending, {}
+        self._first_pending_at = None
+        self.inflight = batch
+        try:
+            await asyncio.to_thread(self.flush_fn, list(batch.values()))
+        except BaseException as e:
+            # Also on cancellation: the rows were acknowledged, so they go
+            # back to pending rather than being dropped with `inflight`.
+            log.warning("bulk write failed, requeueing", extra={"rows": len(batch), "error": repr(e)})
+            # Keep rows that were not superseded while the flush was in flight.
+            for machine_id, row in batch.items():
+                self.pending.setdefault(machine_id, row)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            raise
+        finally:
+            self.inflight = {}
+            self._drained.set()
+
+    async def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            if self._first_pending_at is None:
+                timeout = None
+            else:
+                timeout = max(0.0, self._first_pending_at + self.max_delay - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self.pending or self._stopping.is_set():
+                continue
+            due = self._first_pending_at is not None and \
+                time.monotonic() - self._first_pending_at >= self.max_delay
+            backlogged = self._drained is not None and not self._drained.is_set()
+            if len(self.pending) < self.max_rows and not due and not backlogged:
+                continue
+            try:
+                await self._flush()
+                failures = 0
+            except Exception:
+                failures += 1
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), min(30.0, 0.5 * 2 ** failures))
+                except asyncio.TimeoutError:
+                    pass
@@ -0,0 +1,111 @@
+"""
+Structured, sampled, non-blocking logging.
+
+Records are handed to a queue on the calling thread and formatted as one
+JSON object per line by a listener thread, so request handlers never wait
+on stdout. Per-report events are guarded with `if sampled():` so only a
+LOG_SAMPLE_RATE fraction of them is even built; everything else is always
+logged.
+"""
+import atexit
+import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+try:
+    import orjson
+
+    def _dumps(doc):
+        return orjson.dumps(doc, default=str).decode()
+except ImportError:
+    import json
+
+    def _dumps(doc):
+        return json.dumps(doc, default=str, separators=(",", ":"))
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message"}
+
+_listener = None
+_direct = False
+_sample_rate = LOG_SAMPLE_RATE
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        doc.update({k: v for k, v in vars(record).items() if k not in _STANDARD})
+        if record.exc_text:
+            doc["exception"] = record.exc_text
+        return _dumps(doc)
+
+
+def sampled():
+    """True for a LOG_SAMPLE_RATE fraction of calls; checked before building a per-report record."""
+    return random.random() < _sample_rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only resolve the message (and traceback) here; JSON encoding and the
+        # write happen on the listener thread.
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure(stream=None, level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE, background=True):
+    """
+    Route the app's loggers through the queue; safe to call more than once.
+
+    Without `background` records are written on the calling thread instead,
+    for a process that must not start threads (the pre-fork master in
+    serve.py); a later background call replaces that setup.
+    """
+    global _listener, _sample_rate, _direct
+    _sample_rate = sample_rate
+    if _listener is not None or (_direct and not background):
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    if background:
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+        _listener.start()
+        handler = _QueueHandler(records)
+        atexit.register(shutdown)
+    else:
+        handler = output
+    _direct = not background
+
+    root = logging.getLogger("backend")
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    root.propagate = False
+
+
+def shutdown():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(f"backend.{name}")
@@ -0,0 +1,199 @@
+"""Prometheus text-format metrics: ingest latency, storage round trips and fleet check timings."""
+import bisect
+import threading
+import time
+
+from storage import CHECK_COLUMNS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond SQLite calls up to a check at its deadline.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self.values.items()]
+
+    def render(self, peers=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        values = dict(self.values)
+        for snapshot in peers:
+            for labels, value in snapshot.get(self.name, ()):
+                values[tuple(labels)] = values.get(tuple(labels), 0) + value
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """A value read at scrape time from `fn()`."""
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+
+    def snapshot(self):
+        return self.fn()
+
+    def render(self, peers=()):
+        value = self.fn() + sum(snapshot.get(self.name, 0) for snapshot in peers)
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self.series.items()]
+
+    def render(self, peers=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        merged = {labels: list(series) for labels, series in self.series.items()}
+        for snapshot in peers:
+            for labels, series in snapshot.get(self.name, ()):
+                mine = merged.get(tuple(labels))
+                merged[tuple(labels)] = series if mine is None else [a + b for a, b in zip(mine, series)]
+        for labels, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels((*self.label_names, 'le'), (*labels, le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """This process's values, JSON-serializable, for merging into another worker's render."""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, peers=()):
+        """Text exposition; `peers` are other workers' snapshots, added to the local values."""
+        return "\n".join(line for metric in self.metrics for line in metric.render(peers)) + "\n"
+
+
+registry = Registry()
+
+ingest_seconds = registry.register(Histogram(
+    "ingest_request_seconds", "Time to accept an ingest request.", labels=("endpoint", "status")))
+ingest_reports = registry.register(Counter(
+    "ingest_reports_total", "Machine reports accepted.", labels=("endpoint",)))
+storage_seconds = registry.register(Histogram(
+    "storage_call_seconds", "Storage round-trip time.", labels=("op",)))
+storage_errors = registry.register(Counter(
+    "storage_errors_total", "Storage calls that raised.", labels=("op",)))
+check_seconds = registry.register(Histogram(
+    "agent_check_seconds", "Per-check wall time reported by agents.", labels=("check", "system")))
+check_timeouts = registry.register(Counter(
+    "agent_check_timeouts_total", "Checks abandoned at their deadline on agents.", labels=("check", "system")))
+command_seconds = registry.register(Histogram(
+    "agent_command_seconds", "Wall time of commands run by agent checks.", labels=("check", "command")))
+
+
+# Label values come from agents; anything outside these sets is counted as
+# "other" so a buggy or hostile agent cannot grow the series without bound.
+KNOWN_SYSTEMS = frozenset({"Linux", "Darwin", "Windows"})
+# The commands agent checks run (argv[0] without its directory).
+KNOWN_COMMANDS = frozenset({
+    "apt", "dnf", "yum", "pacman", "zypper", "lsblk", "findmnt", "systemctl", "systemd-inhibit",
+    "gsettings", "xfconf-query", "hostname",
+    "fdesetup", "softwareupdate", "pmset", "system_profiler",
+    "powershell", "powercfg", "manage-bde", "wmic",
+})
+
+
+def _bounded(value, known):
+    return value if value in known else "other"
+
+
+def observe_timings(timings, system=None):
+    """Fold an agent report's `timings` section into the fleet-wide check histograms."""
+    if not isinstance(timings, dict):
+        return
+    system = _bounded(system, KNOWN_SYSTEMS) if system else "Unknown"
+    for check, entry in (timings.get("checks") or {}).items():
+        if not isinstance(entry, dict):
+            continue
+        check = _bounded(check, CHECK_COLUMNS)
+        if entry.get("timed_out"):
+            check_timeouts.inc(check, system)
+        elif isinstance(entry.get("ms"), (int, float)):
+            check_seconds.observe(entry["ms"] / 1000, check, system)
+        for command in entry.get("commands") or []:
+            if isinstance(command, dict) and isinstance(command.get("ms"), (int, float)):
+                command_seconds.observe(command["ms"] / 1000, check, _bounded(command.get("cmd"), KNOWN_COMMANDS))
+
+
+class TimedStorage:
+    """Proxy that times every public storage method into storage_call_seconds."""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with storage_seconds.time(name):
+                try:
+                    return attr(*args, **kwargs)
+                except Exception:
+                    storage_errors.inc(name)
+                    raise
+        return timed
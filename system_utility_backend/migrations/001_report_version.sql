@@ -0,0 +1,2 @@
+-- Version of the last report applied to each row; deltas only apply on top of it.
+alter table systems add column if not exists report_version integer;
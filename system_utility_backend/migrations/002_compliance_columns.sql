@@ -0,0 +1,27 @@
+-- Typed compliance verdicts materialized at ingest, so /machines/filter
+-- queries indexed columns instead of parsing the check JSON of every row.
+alter table systems add column if not exists encrypted boolean;
+alter table systems add column if not exists up_to_date boolean;
+alter table systems add column if not exists av_present boolean;
+alter table systems add column if not exists sleep_compliant boolean;
+alter table systems add column if not exists compliance_score smallint;
+
+update systems set
+    encrypted = (disk_encryption->>'status')::boolean,
+    up_to_date = (os_update->>'up_to_date')::boolean,
+    av_present = (antivirus->>'present')::boolean,
+    sleep_compliant = (inactivity_sleep->>'compliant')::boolean
+where encrypted is null and up_to_date is null and av_present is null and sleep_compliant is null;
+
+update systems set compliance_score = (
+    (coalesce(encrypted, false)::int + coalesce(up_to_date, false)::int
+     + coalesce(av_present, false)::int + coalesce(sleep_compliant, false)::int) * 25
+) where compliance_score is null;
+
+create index if not exists systems_system on systems(system);
+create index if not exists systems_reported_at on systems(reported_at desc);
+create index if not exists systems_encrypted on systems(encrypted, system);
+create index if not exists systems_up_to_date on systems(up_to_date, system);
+create index if not exists systems_av_present on systems(av_present, system);
+create index if not exists systems_sleep_compliant on systems(sleep_compliant, system);
+create index if not exists systems_compliance_score on systems(compliance_score);
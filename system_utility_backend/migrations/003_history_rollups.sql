@@ -0,0 +1,20 @@
+-- Append-only per-check state transitions (raw command output excluded).
+create table if not exists system_history (
+    id bigserial primary key,
+    machine_id text not null,
+    check_name text not null,
+    changed_at timestamptz,
+    state jsonb
+);
+create index if not exists system_history_machine on system_history(machine_id, changed_at desc);
+
+-- Per-day fleet compliance counts, refreshed by the backend's rollup task.
+create table if not exists compliance_daily (
+    day date not null,
+    system text not null,
+    check_name text not null,
+    compliant integer not null,
+    noncompliant integer not null,
+    unknown integer not null,
+    primary key (day, system, check_name)
+);
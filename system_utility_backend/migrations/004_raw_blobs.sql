@@ -0,0 +1,9 @@
+-- Distinct raw command outputs, zlib-compressed and base64 encoded, keyed on
+-- the SHA-256 of their canonical JSON text. Check documents in `systems`
+-- refer to them as raw_sha256.
+create table if not exists raw_blobs (
+    sha256 text primary key,
+    size integer not null,
+    data text not null,
+    created_at timestamptz not null default now()
+);
@@ -0,0 +1,87 @@
+-- Verdicts judged against the backend's compliance policy (compliance.py).
+-- policy_version records which policy a row's verdicts came from, so a
+-- policy change re-judges only rows from an older one, in one statement.
+-- judged_at is when that last rewrote the row; /machines ETags cover it.
+alter table systems add column if not exists policy_version text;
+alter table systems add column if not exists judged_at timestamp;
+create index if not exists systems_policy_version on systems(policy_version);
+create index if not exists systems_judged_at on systems(judged_at desc nulls last);
+
+-- The agent's True/False/None, or their string and number forms, as a boolean.
+create or replace function compliance_flag(value jsonb) returns boolean
+language sql immutable as $$
+    select case jsonb_typeof(value)
+        when 'boolean' then (value #>> '{}')::boolean
+        when 'number' then (value #>> '{}')::numeric <> 0
+        when 'string' then case lower(trim(value #>> '{}')) when 'true' then true when 'false' then false end
+    end
+$$;
+
+-- A required check passes on the agent's own verdict; null when it timed out.
+create or replace function compliance_required(doc jsonb, verdict text, required jsonb) returns boolean
+language sql immutable as $$
+    select case
+        when not coalesce(compliance_flag(required), true) then true
+        when coalesce(compliance_flag(doc->'timed_out'), false) then null
+        else compliance_flag(doc->verdict)
+    end
+$$;
+
+-- Sleep timeouts within max_seconds: Linux and Windows report seconds,
+-- macOS lists of minutes; otherwise the agent's verdict. A null limit passes.
+create or replace function compliance_sleep(doc jsonb, max_seconds numeric) returns boolean
+language sql immutable as $$
+    with minutes as (
+        select case when jsonb_typeof(v) = 'number' then (v #>> '{}')::numeric end as value
+        from jsonb_array_elements(
+            case when jsonb_typeof(doc->'sleep_values_minutes') = 'array'
+                 then doc->'sleep_values_minutes' else '[]'::jsonb end
+            || case when jsonb_typeof(doc->'display_sleep_values_minutes') = 'array'
+                    then doc->'display_sleep_values_minutes' else '[]'::jsonb end) as v
+    )
+    select case
+        when max_seconds is null then true
+        when coalesce(compliance_flag(doc->'timed_out'), false) then null
+        when jsonb_typeof(doc->'sleep_ac_seconds') = 'number' or jsonb_typeof(doc->'sleep_dc_seconds') = 'number' then
+            coalesce(case when jsonb_typeof(doc->'sleep_ac_seconds') = 'number'
+                          then (doc->>'sleep_ac_seconds')::numeric end <= max_seconds
+                     and case when jsonb_typeof(doc->'sleep_dc_seconds') = 'number'
+                              then (doc->>'sleep_dc_seconds')::numeric end <= max_seconds, false)
+        when exists (select 1 from minutes where value is not null) then
+            not exists (select 1 from minutes where value * 60 > max_seconds)
+        else compliance_flag(doc->'compliant')
+    end
+$$;
+
+-- Re-judge every row not yet judged under `version`. `policy` is
+-- Policy.document(): {"default": {...}, "systems": {"<system>": {...}}},
+-- every setting resolved. Returns the number of rows updated.
+create or replace function apply_compliance_policy(policy jsonb, version text) returns bigint
+language plpgsql as $$
+declare
+    updated bigint;
+begin
+    update systems s set
+        encrypted = v.encrypted,
+        up_to_date = v.up_to_date,
+        av_present = v.av_present,
+        sleep_compliant = v.sleep_compliant,
+        compliance_score = (coalesce(v.encrypted, false)::int + coalesce(v.up_to_date, false)::int
+                            + coalesce(v.av_present, false)::int + coalesce(v.sleep_compliant, false)::int) * 25,
+        policy_version = version,
+        judged_at = now() at time zone 'utc'
+    from (
+        select r.machine_id,
+               compliance_required(r.disk_encryption, 'status', p->'require_encryption') as encrypted,
+               compliance_required(r.os_update, 'up_to_date', p->'require_updates') as up_to_date,
+               compliance_required(r.antivirus, 'present', p->'require_antivirus') as av_present,
+               compliance_sleep(r.inactivity_sleep, (p->>'max_sleep_seconds')::numeric) as sleep_compliant
+        from systems r,
+             lateral (select coalesce(policy->'systems'->r.system, policy->'default') as p) settings
+        where r.policy_version is distinct from version
+    ) v
+    where s.machine_id = v.machine_id;
+    get diagnostics updated = row_count;
+    return updated;
+end
+$$;
@@ -0,0 +1,47 @@
+-- Policy verdicts get their own columns. 005 wrote them over the fact
+-- columns (encrypted, up_to_date, av_present, sleep_compliant), which hold
+-- what the agent reported and which /machines/filter, the fleet counters and
+-- the rollups read. Here the facts are derived from the check documents
+-- again and every row is left to be re-judged into the verdict columns.
+alter table systems add column if not exists encryption_ok boolean;
+alter table systems add column if not exists updates_ok boolean;
+alter table systems add column if not exists antivirus_ok boolean;
+alter table systems add column if not exists sleep_ok boolean;
+
+update systems set
+    encrypted = compliance_required(disk_encryption, 'status', 'true'),
+    up_to_date = compliance_required(os_update, 'up_to_date', 'true'),
+    av_present = compliance_required(antivirus, 'present', 'true'),
+    sleep_compliant = compliance_required(inactivity_sleep, 'compliant', 'true'),
+    policy_version = null;
+
+-- As in 005, but writing the verdict columns and leaving the facts alone.
+create or replace function apply_compliance_policy(policy jsonb, version text) returns bigint
+language plpgsql as $$
+declare
+    updated bigint;
+begin
+    update systems s set
+        encryption_ok = v.encryption_ok,
+        updates_ok = v.updates_ok,
+        antivirus_ok = v.antivirus_ok,
+        sleep_ok = v.sleep_ok,
+        compliance_score = (coalesce(v.encryption_ok, false)::int + coalesce(v.updates_ok, false)::int
+                            + coalesce(v.antivirus_ok, false)::int + coalesce(v.sleep_ok, false)::int) * 25,
+        policy_version = version,
+        judged_at = now() at time zone 'utc'
+    from (
+        select r.machine_id,
+               compliance_required(r.disk_encryption, 'status', p->'require_encryption') as encryption_ok,
+               compliance_required(r.os_update, 'up_to_date', p->'require_updates') as updates_ok,
+               compliance_required(r.antivirus, 'present', p->'require_antivirus') as antivirus_ok,
+               compliance_sleep(r.inactivity_sleep, (p->>'max_sleep_seconds')::numeric) as sleep_ok
+        from systems r,
+             lateral (select coalesce(policy->'systems'->r.system, policy->'default') as p) settings
+        where r.policy_version is distinct from version
+    ) v
+    where s.machine_id = v.machine_id;
+    get diagnostics updated = row_count;
+    return updated;
+end
+$$;
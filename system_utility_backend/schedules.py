@@ -0,0 +1,119 @@
+"""Per-check schedule overrides returned to agents in ingest responses."""
+import json
+import math
+import os
+import time
+
+from logs import get_logger
+
+log = get_logger("schedules")
+
+SCHEDULE_FILE = os.environ.get("SCHEDULE_FILE")
+# Keys an agent's scheduler understands (system_utility/schedule.py).
+POLICY_KEYS = ("interval", "min_interval", "max_interval", "jitter", "budget")
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+def _valid(key, value):
+    """Intervals are positive numbers, jitter a fraction in [0, 1); only budget may be null."""
+    if key == "budget" and value is None:
+        return True
+    if key not in POLICY_KEYS or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if not math.isfinite(value):
+        return False
+    return 0 <= value < 1 if key == "jitter" else value > 0
+
+
+def _clean(checks):
+    """Keep only {check: {known key: valid value}}."""
+    if not isinstance(checks, dict):
+        return {}
+    cleaned = {}
+    for check, policy in checks.items():
+        if not isinstance(policy, dict):
+            continue
+        keep = {k: v for k, v in policy.items() if _valid(k, v)}
+        if keep:
+            cleaned[check] = keep
+    return cleaned
+
+
+def _shape_problem(doc):
+    """Why `doc` is not {"default": {...}, "systems": {name: {...}}, "machines": {id: {...}}}; None if it is."""
+    if not isinstance(doc, dict):
+        return "expected a JSON object"
+    if doc.get("default") is not None and not isinstance(doc["default"], dict):
+        return "default must be an object"
+    for section in ("systems", "machines"):
+        entries = doc.get(section)
+        if entries is None:
+            continue
+        if not isinstance(entries, dict):
+            return f"{section} must be an object"
+        if not all(isinstance(checks, dict) for checks in entries.values()):
+            return f"each {section} entry must be an object"
+    return None
+
+
+def _merge(*layers):
+    merged = {}
+    for layer in layers:
+        for check, policy in layer.items():
+            merged[check] = {**merged.get(check, {}), **policy}
+    return merged
+
+
+class ScheduleOverrides:
+    """
+    Overrides read from a JSON file, re-read when it changes:
+
+        {"default": {"os_update": {"interval": 3600}},
+         "systems": {"Windows": {"os_update": {"budget": 10}}},
+         "machines": {"<machine_id>": {"antivirus": {"max_interval": 900}}}}
+
+    Machine entries win over OS entries, which win over the default.
+    """
+
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self.default, self.systems, self.machines = {}, {}, {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _reload(self):
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        doc = {}
+        if mtime is not None:
+            try:
+                with open(self.path) as f:
+                    doc = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("schedule file unreadable, keeping previous overrides", extra={"error": str(e)})
+                return
+        problem = _shape_problem(doc)
+        if problem:
+            log.warning("schedule file malformed, keeping previous overrides", extra={"error": problem})
+            return
+        self.default = _clean(doc.get("default"))
+        self.systems = {s: _clean(c) for s, c in (doc.get("systems") or {}).items()}
+        self.machines = {m: _clean(c) for m, c in (doc.get("machines") or {}).items()}
+        log.info("schedule overrides loaded", extra={"systems": len(self.systems), "machines": len(self.machines)})
+
+    def for_machine(self, system, machine_id):
+        """The overrides for one agent; {} means "use your own defaults". Never raises."""
+        try:
+            self._reload()
+        except Exception:
+            log.exception("schedule overrides reload failed, keeping previous overrides")
+        return _merge(self.default, self.systems.get(system, {}), self.machines.get(machine_id, {}))
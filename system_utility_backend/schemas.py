@@ -0,0 +1,81 @@
+"""Typed agent payloads, validated straight from the request bytes."""
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+try:
+    import orjson as _json
+except ImportError:  # orjson is optional; the stdlib decoder is slower but equivalent here
+    import json as _json
+
+__all__ = ["Report", "Delta", "BlobUpload", "decode_report", "decode_delta", "decode_batch", "decode_blobs",
+           "ValidationError"]
+
+# Check documents differ per OS, so they stay loosely typed; the fields the
+# backend reads (verdicts, timed_out) are pulled out by compliance.py.
+CheckDoc = Optional[Dict[str, Any]]
+
+
+class Report(BaseModel):
+    """A full report; unknown top-level fields are kept but not stored."""
+
+    model_config = ConfigDict(extra="allow")
+
+    machine_id: str = Field(min_length=1)
+    system: Optional[str] = None
+    release: Optional[str] = None
+    version: Optional[str] = None
+    arch: Optional[str] = None
+    checked_at: Optional[str] = None
+    checks: Dict[str, CheckDoc] = Field(default_factory=dict)
+    report_version: Optional[int] = None
+    timings: Optional[Dict[str, Any]] = None
+
+
+class Delta(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    machine_id: str = Field(min_length=1)
+    base_version: int
+    version: int
+    fields: Dict[str, Any] = Field(default_factory=dict)
+    checks: Dict[str, CheckDoc] = Field(default_factory=dict)
+    checked_at: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+
+
+class BlobUpload(BaseModel):
+    """Raw outputs an ingest response listed as missing: {sha256: canonical JSON text}."""
+
+    blobs: Dict[str, str]
+
+
+def decode_report(body: bytes) -> Report:
+    """Parse and validate in one pass in pydantic-core; raises ValidationError."""
+    return Report.model_validate_json(body)
+
+
+def decode_delta(body: bytes) -> Delta:
+    return Delta.model_validate_json(body)
+
+
+def decode_blobs(body: bytes) -> BlobUpload:
+    return BlobUpload.model_validate_json(body)
+
+
+def decode_batch(body: bytes):
+    """
+    A batch is a JSON list of reports or {"reports": [...]}. Returns the valid
+    reports and the number rejected; one bad item does not sink the batch.
+    """
+    data = _json.loads(body)
+    items = data.get("reports", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("expected a list of reports")
+    reports, rejected = [], 0
+    for item in items:
+        try:
+            reports.append(Report.model_validate(item))
+        except ValidationError:
+            rejected += 1
+    return reports, rejected
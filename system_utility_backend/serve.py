@@ -0,0 +1,178 @@
+"""
+Pre-fork production runner for the backend.
+
+    python serve.py [--host 0.0.0.0] [--port 8001] [--workers N] [--drain 5] [--graceful-timeout 30]
+
+The master binds the listening socket, forks the hub (hub.py) and N
+workers, and restarts any that exit. Each worker imports the app after the
+fork, so no storage connection or thread crosses it, and accepts on the
+inherited socket.
+
+On SIGTERM or SIGINT every worker drains: /ready answers 503 for --drain
+seconds while requests are still served, then uvicorn stops accepting,
+lets in-flight requests finish (up to --graceful-timeout) and the lifespan
+flushes the write buffer. A second signal skips what is left of the drain.
+
+`uvicorn main:app --reload` remains the way to run it in development.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+import logs
+
+log = logs.get_logger("serve")
+
+# A worker that exits sooner than this after starting is restarted after a pause.
+RESTART_BACKOFF = 1.0
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server whose first exit signal drains the app before shutting down."""
+
+    def __init__(self, config, app_module, drain_seconds):
+        super().__init__(config)
+        self.app_module, self.drain_seconds = app_module, drain_seconds
+        self.loop = None
+        self.draining = False
+
+    async def startup(self, sockets=None):
+        self.loop = asyncio.get_running_loop()
+        await super().startup(sockets=sockets)
+
+    def handle_exit(self, sig, frame):
+        if self.draining or self.loop is None:
+            # Stop now if still draining; a signal during shutdown forces it.
+            self.force_exit = self.should_exit
+            self.should_exit = True
+            return
+        self.draining = True
+        self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        self.app_module.drain()
+        self.loop.call_later(self.drain_seconds, setattr, self, "should_exit", True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--drain", type=float, default=float(os.environ.get("DRAIN_SECONDS", "5")),
+                        help="seconds /ready answers 503 before a stopping worker closes its listener")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="seconds in-flight requests get to finish once a worker stops accepting")
+    parser.add_argument("--log-level", default="warning", help="uvicorn's own log level")
+    return parser.parse_args(argv)
+
+
+def listen(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def fork(target, *args):
+    """Run target(*args) in a child process and return its pid."""
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 1
+    try:
+        os.setpgid(0, 0)  # a terminal's Ctrl-C goes to the master, which forwards it once
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        target(*args)
+        code = 0
+    except BaseException:
+        log.exception("child process failed", extra={"target": target.__name__})
+    finally:
+        logs.shutdown()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def run_hub(path):
+    import hub
+
+    asyncio.run(hub.serve_hub(path))
+
+
+def run_worker(sock, index, args):
+    os.environ["BACKEND_WORKER"] = str(index)
+    import main
+
+    config = uvicorn.Config(main.app, log_level=args.log_level, timeout_graceful_shutdown=args.graceful_timeout)
+    DrainingServer(config, main, args.drain).run(sockets=[sock])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The master forks for the whole of its life, so it must not start threads.
+    logs.configure(background=False)
+    sock = listen(args.host, args.port)
+    runtime = tempfile.mkdtemp(prefix="system-utility-backend-")
+    hub_path = os.path.join(runtime, "hub.sock")
+    os.environ["BACKEND_HUB"] = hub_path
+
+    hub_pid = fork(run_hub, hub_path)
+    workers = {}  # pid -> (index, started at)
+    for index in range(args.workers):
+        workers[fork(run_worker, sock, index, args)] = (index, time.monotonic())
+    log.info("serving", extra={"host": args.host, "port": args.port, "workers": args.workers})
+
+    stopping = []
+
+    def stop(sig, frame):
+        if not stopping:
+            log.info("draining workers", extra={"signal": signal.Signals(sig).name})
+        stopping.append(sig)
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        code = os.waitstatus_to_exitcode(status)
+        if pid == hub_pid:
+            log.warning("hub exited, restarting", extra={"code": code})
+            hub_pid = fork(run_hub, hub_path)
+            continue
+        index, started_at = workers.pop(pid, (None, 0.0))
+        if index is None or stopping:
+            continue
+        log.warning("worker exited, restarting", extra={"worker": index, "code": code})
+        if time.monotonic() - started_at < RESTART_BACKOFF:
+            time.sleep(RESTART_BACKOFF)
+        workers[fork(run_worker, sock, index, args)] = (index, time.monotonic())
+
+    os.kill(hub_pid, signal.SIGTERM)
+    os.waitpid(hub_pid, 0)
+    sock.close()
+    shutil.rmtree(runtime, ignore_errors=True)
+    log.info("stopped")
+
+
+if __name__ == "__main__":
+    main()
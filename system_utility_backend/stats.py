@@ -0,0 +1,128 @@
+"""In-memory fleet counters kept current by applying each report as a delta."""
+import asyncio
+import datetime
+
+from logs import get_logger
+from history import CHECK_VERDICTS
+
+log = get_logger("stats")
+
+RESYNC_INTERVAL = 900
+LOAD_PAGE_SIZE = 5000
+
+
+def _verdict(value):
+    return "unknown" if value is None else "compliant" if value else "noncompliant"
+
+
+def machine_key(row):
+    """The compact per-machine state the counters are derived from."""
+    return (row.get("system"), *(row.get(col) for col in CHECK_VERDICTS.values()))
+
+
+class FleetStats:
+    """
+    Counters by OS and by check verdict.
+
+    Only the compact state of each machine is remembered, so a report moves
+    one machine from its old buckets to its new ones and a summary never
+    needs a scan of the fleet. With each machine's compliance_score it is
+    also what the live feed matches a machine's previous state against.
+    """
+
+    def __init__(self):
+        self.machines = {}
+        self.scores = {}
+        self.by_os = {}
+        self.checks = {check: {"compliant": 0, "noncompliant": 0, "unknown": 0} for check in CHECK_VERDICTS}
+        self.by_os_checks = {}
+        self.fully_compliant = 0
+        self.synced_at = None
+        self._journal = None
+
+    def _count(self, key, sign):
+        system, verdicts = key[0], key[1:]
+        self.by_os[system] = self.by_os.get(system, 0) + sign
+        if not self.by_os[system]:
+            del self.by_os[system]
+        os_checks = self.by_os_checks.setdefault(
+            system, {check: {"compliant": 0, "noncompliant": 0, "unknown": 0} for check in CHECK_VERDICTS})
+        for check, value in zip(CHECK_VERDICTS, verdicts):
+            self.checks[check][_verdict(value)] += sign
+            os_checks[check][_verdict(value)] += sign
+        if system not in self.by_os:
+            del self.by_os_checks[system]
+        if all(v is True for v in verdicts):
+            self.fully_compliant += sign
+
+    def apply(self, row):
+        """Move `row`'s machine from its previous buckets to those of its new state."""
+        if self._journal is not None:
+            self._journal.append(row)
+        key = machine_key(row)
+        self.scores[row["machine_id"]] = row.get("compliance_score")
+        old = self.machines.get(row["machine_id"])
+        if old == key:
+            return
+        if old is not None:
+            self._count(old, -1)
+        self._count(key, +1)
+        self.machines[row["machine_id"]] = key
+
+    def previous(self, machine_id):
+        """The filterable columns of the machine's last known state; None for a machine not seen yet."""
+        key = self.machines.get(machine_id)
+        if key is None:
+            return None
+        return {"system": key[0], **dict(zip(CHECK_VERDICTS.values(), key[1:])),
+                "compliance_score": self.scores.get(machine_id)}
+
+    def summary(self):
+        return {
+            "total": len(self.machines),
+            "fully_compliant": self.fully_compliant,
+            "by_os": dict(self.by_os),
+            "checks": self.checks,
+            "by_os_checks": self.by_os_checks,
+            "synced_at": self.synced_at,
+        }
+
+    @staticmethod
+    def load(storage):
+        """Build counters from one paged bulk read of the projected columns."""
+        stats = FleetStats()
+        fields = ["system", *CHECK_VERDICTS.values(), "compliance_score"]
+        after = None
+        while True:
+            page = storage.list_machines(fields=fields, limit=LOAD_PAGE_SIZE, after=after)
+            for row in page:
+                stats.apply(row)
+            if len(page) < LOAD_PAGE_SIZE:
+                break
+            after = (page[-1]["reported_at"], page[-1]["machine_id"])
+        stats.synced_at = datetime.datetime.utcnow().isoformat()
+        return stats
+
+    async def resync(self, storage, unflushed=list):
+        """
+        Rebuild from storage as a safety net against drift. Rows not yet
+        written (`unflushed()`) and reports applied while the load runs are
+        replayed onto the new counts.
+        """
+        self._journal = []
+        try:
+            fresh = await asyncio.to_thread(FleetStats.load, storage)
+        finally:
+            journal, self._journal = self._journal, None
+        for row in [*unflushed(), *journal]:
+            fresh.apply(row)
+        self.__dict__.update(fresh.__dict__)
+
+
+async def resync_loop(stats, storage, unflushed=list, interval=RESYNC_INTERVAL):
+    while True:
+        try:
+            await stats.resync(storage, unflushed)
+        except Exception:
+            log.exception("fleet stats resync failed")
+        await asyncio.sleep(interval)
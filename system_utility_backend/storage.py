@@ -0,0 +1,609 @@
+"""Storage backends for the `systems` table."""
+import base64
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from compliance import COMPLIANCE_COLUMNS, VERDICT_COLUMNS, sqlite_facts
+
+CHECK_COLUMNS = ("disk_encryption", "os_update", "antivirus", "inactivity_sleep")
+HEADER_COLUMNS = ("system", "release", "version", "arch")
+COLUMNS = ("machine_id", *HEADER_COLUMNS, "checked_at", *CHECK_COLUMNS, "reported_at", "report_version",
+           *COMPLIANCE_COLUMNS, *VERDICT_COLUMNS, "compliance_score", "policy_version")
+
+# Filters understood by list_machines: exact matches on these columns plus
+# `min_score` / `max_score` bounds on compliance_score. All are ANDed.
+EQUALITY_FILTERS = ("system", *COMPLIANCE_COLUMNS)
+
+
+# Check document keys holding raw command output, inline or by reference (see blobs.py).
+RAW_KEYS = ("raw", "raw_sha256")
+
+
+def _newest(*stamps):
+    """The latest of some ISO timestamps (None when all are)."""
+    return max((s for s in stamps if s), default=None)
+
+
+def _postgrest_quote(value):
+    """`value` as a double-quoted PostgREST filter value, so `,` `.` `(` `)` and quotes stay literal."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def strip_raw(row):
+    """Copy of `row` with the raw command output removed from each check document."""
+    return {
+        k: {ck: cv for ck, cv in v.items() if ck not in RAW_KEYS} if k in CHECK_COLUMNS and isinstance(v, dict) else v
+        for k, v in row.items()
+    }
+
+
+class Storage:
+    """Interface used by the routes; all methods are blocking."""
+
+    def upsert_many(self, rows):
+        """Insert or replace rows keyed on machine_id."""
+        raise NotImplementedError
+
+    def get(self, machine_id):
+        """The stored row for `machine_id`, or None."""
+        raise NotImplementedError
+
+    def list_machines(self, filters=None, fields=None, limit=None, after=None, include_raw=True):
+        """
+        Rows matching every filter (see EQUALITY_FILTERS), ordered newest first
+        on (reported_at, machine_id).
+
+        `fields` projects the returned columns (machine_id and reported_at, the
+        sort key, are always included), `limit` caps the page size and
+        `after` is the (reported_at, machine_id) key of the previous page's
+        last row. Without `include_raw` the raw command output (inline `raw`
+        or its `raw_sha256` reference) is left out of every check document.
+        """
+        raise NotImplementedError
+
+    def freshness(self):
+        """
+        The newest change anywhere in the fleet; drives ETag/Last-Modified.
+        That is the latest reported_at, which every write sets to the time
+        it was accepted, or judged_at, when apply_policy last rewrote a
+        row's verdicts. A row entering or leaving any filtered view moves
+        one of them, so no count is needed; both are index lookups.
+        """
+        raise NotImplementedError
+
+    def get_many(self, machine_ids, fields=None):
+        """{machine_id: row} for the stored machines among `machine_ids`."""
+        raise NotImplementedError
+
+    def append_history(self, entries):
+        """Append per-check state transitions (machine_id, check_name, changed_at, state)."""
+        raise NotImplementedError
+
+    def upsert_with_history(self, rows, entries):
+        """
+        upsert_many(rows) and append_history(entries) as one write. This
+        default appends the history first: if the upsert then fails and the
+        rows are retried, their transitions are recomputed against the old
+        state and written again rather than lost.
+        """
+        self.append_history(entries)
+        self.upsert_many(rows)
+
+    def history(self, machine_id, check=None, limit=100):
+        """A machine's transitions, newest first."""
+        raise NotImplementedError
+
+    def compliance_counts(self, verdicts):
+        """
+        {(system, check): {"compliant", "noncompliant", "unknown"}} over the
+        whole fleet; `verdicts` maps check names to their verdict column.
+        This default pages through the projected columns.
+        """
+        counts = {}
+        fields = ["system", *verdicts.values()]
+        after = None
+        while True:
+            page = self.list_machines(fields=fields, limit=5000, after=after)
+            for row in page:
+                for check, column in verdicts.items():
+                    tally = counts.setdefault((row.get("system"), check),
+                                              {"compliant": 0, "noncompliant": 0, "unknown": 0})
+                    value = row.get(column)
+                    tally["unknown" if value is None else "compliant" if value else "noncompliant"] += 1
+            if len(page) < 5000:
+                return counts
+            after = (page[-1]["reported_at"], page[-1]["machine_id"])
+
+    def apply_policy(self, policy):
+        """
+        Re-judge, in one set-based statement, every row whose verdicts are
+        not from `policy` (a compliance.Policy), stamping judged_at; returns
+        the rows updated.
+        """
+        raise NotImplementedError
+
+    def upsert_rollups(self, rows):
+        """Insert or replace compliance_daily rows keyed on (day, system, check_name)."""
+        raise NotImplementedError
+
+    def rollups(self, start, end, system=None, check=None):
+        """compliance_daily rows with start <= day <= end, oldest first."""
+        raise NotImplementedError
+
+    def put_blobs(self, blobs):
+        """Store raw_blobs rows (sha256, size, zlib data); hashes already stored are left alone."""
+        raise NotImplementedError
+
+    def existing_blobs(self, hashes):
+        """The set of `hashes` present in raw_blobs."""
+        raise NotImplementedError
+
+    def get_blobs(self, hashes):
+        """{sha256: zlib data} for the stored blobs among `hashes`."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# Machine ids per get_many request on Supabase: at ~40 URL-encoded bytes each
+# the query string stays around 4KB.
+GET_MANY_CHUNK = 100
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, url, key):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def _table(self):
+        return self.client.table("systems")
+
+    def upsert_many(self, rows):
+        if rows:
+            self._table().upsert(rows, on_conflict="machine_id").execute()
+
+    def get(self, machine_id):
+        resp = self._table().select("*").eq("machine_id", machine_id).limit(1).execute()
+        return (resp.data or [None])[0]
+
+    @staticmethod
+    def _filtered(query, filters):
+        for column, value in (filters or {}).items():
+            if column in EQUALITY_FILTERS:
+                query = query.eq(column, value)
+            elif column == "min_score":
+                query = query.gte("compliance_score", value)
+            elif column == "max_score":
+                query = query.lte("compliance_score", value)
+        return query
+
+    def list_machines(self, filters=None, fields=None, limit=None, after=None, include_raw=True):
+        select = ",".join(dict.fromkeys(["machine_id", "reported_at", *fields])) if fields else "*"
+        query = self._filtered(self._table().select(select), filters)
+        if after is not None:
+            reported_at, machine_id = after
+            reported_at, machine_id = _postgrest_quote(reported_at), _postgrest_quote(machine_id)
+            query = query.or_(f"reported_at.lt.{reported_at},"
+                              f"and(reported_at.eq.{reported_at},machine_id.lt.{machine_id})")
+        query = query.order("reported_at", desc=True).order("machine_id", desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.execute().data or []
+        return rows if include_raw else [strip_raw(r) for r in rows]
+
+    def freshness(self):
+        resp = self._table().select("reported_at").order("reported_at", desc=True).limit(1).execute()
+        judged = self._table().select("judged_at").order("judged_at", desc=True, nullsfirst=False).limit(1).execute()
+        return _newest((resp.data or [{}])[0].get("reported_at"), (judged.data or [{}])[0].get("judged_at"))
+
+    def get_many(self, machine_ids, fields=None):
+        ids = list(machine_ids)
+        select = ",".join(dict.fromkeys(["machine_id", *fields])) if fields else "*"
+        rows = {}
+        # The ids travel in the URL; chunks keep it within proxy and server limits.
+        for i in range(0, len(ids), GET_MANY_CHUNK):
+            resp = self._table().select(select).in_("machine_id", ids[i:i + GET_MANY_CHUNK]).execute()
+            rows.update((r["machine_id"], r) for r in resp.data or [])
+        return rows
+
+    def append_history(self, entries):
+        if entries:
+            self.client.table("system_history").insert(entries).execute()
+
+    def history(self, machine_id, check=None, limit=100):
+        query = self.client.table("system_history").select("check_name,changed_at,state") \
+            .eq("machine_id", machine_id)
+        if check:
+            query = query.eq("check_name", check)
+        return query.order("changed_at", desc=True).limit(limit).execute().data or []
+
+    def apply_policy(self, policy):
+        # apply_compliance_policy() is defined in migrations/005_compliance_policy.sql.
+        resp = self.client.rpc("apply_compliance_policy",
+                               {"policy": policy.document(), "version": policy.version}).execute()
+        return resp.data or 0
+
+    def upsert_rollups(self, rows):
+        if rows:
+            self.client.table("compliance_daily").upsert(rows, on_conflict="day,system,check_name").execute()
+
+    def rollups(self, start, end, system=None, check=None):
+        query = self.client.table("compliance_daily").select("*").gte("day", start).lte("day", end)
+        if system:
+            query = query.eq("system", system)
+        if check:
+            query = query.eq("check_name", check)
+        return query.order("day").execute().data or []
+
+    # bytea does not survive PostgREST's JSON, so blob data travels base64 encoded.
+    def put_blobs(self, blobs):
+        if blobs:
+            rows = [{**b, "data": base64.b64encode(b["data"]).decode()} for b in blobs]
+            self.client.table("raw_blobs").upsert(rows, on_conflict="sha256", ignore_duplicates=True).execute()
+
+    def existing_blobs(self, hashes):
+        if not hashes:
+            return set()
+        resp = self.client.table("raw_blobs").select("sha256").in_("sha256", list(hashes)).execute()
+        return {r["sha256"] for r in resp.data or []}
+
+    def get_blobs(self, hashes):
+        if not hashes:
+            return {}
+        resp = self.client.table("raw_blobs").select("sha256,data").in_("sha256", list(hashes)).execute()
+        return {r["sha256"]: base64.b64decode(r["data"]) for r in resp.data or []}
+
+
+SQLITE_SCHEMA = """
+create table if not exists systems (
+    machine_id text primary key,
+    system text,
+    release text,
+    version text,
+    arch text,
+    checked_at text,
+    disk_encryption text,
+    os_update text,
+    antivirus text,
+    inactivity_sleep text,
+    reported_at text,
+    report_version integer,
+    encrypted integer,
+    up_to_date integer,
+    av_present integer,
+    sleep_compliant integer,
+    encryption_ok integer,
+    updates_ok integer,
+    antivirus_ok integer,
+    sleep_ok integer,
+    compliance_score integer,
+    policy_version text,
+    judged_at text
+);
+create table if not exists system_history (
+    id integer primary key,
+    machine_id text not null,
+    check_name text not null,
+    changed_at text,
+    state text
+);
+create index if not exists system_history_machine on system_history(machine_id, changed_at);
+create table if not exists compliance_daily (
+    day text not null,
+    system text,
+    check_name text not null,
+    compliant integer not null,
+    noncompliant integer not null,
+    unknown integer not null,
+    primary key (day, system, check_name)
+);
+create table if not exists raw_blobs (
+    sha256 text primary key,
+    size integer not null,
+    data blob not null
+);
+"""
+
+# Applied after migrating older databases, which lack the compliance columns.
+# The first two drops remove the JSON expression indexes those databases had.
+SQLITE_INDEXES = """
+drop index if exists systems_encrypted;
+drop index if exists systems_up_to_date;
+create index if not exists systems_system on systems(system);
+drop index if exists systems_reported_at;
+create index if not exists systems_by_reported_at on systems(reported_at, machine_id);
+create index if not exists systems_by_encrypted on systems(encrypted, system);
+create index if not exists systems_by_up_to_date on systems(up_to_date, system);
+create index if not exists systems_by_av_present on systems(av_present, system);
+create index if not exists systems_by_sleep_compliant on systems(sleep_compliant, system);
+create index if not exists systems_by_compliance_score on systems(compliance_score);
+create index if not exists systems_by_policy_version on systems(policy_version);
+create index if not exists systems_by_judged_at on systems(judged_at);
+"""
+
+SQLITE_MIGRATED_COLUMNS = {
+    "report_version": "integer",
+    **{c: "integer" for c in COMPLIANCE_COLUMNS},
+    "compliance_score": "integer",
+    "policy_version": "text",
+    "judged_at": "text",
+    **{c: "integer" for c in VERDICT_COLUMNS},
+}
+
+# Databases from before the verdict columns had policy verdicts written over
+# the fact columns: derive the facts again and leave every row to be
+# re-judged (apply_policy) into the verdict columns.
+SQLITE_SPLIT_VERDICTS = (
+    "update systems set " + ", ".join(f"{column} = {expr}" for column, expr in sqlite_facts().items())
+    + ", policy_version = null"
+)
+
+SQLITE_BACKFILL = """
+update systems set
+    encrypted = json_extract(disk_encryption, '$.status'),
+    up_to_date = json_extract(os_update, '$.up_to_date'),
+    av_present = json_extract(antivirus, '$.present'),
+    sleep_compliant = json_extract(inactivity_sleep, '$.compliant'),
+    compliance_score = 25 * (
+        (coalesce(json_extract(disk_encryption, '$.status'), 0) = 1)
+        + (coalesce(json_extract(os_update, '$.up_to_date'), 0) = 1)
+        + (coalesce(json_extract(antivirus, '$.present'), 0) = 1)
+        + (coalesce(json_extract(inactivity_sleep, '$.compliant'), 0) = 1))
+"""
+
+UPSERT_SQL = (
+    f"insert into systems ({', '.join(COLUMNS)}) values ({', '.join('?' for _ in COLUMNS)}) "
+    f"on conflict(machine_id) do update set "
+    + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "machine_id")
+)
+
+
+class SQLiteStorage(Storage):
+    """
+    Local single-node store in WAL mode.
+
+    Check sub-documents are kept as JSON text. Each thread gets its own
+    connection; sqlite3 caches the prepared statements per connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            self._migrate(conn)
+            conn.executescript(SQLITE_INDEXES)
+
+    @staticmethod
+    def _migrate(conn):
+        existing = {r["name"] for r in conn.execute("pragma table_info(systems)")}
+        added = [c for c in SQLITE_MIGRATED_COLUMNS if c not in existing]
+        for column in added:
+            conn.execute(f"alter table systems add column {column} {SQLITE_MIGRATED_COLUMNS[column]}")
+        if "compliance_score" in added:
+            conn.execute(SQLITE_BACKFILL)
+        if VERDICT_COLUMNS[0] in added:
+            conn.execute(SQLITE_SPLIT_VERDICTS)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.execute("pragma busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(row):
+        return tuple(
+            json.dumps(row.get(c)) if c in CHECK_COLUMNS and row.get(c) is not None else row.get(c)
+            for c in COLUMNS
+        )
+
+    @staticmethod
+    def _decode(record):
+        row = dict(record)
+        for c in CHECK_COLUMNS:
+            if row.get(c) is not None:
+                row[c] = json.loads(row[c])
+        for c in (*COMPLIANCE_COLUMNS, *VERDICT_COLUMNS):
+            if row.get(c) is not None:
+                row[c] = bool(row[c])
+        return row
+
+    def upsert_many(self, rows):
+        if not rows:
+            return
+        with self._conn() as conn:
+            conn.executemany(UPSERT_SQL, [self._encode(r) for r in rows])
+
+    def get(self, machine_id):
+        record = self._conn().execute("select * from systems where machine_id = ?", (machine_id,)).fetchone()
+        return self._decode(record) if record else None
+
+    @staticmethod
+    def _where(filters):
+        where, params = [], []
+        for column, value in (filters or {}).items():
+            if column in EQUALITY_FILTERS:
+                where.append(f"{column} = ?")
+                params.append(value)
+            elif column == "min_score":
+                where.append("compliance_score >= ?")
+                params.append(value)
+            elif column == "max_score":
+                where.append("compliance_score <= ?")
+                params.append(value)
+        return where, params
+
+    def list_machines(self, filters=None, fields=None, limit=None, after=None, include_raw=True):
+        where, params = self._where(filters)
+        if after is not None:
+            where.append("(reported_at < ? or (reported_at = ? and machine_id < ?))")
+            params.extend([after[0], after[0], after[1]])
+        columns = [c for c in COLUMNS if fields is None or c in fields or c in ("machine_id", "reported_at")]
+        # Drop raw output inside SQLite so it is never decoded or copied.
+        select = ", ".join(
+            f"json_remove({c}, '$.raw', '$.raw_sha256') as {c}" if c in CHECK_COLUMNS and not include_raw else c
+            for c in columns
+        )
+        sql = f"select {select} from systems"
+        if where:
+            sql += " where " + " and ".join(where)
+        sql += " order by reported_at desc, machine_id desc"
+        if limit is not None:
+            sql += " limit ?"
+            params.append(limit)
+        return [self._decode(r) for r in self._conn().execute(sql, params)]
+
+    def freshness(self):
+        # Separate subqueries so each max() is answered from its index.
+        newest, judged = self._conn().execute(
+            "select (select max(reported_at) from systems), (select max(judged_at) from systems)").fetchone()
+        return _newest(newest, judged)
+
+    def get_many(self, machine_ids, fields=None):
+        ids = list(machine_ids)
+        if not ids:
+            return {}
+        columns = [c for c in COLUMNS if fields is None or c in fields or c == "machine_id"]
+        rows = {}
+        # Stay well below SQLite's bound-parameter limit.
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            sql = f"select {', '.join(columns)} from systems where machine_id in ({', '.join('?' * len(chunk))})"
+            for record in self._conn().execute(sql, chunk):
+                row = self._decode(record)
+                rows[row["machine_id"]] = row
+        return rows
+
+    @staticmethod
+    def _insert_history(conn, entries):
+        conn.executemany(
+            "insert into system_history (machine_id, check_name, changed_at, state) values (?, ?, ?, ?)",
+            [(e["machine_id"], e["check_name"], e["changed_at"], json.dumps(e["state"])) for e in entries],
+        )
+
+    def append_history(self, entries):
+        if not entries:
+            return
+        with self._conn() as conn:
+            self._insert_history(conn, entries)
+
+    def upsert_with_history(self, rows, entries):
+        # One transaction: both are written or neither is.
+        with self._conn() as conn:
+            if rows:
+                conn.executemany(UPSERT_SQL, [self._encode(r) for r in rows])
+            if entries:
+                self._insert_history(conn, entries)
+
+    def history(self, machine_id, check=None, limit=100):
+        sql = "select check_name, changed_at, state from system_history where machine_id = ?"
+        params = [machine_id]
+        if check:
+            sql += " and check_name = ?"
+            params.append(check)
+        sql += " order by changed_at desc, id desc limit ?"
+        params.append(limit)
+        return [{**dict(r), "state": json.loads(r["state"])} for r in self._conn().execute(sql, params)]
+
+    def compliance_counts(self, verdicts):
+        select = ", ".join(
+            f"sum({col} = 1), sum({col} = 0), sum({col} is null)" for col in verdicts.values()
+        )
+        counts = {}
+        for record in self._conn().execute(f"select system, {select} from systems group by system"):
+            system, values = record[0], list(record)[1:]
+            for i, check in enumerate(verdicts):
+                counts[(system, check)] = {
+                    "compliant": values[3 * i] or 0,
+                    "noncompliant": values[3 * i + 1] or 0,
+                    "unknown": values[3 * i + 2] or 0,
+                }
+        return counts
+
+    def apply_policy(self, policy):
+        # Verdicts are computed once per row in the subquery so the score can
+        # be summed from them; UPDATE ... FROM needs SQLite 3.33.
+        columns = policy.sqlite_columns()
+        select = ", ".join(f"{expr} as {column}" for column, (expr, _) in columns.items())
+        passed = " + ".join(f"coalesce(v.{column} = 1, 0)" for column in columns)
+        sql = (
+            "update systems set " + ", ".join(f"{column} = v.{column}" for column in columns)
+            + f", compliance_score = cast(round(100.0 * ({passed}) / {len(columns)}) as integer)"
+            + ", policy_version = ?, judged_at = ?"
+            + f" from (select machine_id, {select} from systems where policy_version is not ?) as v"
+            + " where systems.machine_id = v.machine_id"
+        )
+        judged_at = datetime.datetime.utcnow().isoformat()
+        params = [policy.version, judged_at, *(p for _, ps in columns.values() for p in ps), policy.version]
+        with self._conn() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def upsert_rollups(self, rows):
+        if not rows:
+            return
+        with self._conn() as conn:
+            conn.executemany(
+                "insert or replace into compliance_daily "
+                "(day, system, check_name, compliant, noncompliant, unknown) values (?, ?, ?, ?, ?, ?)",
+                [(r["day"], r["system"], r["check_name"], r["compliant"], r["noncompliant"], r["unknown"])
+                 for r in rows],
+            )
+
+    def rollups(self, start, end, system=None, check=None):
+        sql = "select * from compliance_daily where day >= ? and day <= ?"
+        params = [start, end]
+        if system:
+            sql += " and system = ?"
+            params.append(system)
+        if check:
+            sql += " and check_name = ?"
+            params.append(check)
+        sql += " order by day, system, check_name"
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def put_blobs(self, blobs):
+        if not blobs:
+            return
+        with self._conn() as conn:
+            conn.executemany("insert or ignore into raw_blobs (sha256, size, data) values (?, ?, ?)",
+                             [(b["sha256"], b["size"], b["data"]) for b in blobs])
+
+    def _blob_rows(self, columns, hashes):
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            yield from self._conn().execute(
+                f"select {columns} from raw_blobs where sha256 in ({', '.join('?' * len(chunk))})", chunk)
+
+    def existing_blobs(self, hashes):
+        return {r["sha256"] for r in self._blob_rows("sha256", hashes)}
+
+    def get_blobs(self, hashes):
+        return {r["sha256"]: r["data"] for r in self._blob_rows("sha256, data", hashes)}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def storage_from_env(default_url, default_key):
+    """Select the backend with STORAGE_BACKEND=supabase|sqlite (default: supabase)."""
+    backend = os.environ.get("STORAGE_BACKEND", "supabase").lower()
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("SQLITE_PATH", "systems.db"))
+    if backend == "supabase":
+        return SupabaseStorage(os.environ.get("SUPABASE_URL", default_url),
+                               os.environ.get("SUPABASE_KEY", default_key))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,86 @@
+"""
+End-to-end agent cycle: run every check, diff against the acknowledged
+report and encode the payload the way the reporter puts it on the wire.
+
+    python -m benchmarks.agent_cycle [--os linux|macos|windows|live] [--cycles N] [--latency] [--out FILE]
+
+`--os` replays that platform's fixture; `live` runs the real checks of this
+host. The network send is left out; benchmarks.loadgen covers the backend.
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+
+
+def cycle(collect, state):
+    """One cycle; returns the seconds spent in each stage and the encoded size."""
+    from system_utility.reporter import encode_body
+
+    t0 = time.perf_counter()
+    results = collect()
+    t1 = time.perf_counter()
+    delta = state.delta(results)
+    version = state.version + 1
+    payload = delta if delta is not None else {**results, "report_version": version}
+    t2 = time.perf_counter()
+    body = encode_body(payload)
+    t3 = time.perf_counter()
+    state.ack(results, version)
+    return {"collect": t1 - t0, "diff": t2 - t1, "encode": t3 - t2, "total": t3 - t0}, len(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--os", default="linux", choices=[*PLATFORMS, "live"])
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency", action="store_true", help="sleep the recorded command times")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as state_path:
+        os.environ["SYSTEM_UTILITY_STATE_DIR"] = state_path
+        from system_utility.delta import AckState
+        from system_utility.main import run_checks
+
+        if args.os == "live":
+            source = contextlib.nullcontext((None, None))
+        else:
+            source = replay(args.os, latency=args.latency)
+        with source as (module, _):
+            collect = run_checks if module is None else module.collect
+            state = AckState()
+            stages = {"collect": [], "diff": [], "encode": [], "total": []}
+            sizes = []
+            for i in range(args.warmup + args.cycles):
+                timings, size = cycle(collect, state)
+                if i < args.warmup:
+                    continue
+                for stage, seconds in timings.items():
+                    stages[stage].append(seconds)
+                sizes.append(size)
+
+    wall = sum(stages["total"])
+    results = {
+        "stages": {stage: harness.latency_summary(samples) for stage, samples in stages.items()},
+        "cycles_per_second": round(len(stages["total"]) / wall, 2) if wall else None,
+        "first_payload_bytes": sizes[0] if sizes else None,
+        "steady_payload_bytes": sizes[-1] if sizes else None,
+        "rss_mb": harness.rss_mb(),
+    }
+    harness.print_table([{"stage": s, **r} for s, r in results["stages"].items()],
+                        ["stage", "p50_ms", "p99_ms", "mean_ms", "max_ms"])
+    print(f"{results['cycles_per_second']} cycles/s, payload {results['steady_payload_bytes']} bytes "
+          f"(delta), RSS {results['rss_mb']} MiB")
+    if args.out:
+        harness.save(args.out, "agent_cycle", vars(args), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-check microbenchmarks for each platform module, driven by recorded
+command output so they run on any Linux box.
+
+    python -m benchmarks.checks [--os linux,macos,windows] [--iterations N] [--latency] [--out FILE]
+
+Without --latency commands answer instantly, which isolates the Python
+parsing cost of each check; with it the recorded command times are slept.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+
+
+def bench_platform(name, iterations, warmup, latency):
+    results = {}
+    with replay(name, latency=latency) as (module, runner):
+        checks = {"machine_id": module.machine_id, **module.CHECKS}
+        for check, fn in checks.items():
+            runner.calls.clear()
+            samples = harness.time_calls(fn, iterations, warmup)
+            results[check] = {
+                **harness.latency_summary(samples),
+                "commands_per_call": round(len(runner.calls) / (iterations + warmup), 2),
+            }
+        if runner.unmatched:
+            results["_unmatched_commands"] = sorted(set(runner.unmatched))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--os", default=",".join(PLATFORMS), help="comma-separated platforms")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--latency", action="store_true", help="sleep the recorded command times")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    platforms = [p.strip() for p in args.os.split(",") if p.strip()]
+    results = {}
+    with tempfile.TemporaryDirectory() as state:
+        os.environ["SYSTEM_UTILITY_STATE_DIR"] = state
+        for name in platforms:
+            results[name] = bench_platform(name, args.iterations, args.warmup, args.latency)
+
+    rows = [{"os": name, "check": check, **r}
+            for name, checks in results.items() for check, r in checks.items() if not check.startswith("_")]
+    harness.print_table(rows, ["os", "check", "p50_ms", "p99_ms", "mean_ms", "commands_per_call"])
+    for name, checks in results.items():
+        for line in checks.get("_unmatched_commands", []):
+            print(f"warning: {name} fixture has no output for: {line}")
+    if args.out:
+        harness.save(args.out, "checks", vars(args), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
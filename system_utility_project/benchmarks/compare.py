@@ -0,0 +1,77 @@
+"""
+Compare two benchmark result files written with --out.
+
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold PCT]
+
+Every numeric result present in both is listed with its relative change.
+Latency and memory are better lower, throughput better higher; a change
+worse than --threshold percent is flagged, and the exit status is 1 if any
+is.
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ("_rps", "_per_s", "per_second", "speedup")
+LOWER_IS_BETTER = ("_ms", "_mb", "_bytes", "forks_per_cycle", "commands_per_call")
+
+
+def flatten(doc, prefix=""):
+    if isinstance(doc, dict):
+        for key, value in doc.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(doc, (int, float)) and not isinstance(doc, bool):
+        yield prefix, doc
+
+
+def direction(path):
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, candidate, threshold):
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        print(f"warning: comparing {baseline.get('benchmark')} with {candidate.get('benchmark')}")
+    old = dict(flatten(baseline["results"]))
+    new = dict(flatten(candidate["results"]))
+    rows, regressions = [], 0
+    for path in (p for p in old if p in new):
+        a, b = old[path], new[path]
+        change = (b - a) / a * 100 if a else (0.0 if a == b else float("inf"))
+        sign = direction(path)
+        flag = ""
+        if sign and abs(change) >= threshold:
+            better = (change > 0) == (sign > 0)
+            flag = "better" if better else "WORSE"
+            regressions += not better
+        rows.append((path, a, b, change, flag))
+
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'metric'.ljust(width)}  {'baseline':>12}  {'candidate':>12}  {'change':>9}")
+    for path, a, b, change, flag in rows:
+        print(f"{path.ljust(width)}  {a:>12.3f}  {b:>12.3f}  {change:>+8.1f}%  {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change worth flagging")
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.threshold}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Replay recorded command output in place of `run_cmd`, so the checks of any
+platform run on any Linux box.
+
+Fixtures live in benchmarks/fixtures/<os>.json; see system_utility.replay
+for the format and scenarios.
+"""
+import contextlib
+from pathlib import Path
+
+from system_utility import cache, replay as recorded
+from system_utility.checks import linux, macos, windows
+from system_utility.utils import use_runner
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PLATFORMS = {"linux": linux, "macos": macos, "windows": windows}
+
+
+def load_fixture(name):
+    return recorded.load_fixture(FIXTURES / f"{name}.json")
+
+
+def _uncached(key, paths, compute, ttl=None):
+    return compute()
+
+
+@contextlib.contextmanager
+def fixture_host(pm_name=None, use_cache=False):
+    """
+    Host state the command runner does not cover: Linux runs its command
+    path with package manager `pm_name`, and `use_cache=False` bypasses the
+    update cache so every call does the work. Process-wide, unlike the runner.
+    """
+    saved_native, saved_pm, saved_cached = linux.NATIVE_PROBES, linux.package_manager, cache.cached
+    pm = next((entry for entry in linux.PKG_MANAGERS if entry[0] == pm_name), None)
+    try:
+        linux.NATIVE_PROBES = False
+        linux.package_manager = lambda: pm
+        if not use_cache:
+            cache.cached = _uncached
+        yield
+    finally:
+        linux.NATIVE_PROBES, linux.package_manager, cache.cached = saved_native, saved_pm, saved_cached
+
+
+@contextlib.contextmanager
+def replay(name, latency=False, use_cache=False, scenarios=()):
+    """Replay fixture `name` (with `scenarios`) and yield (platform module, runner)."""
+    fixture = load_fixture(name)
+    runner = recorded.ReplayRunner(fixture, scenarios, latency=latency)
+    with fixture_host(fixture.get("env", {}).get("package_manager"), use_cache), use_runner(runner):
+        yield PLATFORMS[name], runner
@@ -0,0 +1,51 @@
+"""Deterministic synthetic machines and the reports they send."""
+import datetime
+import random
+
+OS_MIX = (("Linux", 0.45), ("Windows", 0.40), ("Darwin", 0.15))
+RELEASES = {"Linux": "6.8.0-45-generic", "Windows": "10", "Darwin": "23.4.0"}
+
+
+class Machine:
+    """One simulated agent; its compliance state drifts a little between reports."""
+
+    def __init__(self, index, rng):
+        self.machine_id = f"bench-{index:06d}"
+        self.system = rng.choices([o for o, _ in OS_MIX], [w for _, w in OS_MIX])[0]
+        self.encrypted = rng.random() < 0.85
+        self.up_to_date = rng.random() < 0.7
+        self.av_present = rng.random() < 0.9
+        self.sleep_seconds = rng.choice([300, 600, 900, 1200, 1800])
+
+    def drift(self, rng, probability=0.05):
+        if rng.random() < probability:
+            self.up_to_date = not self.up_to_date
+        if rng.random() < probability / 5:
+            self.sleep_seconds = rng.choice([300, 600, 900, 1200, 1800])
+
+    def report(self):
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        return {
+            "machine_id": self.machine_id,
+            "system": self.system,
+            "release": RELEASES[self.system],
+            "version": "bench",
+            "arch": "x86_64",
+            "checked_at": now,
+            "checks": {
+                "disk_encryption": {"supported": True, "status": self.encrypted,
+                                    "raw": "crypto_LUKS" if self.encrypted else "ext4"},
+                "os_update": {"supported": True, "up_to_date": self.up_to_date,
+                              "raw": "" if self.up_to_date else "Listing...\nopenssl/jammy-updates 3.0.2 amd64"},
+                "antivirus": {"supported": True, "present": self.av_present, "raw": ""},
+                "inactivity_sleep": {"supported": True, "compliant": self.sleep_seconds <= 600,
+                                     "sleep_ac_seconds": self.sleep_seconds,
+                                     "sleep_dc_seconds": self.sleep_seconds,
+                                     "raw": f"ac={self.sleep_seconds} dc={self.sleep_seconds}"},
+            },
+        }
+
+
+def make_fleet(size, seed=0):
+    rng = random.Random(seed)
+    return [Machine(i, rng) for i in range(size)]
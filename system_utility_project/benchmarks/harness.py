@@ -0,0 +1,102 @@
+"""Shared timing, percentile, RSS and result-file helpers for the benchmarks."""
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of `samples` (any order), or None if empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(seconds):
+    """p50/p99/mean/max in milliseconds for a list of durations in seconds."""
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean_ms": round(1000 * sum(seconds) / len(seconds), 3),
+        "p50_ms": round(1000 * percentile(seconds, 50), 3),
+        "p99_ms": round(1000 * percentile(seconds, 99), 3),
+        "max_ms": round(1000 * max(seconds), 3),
+    }
+
+
+def time_calls(fn, iterations, warmup=0):
+    """Call `fn` `warmup` + `iterations` times; return the timed durations in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def rss_mb(pid=None):
+    """Resident set size of `pid` (default: this process) in MiB, from /proc; None elsewhere."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        except ImportError:
+            pass
+    return None
+
+
+def host_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save(path, benchmark, params, results):
+    """Write a result document that benchmarks.compare can diff against another run."""
+    doc = {
+        "benchmark": benchmark,
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": host_info(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+        f.write("\n")
+    print(f"Results written to {path}")
+    return doc
+
+
+def print_table(rows, columns):
+    """Print `rows` (dicts) as an aligned table of `columns`."""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).rjust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
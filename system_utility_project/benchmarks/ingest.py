@@ -0,0 +1,129 @@
+"""
+Per-report CPU cost of the backend's /report ingest path, without HTTP.
+
+    python -m benchmarks.ingest [--reports N] [--sink pipe|devnull] [--out FILE]
+
+Bodies are real agent reports, replayed from the per-OS fixtures and
+gzipped as agents send them. `current` runs the backend's own decode, row
+mapping, fan-out and sampled log call. `legacy` reproduces the earlier
+handler (json.loads, a pretty-printed dump to stdout, dict-based row
+mapping) with the same fan-out. Log output goes to --sink: a line-buffered
+pipe drained by a reader thread, as under a log collector, or /dev/null.
+"""
+import argparse
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+from benchmarks.loadgen import BACKEND_DIR
+
+
+def legacy_ingest(main, body):
+    data = json.loads(gzip.decompress(body))
+    data["reported_at"] = datetime.datetime.utcnow().isoformat()
+    print("\n===== New Report Received =====")
+    print("Time:", datetime.datetime.now())
+    print(json.dumps(data, indent=4))
+    print("==============================\n")
+    checks = data.get("checks", {})
+    row = {
+        "machine_id": data.get("machine_id"),
+        **{col: data.get(col) for col in main.HEADER_COLUMNS},
+        "checked_at": data.get("checked_at"),
+        **{col: checks.get(col) for col in main.CHECK_COLUMNS},
+        "reported_at": data.get("reported_at"),
+        "report_version": data.get("report_version"),
+    }
+    row = main.policies.current().apply(row)
+    main.ingested(row)
+    main.metrics.observe_timings(data.get("timings"), data.get("system"))
+    return row
+
+
+def current_ingest(main, body):
+    report = main.schemas.decode_report(gzip.decompress(body))
+    row = main.row_from_report(report, datetime.datetime.utcnow().isoformat())
+    main.ingested(row)
+    main.metrics.observe_timings(report.timings, report.system)
+    if main.logs.sampled():
+        main.log.info("report accepted", extra={"machine_id": report.machine_id, "system": report.system,
+                                                "score": row["compliance_score"]})
+    return row
+
+
+def agent_bodies(count):
+    """gzip bodies of fixture-replayed reports, cycling through the platforms."""
+    samples = []
+    for name in PLATFORMS:
+        with replay(name) as (module, _):
+            samples.append(module.collect())
+    return [gzip.compress(json.dumps({**samples[i % len(samples)], "machine_id": f"bench-{i:06d}"}).encode())
+            for i in range(count)]
+
+
+@contextlib.contextmanager
+def log_sink(kind):
+    """A text stream standing in for the server's stdout."""
+    if kind == "devnull":
+        with open(os.devnull, "w") as devnull:
+            yield devnull
+        return
+    read_fd, write_fd = os.pipe()
+
+    def discard():
+        while os.read(read_fd, 65536):
+            pass
+
+    drain = threading.Thread(target=discard, daemon=True)
+    drain.start()
+    with open(write_fd, "w", buffering=1) as stream:
+        yield stream
+    drain.join()
+    os.close(read_fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--sink", choices=["pipe", "devnull"], default="pipe")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp, "bench.db"),
+                           "SYSTEM_UTILITY_STATE_DIR": tmp})
+        bodies = agent_bodies(args.reports)
+        sys.path.insert(0, str(BACKEND_DIR))
+        import main as backend
+
+        results = {}
+        with log_sink(args.sink) as sink, contextlib.redirect_stdout(sink):
+            backend.logs.shutdown()
+            backend.logs.configure(stream=sink)
+            for name, fn in (("legacy", legacy_ingest), ("current", current_ingest)):
+                samples = []
+                for body in bodies:
+                    samples.extend(harness.time_calls(lambda: fn(backend, body), 1))
+                results[name] = {**harness.latency_summary(samples),
+                                 "reports_per_s": round(len(samples) / sum(samples), 1)}
+            backend.logs.shutdown()
+        backend.storage.close()
+
+    harness.print_table([{"path": k, **v} for k, v in results.items()],
+                        ["path", "p50_ms", "p99_ms", "mean_ms", "reports_per_s"])
+    speedup = results["legacy"]["mean_ms"] / max(results["current"]["mean_ms"], 1e-9)
+    print(f"current ingest path is {speedup:.1f}x cheaper per report")
+    if args.out:
+        harness.save(args.out, "ingest", vars(args), {**results, "speedup": round(speedup, 2)})
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the native probe path of the Linux checks with the command path.
+
+    python -m benchmarks.linux_probes [--cycles N] [--out FILE]
+
+Reports per-cycle wall time and the number of processes spawned for the
+checks that have native probes (machine_id, disk_encryption, inactivity_sleep).
+"""
+import argparse
+import subprocess
+import time
+
+from benchmarks import harness
+from system_utility.checks import linux
+
+PROBED = {
+    "machine_id": linux.machine_id,
+    "disk_encryption": linux.disk_encryption,
+    "inactivity_sleep": linux.inactivity_sleep,
+}
+
+
+class ForkCounter:
+    """Counts subprocess.Popen constructions while active."""
+
+    def __init__(self):
+        self.count = 0
+        self._original = subprocess.Popen.__init__
+
+    def __enter__(self):
+        counter = self
+
+        def counting_init(popen, *args, **kwargs):
+            counter.count += 1
+            return counter._original(popen, *args, **kwargs)
+
+        subprocess.Popen.__init__ = counting_init
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen.__init__ = self._original
+
+
+def measure(native, cycles):
+    linux.NATIVE_PROBES = native
+    timings = []
+    with ForkCounter() as forks:
+        for _ in range(cycles):
+            start = time.perf_counter()
+            for fn in PROBED.values():
+                fn()
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_ms": 1000 * sum(timings) / len(timings),
+        "p50_ms": 1000 * timings[len(timings) // 2],
+        "forks_per_cycle": forks.count / cycles,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    original = linux.NATIVE_PROBES
+    try:
+        results = {"commands": measure(False, args.cycles), "native": measure(True, args.cycles)}
+    finally:
+        linux.NATIVE_PROBES = original
+
+    for name, r in results.items():
+        print(f"{name:>9}: mean {r['mean_ms']:8.2f} ms  p50 {r['p50_ms']:8.2f} ms  "
+              f"forks/cycle {r['forks_per_cycle']:.1f}")
+    speedup = results["commands"]["mean_ms"] / max(results["native"]["mean_ms"], 1e-9)
+    print(f"native probes are {speedup:.1f}x faster per cycle")
+    if args.out:
+        harness.save(args.out, "linux_probes", vars(args), {**results, "speedup": round(speedup, 2)})
+    return results
+
+
+if __name__ == "__main__":
+    main()
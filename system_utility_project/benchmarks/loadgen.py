@@ -0,0 +1,252 @@
+"""
+Synthetic fleet load against the backend.
+
+    python -m benchmarks.loadgen [--machines N] [--duration S] [--concurrency C]
+                                 [--mix report=80,machines=8,filter=10,export=2]
+                                 [--url URL] [--out FILE]
+
+Without --url a backend is started from ../system_utility_backend on a free
+port with STORAGE_BACKEND=sqlite and a throwaway database. The fleet is
+seeded through /report/batch first, then C closed-loop workers issue the
+weighted mix of /report, /machines, /machines/filter and /machines/export
+for the given duration. Reports p50/p99 latency and throughput per
+operation, plus client and server RSS.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from benchmarks import harness
+from benchmarks.fleet import make_fleet
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "system_utility_backend"
+DEFAULT_MIX = "report=80,machines=8,filter=10,export=2"
+SEED_CHUNK = 500
+FILTERS = [
+    {"outdated": "true"},
+    {"unencrypted": "true"},
+    {"noncompliant": "true"},
+    {"os": "Windows", "max_score": "75"},
+    {"os": "Linux", "sleep_noncompliant": "true"},
+]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("report", "machines", "filter", "export"):
+            raise SystemExit(f"unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(db_path, port, extra_env=None, args=(), workers=None):
+    """
+    Start the backend on SQLite and wait until it answers: uvicorn directly,
+    or serve.py's pre-fork runner when `workers` is given.
+    """
+    env = {**os.environ, "STORAGE_BACKEND": "sqlite", "SQLITE_PATH": str(db_path), **(extra_env or {})}
+    if workers is None:
+        command = [sys.executable, "-m", "uvicorn", "main:app"]
+    else:
+        command = [sys.executable, "serve.py", "--workers", str(workers), "--drain", "0"]
+    proc = subprocess.Popen(
+        [*command, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", *args],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"backend exited: {proc.stderr.read().decode(errors='replace')}")
+        try:
+            if requests.get(url + "/ready", timeout=1).ok:
+                return proc, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("backend did not start within 30s")
+
+
+def post_json(session, url, payload):
+    body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=6)
+    return session.post(url, data=body, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                        timeout=60)
+
+
+def seed(url, fleet):
+    session = requests.Session()
+    for i in range(0, len(fleet), SEED_CHUNK):
+        chunk = [m.report() for m in fleet[i:i + SEED_CHUNK]]
+        r = post_json(session, url + "/report/batch", {"reports": chunk})
+        r.raise_for_status()
+
+
+class Worker(threading.Thread):
+    def __init__(self, index, url, fleet, mix, stop_at, stats):
+        super().__init__(daemon=True)
+        self.url, self.fleet, self.stop_at, self.stats = url, fleet, stop_at, stats
+        self.ops, self.weights = list(mix), list(mix.values())
+        self.rng = random.Random(index)
+        self.session = requests.Session()
+
+    def request(self, op):
+        if op == "report":
+            machine = self.rng.choice(self.fleet)
+            machine.drift(self.rng)
+            return post_json(self.session, self.url + "/report", machine.report())
+        if op == "machines":
+            return self.session.get(self.url + "/machines", params={"limit": 500}, timeout=60)
+        if op == "filter":
+            return self.session.get(self.url + "/machines/filter",
+                                    params={**self.rng.choice(FILTERS), "limit": 500}, timeout=60)
+        r = self.session.get(self.url + "/machines/export", params={"format": "ndjson"}, stream=True, timeout=60)
+        for _ in r.iter_content(65536):
+            pass
+        return r
+
+    def run(self):
+        while time.monotonic() < self.stop_at:
+            op = self.rng.choices(self.ops, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                status = self.request(op).status_code
+            except requests.RequestException:
+                status = "error"
+            self.stats.record(op, time.perf_counter() - started, status)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, op, seconds, status):
+        with self.lock:
+            if status == 200:
+                self.latencies.setdefault(op, []).append(seconds)
+            counts = self.statuses.setdefault(op, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+
+
+class RssSampler(threading.Thread):
+    """Peak RSS of a process, sampled while the load runs."""
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.peak = None
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            rss = harness.rss_mb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+
+def run_load(url, fleet, mix, duration, concurrency, server_pid=None):
+    stats = Stats()
+    sampler = RssSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    started = time.monotonic()
+    workers = [Worker(i, url, fleet, mix, started + duration, stats) for i in range(concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.monotonic() - started
+    if sampler:
+        sampler.done.set()
+        sampler.join()
+
+    ops = {}
+    for op in mix:
+        samples = stats.latencies.get(op, [])
+        ops[op] = {
+            **harness.latency_summary(samples),
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "statuses": stats.statuses.get(op, {}),
+        }
+    total_ok = sum(len(s) for s in stats.latencies.values())
+    return {
+        "operations": ops,
+        "throughput_rps": round(total_ok / elapsed, 1),
+        "elapsed_s": round(elapsed, 2),
+        "client_rss_mb": harness.rss_mb(),
+        "server_rss_mb": harness.rss_mb(server_pid) if server_pid else None,
+        "server_peak_rss_mb": sampler.peak if sampler else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--machines", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="use a running backend instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="with --url, the backend pid to sample RSS from")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    fleet = make_fleet(args.machines, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = None
+        if args.url:
+            url, server_pid = args.url.rstrip("/"), args.server_pid
+        else:
+            proc, url = start_backend(Path(tmp) / "bench.db", free_port())
+            server_pid = proc.pid
+        try:
+            seed_started = time.perf_counter()
+            seed(url, fleet)
+            seed_seconds = time.perf_counter() - seed_started
+            time.sleep(1.0)  # let the write buffer flush the seed
+            results = run_load(url, fleet, mix, args.duration, args.concurrency, server_pid)
+            results["seed_reports_per_s"] = round(len(fleet) / seed_seconds, 1)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+    harness.print_table([{"op": op, **r} for op, r in results["operations"].items()],
+                        ["op", "count", "p50_ms", "p99_ms", "max_ms", "throughput_rps"])
+    print(f"total {results['throughput_rps']} req/s over {results['elapsed_s']}s; "
+          f"seed {results['seed_reports_per_s']} reports/s; "
+          f"server RSS {results['server_rss_mb']} MiB (peak {results['server_peak_rss_mb']}), "
+          f"client RSS {results['client_rss_mb']} MiB")
+    for op, r in results["operations"].items():
+        failed = {s: n for s, n in r["statuses"].items() if s != "200"}
+        if failed:
+            print(f"warning: {op} non-200 responses: {failed}")
+    if args.out:
+        harness.save(args.out, "loadgen", vars(args), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
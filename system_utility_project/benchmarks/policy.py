@@ -0,0 +1,115 @@
+"""
+Cost of judging reports against the backend's compliance policy.
+
+    python -m benchmarks.policy [--machines N] [--reports N] [--out FILE]
+
+Rows are the per-OS fixture reports with sleep timeouts spread across
+machines. Per report: every rule (a full /report) vs only the rule for the
+one check a typical delta replaces. Per policy change, over N stored SQLite
+rows: row by row (page out, judge in Python, upsert back) vs
+Storage.apply_policy's single UPDATE; both must store the same verdicts.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+from benchmarks.loadgen import BACKEND_DIR
+
+PAGE = 5000
+VERDICT_FIELDS = ["encrypted", "up_to_date", "av_present", "sleep_compliant",
+                  "encryption_ok", "updates_ok", "antivirus_ok", "sleep_ok", "compliance_score"]
+# A stricter sleep limit for every OS and no antivirus requirement on Linux.
+CHANGED_POLICY = {"default": {"max_sleep_seconds": 300}, "systems": {"Linux": {"require_antivirus": False}}}
+
+
+def fleet_rows(storage_module, count):
+    samples = []
+    for name in PLATFORMS:
+        with replay(name) as (module, _):
+            samples.append(module.collect())
+    rows = []
+    for i in range(count):
+        report = json.loads(json.dumps(samples[i % len(samples)]))
+        sleep = report["checks"].get("inactivity_sleep") or {}
+        for key in ("sleep_ac_seconds", "sleep_dc_seconds"):
+            if isinstance(sleep.get(key), int):
+                sleep[key] = 60 * (i % 20)
+        rows.append({"machine_id": f"bench-{i:06d}", **{c: report.get(c) for c in storage_module.HEADER_COLUMNS},
+                     "checked_at": report.get("checked_at"), "reported_at": f"2026-01-01T00:00:{i % 60:02d}",
+                     "report_version": 1, **{c: report["checks"].get(c) for c in storage_module.CHECK_COLUMNS}})
+    return rows
+
+
+def row_by_row(storage, policy):
+    updated, after = 0, None
+    while True:
+        page = storage.list_machines(limit=PAGE, after=after)
+        storage.upsert_many([policy.apply(row) for row in page if row.get("policy_version") != policy.version])
+        updated += len(page)
+        if len(page) < PAGE:
+            return updated
+        after = (page[-1]["reported_at"], page[-1]["machine_id"])
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--reports", type=int, default=20_000)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import storage as storage_module
+    from compliance import Policy
+
+    policy, changed_policy = Policy(), Policy(CHANGED_POLICY)
+    rows = [policy.apply(r) for r in fleet_rows(storage_module, max(args.machines, args.reports))]
+
+    # Per report: a delta that replaced only the sleep check.
+    update = {"inactivity_sleep": {"supported": True, "compliant": True,
+                                   "sleep_ac_seconds": 300, "sleep_dc_seconds": 300}}
+    sample = [{**r, **update} for r in rows[:args.reports]]
+    full = harness.time_calls(lambda: [policy.evaluate(r) for r in sample], 5, warmup=1)
+    incremental = harness.time_calls(lambda: [policy.evaluate(r, changed=update) for r in sample], 5, warmup=1)
+    per_report = [
+        {"path": "every rule", "us_per_report": round(min(full) / len(sample) * 1e6, 2)},
+        {"path": "changed checks only", "us_per_report": round(min(incremental) / len(sample) * 1e6, 2)},
+    ]
+    harness.print_table(per_report, ["path", "us_per_report"])
+
+    fleet = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in (("row by row", row_by_row), ("one UPDATE", lambda s, p: s.apply_policy(p))):
+            storage = storage_module.SQLiteStorage(os.path.join(tmp, f"{name.replace(' ', '_')}.db"))
+            storage.upsert_many(rows[:args.machines])
+            seconds, updated = timed(fn, storage, changed_policy)
+            verdicts = storage.list_machines(fields=[*VERDICT_FIELDS, "policy_version"])
+            fleet.append({"method": name, "rows": updated, "seconds": round(seconds, 3),
+                          "rows_per_s": round(updated / seconds),
+                          "verdicts": hashlib.sha256(json.dumps(verdicts).encode()).hexdigest()[:12]})
+            storage.close()
+    harness.print_table(fleet, ["method", "rows", "seconds", "rows_per_s", "verdicts"])
+    if fleet[0]["verdicts"] != fleet[1]["verdicts"]:
+        raise SystemExit("row-by-row and set-based re-evaluation stored different verdicts")
+    speedup = fleet[0]["seconds"] / max(fleet[1]["seconds"], 1e-9)
+    print(f"policy change re-judged {speedup:.1f}x faster in one statement")
+    if args.out:
+        harness.save(args.out, "policy", vars(args),
+                     {"per_report": per_report, "fleet": fleet, "speedup": round(speedup, 2)})
+    return per_report, fleet
+
+
+if __name__ == "__main__":
+    main()
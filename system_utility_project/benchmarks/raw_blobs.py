@@ -0,0 +1,86 @@
+"""
+Bytes saved by sending and storing raw command output by content hash.
+
+    python -m benchmarks.raw_blobs [--machines N] [--variants V] [--out FILE]
+
+Reports are the per-OS fixture reports, spread over N machines; each
+machine's pending-update listing is one of V variants, as a fleet on a
+handful of patch levels would be. Compares, inline vs by hash: gzip bytes
+per report on the wire, the check columns stored per row, a /machines page
+with `fields=raw`, and the blob store those rows need.
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import zlib
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+
+
+def fleet_reports(machines, variants):
+    samples = []
+    for name in PLATFORMS:
+        with replay(name) as (module, _):
+            samples.append(module.collect())
+    reports = []
+    for i in range(machines):
+        report = json.loads(json.dumps(samples[i % len(samples)]))
+        report["machine_id"] = f"bench-{i:06d}"
+        update = report["checks"].get("os_update") or {}
+        if isinstance(update.get("raw"), str) and update["raw"]:
+            update["raw"] += f"\nvariant-{i % variants}"
+        reports.append(report)
+    return reports
+
+
+def json_bytes(doc):
+    return len(json.dumps(doc, separators=(",", ":")).encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--machines", type=int, default=3000)
+    parser.add_argument("--variants", type=int, default=5)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as state:
+        os.environ["SYSTEM_UTILITY_STATE_DIR"] = state
+        from system_utility.blobs import BlobCache, offload
+
+        reports = fleet_reports(args.machines, args.variants)
+        cache = BlobCache()
+        hashed = [offload(r, cache) for r in reports]
+        blobs = {path.name: path.read_bytes() for path in cache.path.iterdir()}
+
+    inline_wire = sum(len(gzip.compress(json.dumps(r).encode(), 6)) for r in reports)
+    hashed_wire = sum(len(gzip.compress(json.dumps(r).encode(), 6)) for r in hashed)
+    inline_rows = sum(json_bytes(r["checks"]) for r in reports)
+    hashed_rows = sum(json_bytes(r["checks"]) for r in hashed)
+    store = sum(len(zlib.compress(data, 9)) for data in blobs.values())
+    page = 500
+    inline_page = json_bytes([r["checks"] for r in reports[:page]])
+    hashed_page = json_bytes([r["checks"] for r in hashed[:page]])
+
+    rows = [
+        {"measure": "wire bytes/report (gzip)", "inline": round(inline_wire / len(reports)),
+         "hashed": round(hashed_wire / len(reports))},
+        {"measure": "check columns bytes/row", "inline": round(inline_rows / len(reports)),
+         "hashed": round(hashed_rows / len(reports))},
+        {"measure": f"/machines?fields=raw page of {page}", "inline": inline_page, "hashed": hashed_page},
+        {"measure": "total stored bytes", "inline": inline_rows, "hashed": hashed_rows + store},
+    ]
+    for row in rows:
+        row["saved"] = f"{100 * (1 - row['hashed'] / row['inline']):.0f}%"
+    harness.print_table(rows, ["measure", "inline", "hashed", "saved"])
+    print(f"{len(blobs)} distinct blobs for {len(reports)} machines ({store} bytes compressed)")
+    if args.out:
+        harness.save(args.out, "raw_blobs", vars(args), {"rows": rows, "distinct_blobs": len(blobs)})
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Ingest throughput of serve.py's pre-fork runner by worker count.
+
+    python -m benchmarks.scaling [--workers 1,2,4] [--clients P] [--concurrency C]
+                                 [--machines N] [--duration S] [--out FILE]
+
+For each worker count a fresh SQLite backend is started with serve.py and
+seeded, then P client processes of C closed-loop threads each post /report
+for the given duration, so the load generator is not the bottleneck the
+way a single Python client is. Reports total reports/s, the speedup over
+one worker and the per-worker efficiency. Client and server share the
+host, so leave cores for the clients (see the `cpus` field).
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import harness
+from benchmarks.fleet import make_fleet
+from benchmarks.loadgen import free_port, run_load, seed, start_backend
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    counts, n = [], 1
+    while n <= cpus:
+        counts.append(n)
+        n *= 2
+    return ",".join(map(str, counts if len(counts) > 1 else [1, 2]))
+
+
+def client(url, machines, seed_value, part, parts, duration, concurrency):
+    fleet = make_fleet(machines, seed_value)[part::parts]
+    return run_load(url, fleet, {"report": 1}, duration, concurrency)
+
+
+def measure(workers, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, url = start_backend(Path(tmp) / "bench.db", free_port(), workers=workers)
+        try:
+            seed(url, make_fleet(args.machines, args.seed))
+            time.sleep(1.0)  # let the write buffers flush the seed
+            with multiprocessing.Pool(args.clients) as pool:
+                runs = pool.starmap(client, [(url, args.machines, args.seed, i, args.clients, args.duration,
+                                              args.concurrency) for i in range(args.clients)])
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+    reports = [r["operations"]["report"] for r in runs]
+    errors = sum(n for r in reports for status, n in r["statuses"].items() if status != "200")
+    return {
+        "workers": workers,
+        "reports_per_s": round(sum(r["throughput_rps"] for r in reports), 1),
+        "p50_ms": round(sorted(r["p50_ms"] for r in reports)[len(reports) // 2], 3),
+        "p99_ms": max(r["p99_ms"] for r in reports),  # worst client
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default=default_workers(), help="comma separated worker counts")
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--concurrency", type=int, default=8, help="threads per client process")
+    parser.add_argument("--machines", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    rows = [measure(int(n), args) for n in args.workers.split(",") if n.strip()]
+    base = rows[0]["reports_per_s"] / rows[0]["workers"]
+    for row in rows:
+        row["speedup"] = round(row["reports_per_s"] / (base or 1), 2)
+        row["efficiency"] = round(row["speedup"] / row["workers"], 2)
+
+    harness.print_table(rows, ["workers", "reports_per_s", "speedup", "efficiency", "p50_ms", "p99_ms", "errors"])
+    print(f"{os.cpu_count()} cpus shared by {args.clients} client processes and the backend")
+    if args.out:
+        harness.save(args.out, "scaling", {**vars(args), "cpus": os.cpu_count()}, {"runs": rows})
+    return rows
+
+
+if __name__ == "__main__":
+    main()
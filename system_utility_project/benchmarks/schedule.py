@@ -0,0 +1,138 @@
+"""
+Simulated week of check runs: the fixed 30-minute sweep against the
+adaptive per-check scheduler.
+
+    python -m benchmarks.schedule [--os linux,macos,windows] [--days N] [--seed S] [--out FILE]
+
+Each check costs what its commands took on the fixture host. Its state
+flips at random with a per-check rate; a flip is detected at the check's
+next run. Reports check seconds spent per day and detection latency.
+"""
+import argparse
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, replay
+
+FIXED_INTERVAL = 1800
+# Expected state changes per check per day.
+CHANGE_RATES = {"os_update": 1.0, "disk_encryption": 0.02, "antivirus": 0.1, "inactivity_sleep": 0.2}
+
+
+def check_costs(name):
+    """Seconds each check's commands took on the fixture host (plus the machine-id read)."""
+    with replay(name) as (module, runner):
+        costs = {}
+        for check, fn in {"machine_id": module.machine_id, **module.CHECKS}.items():
+            runner.calls.clear()
+            fn()
+            costs[check] = sum((runner.lookup(cmd) or {}).get("ms", 0) for cmd in runner.calls) / 1000
+    return costs
+
+
+def change_times(rng, checks, seconds):
+    """{check: sorted times its state flips} as a Poisson process per check."""
+    times = {}
+    for check in checks:
+        rate = CHANGE_RATES.get(check, 0.1) / 86400
+        t, flips = 0.0, []
+        while rate:
+            t += rng.expovariate(rate)
+            if t >= seconds:
+                break
+            flips.append(t)
+        times[check] = flips
+    return times
+
+
+def state_at(flips, t):
+    return sum(1 for f in flips if f <= t)
+
+
+def detections(flips, runs):
+    """Latency from each flip to the first run at or after it."""
+    runs = sorted(runs)
+    latencies = []
+    for f in flips:
+        later = [r for r in runs if r >= f]
+        if later:
+            latencies.append(later[0] - f)
+    return latencies
+
+
+def simulate_fixed(costs, checks, seconds, flips):
+    runs = [t for t in range(0, int(seconds), FIXED_INTERVAL)]
+    # Every cycle ran every check and re-read the machine id.
+    spent = len(runs) * (sum(costs[c] for c in checks) + costs["machine_id"])
+    return spent, {c: detections(flips[c], runs) for c in checks}, len(runs) * len(checks)
+
+
+def simulate_adaptive(costs, checks, schedules, seconds, flips, seed):
+    from system_utility.schedule import Scheduler
+
+    now = [0.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = Scheduler(schedules, path=Path(tmp) / "schedule.json", clock=lambda: now[0],
+                              rng=random.Random(seed))
+        observed, runs = {}, {c: [] for c in checks}
+        spent, count = costs["machine_id"], 0  # the id is read once per process
+        while now[0] < seconds:
+            due = scheduler.due()
+            current = {c: {"state": state_at(flips[c], now[0])} for c in due}
+            timings = {"checks": {c: {"ms": costs[c] * 1000} for c in due}}
+            for c in due:
+                runs[c].append(now[0])
+            spent += sum(costs[c] for c in due)
+            count += len(due)
+            scheduler.record(observed, current, timings)
+            observed.update(current)
+            now[0] += max(1.0, scheduler.next_due_in())
+    return spent, {c: detections(flips[c], runs[c]) for c in checks}, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--os", default=",".join(PLATFORMS))
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    seconds = args.days * 86400
+    results, rows = {}, []
+    with tempfile.TemporaryDirectory() as state:
+        os.environ["SYSTEM_UTILITY_STATE_DIR"] = state
+        for name in [p.strip() for p in args.os.split(",") if p.strip()]:
+            module = PLATFORMS[name]
+            checks = list(module.CHECKS)
+            schedules = {c: module.CHECK_SCHEDULES.get(c, {}) for c in checks}
+            costs = check_costs(name)
+            flips = change_times(random.Random(args.seed), checks, seconds)
+            results[name] = {}
+            for mode, (spent, latencies, count) in (
+                ("fixed", simulate_fixed(costs, checks, seconds, flips)),
+                ("adaptive", simulate_adaptive(costs, checks, schedules, seconds, flips, args.seed)),
+            ):
+                per_check = {c: harness.latency_summary(latencies[c]) for c in checks}
+                results[name][mode] = {
+                    "check_seconds_per_day": round(spent / args.days, 2),
+                    "check_runs_per_day": round(count / args.days, 1),
+                    "detection": {c: {"p50_min": round(s["p50_ms"] / 60000, 1), "max_min": round(s["max_ms"] / 60000, 1)}
+                                  for c, s in per_check.items() if s["count"]},
+                }
+                rows.append({"os": name, "mode": mode, **results[name][mode],
+                             **{c: f"{d['p50_min']}/{d['max_min']}" for c, d in results[name][mode]["detection"].items()}})
+
+    checks = list(CHANGE_RATES)
+    harness.print_table(rows, ["os", "mode", "check_seconds_per_day", "check_runs_per_day", *checks])
+    print("(detection columns: p50/max minutes from a state change to the run that saw it)")
+    if args.out:
+        harness.save(args.out, "schedule", vars(args), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
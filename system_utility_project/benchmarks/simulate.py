@@ -0,0 +1,343 @@
+"""
+Thousands of virtual agents, driven by recorded check output, against a backend.
+
+    python -m benchmarks.simulate [--agents N] [--duration S] [--interval S]
+                                  [--storm-at S] [--storm-duration S]
+                                  [--workers W] [--url URL] [--out FILE]
+
+Each agent is an asyncio task with its own OS (weighted as fleet.OS_MIX)
+and a set of fixture scenarios (FileVault off, updates pending, ...) that
+drifts over time. Its report comes from the real check code replaying
+benchmarks/fixtures/<os>.json through utils.use_runner, collected once per
+distinct OS and scenario set and shared. Agents send like the daemon:
+a versioned delta against what was acknowledged, a full report when there
+is none or the backend answers 409, raw output by hash with uploads of
+`missing_blobs`, and jittered exponential backoff after failures.
+
+Without --url a SQLite backend is started on a free port (serve.py with
+--workers, uvicorn otherwise). --storm-at stops that backend for
+--storm-duration seconds and restarts it on the same port and database,
+so every agent reconnects at once. Reports throughput, latency, statuses,
+a per-second timeline and how long the fleet took to recover.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import harness
+from benchmarks.fakes import PLATFORMS, fixture_host, load_fixture
+from benchmarks.fleet import OS_MIX, RELEASES
+from benchmarks.loadgen import free_port, start_backend
+from system_utility.blobs import offload
+from system_utility.delta import AckState
+from system_utility.replay import ReplayRunner
+from system_utility.reporter import API_KEY, encode_body
+from system_utility.utils import use_runner
+
+# Share of an agent's report interval its start is spread over, and of each
+# interval that is jittered, as real agents boot and drift out of phase.
+INTERVAL_JITTER = 0.2
+# Seconds the acknowledged rate must hold for the fleet to count as recovered.
+RECOVERY_WINDOW = 5
+
+
+class MemoryBlobs(dict):
+    """blobs.BlobCache in memory, shared by every agent in the process."""
+
+    def put(self, sha, text):
+        self[sha] = text
+
+
+class MemoryAck(AckState):
+    """AckState without its file: what the backend acknowledged, kept per agent in memory."""
+
+    def __init__(self):
+        self.version = 0
+        self.results = None
+
+    def ack(self, results, version):
+        self.results = results
+        self.version = version
+
+
+class Reports:
+    """Reports collected through the platform checks, once per OS and scenario set."""
+
+    def __init__(self):
+        self.fixtures = {name: load_fixture(name) for name in PLATFORMS}
+        self._memo = {}
+
+    def scenarios(self, name):
+        return sorted(self.fixtures[name].get("scenarios", {}))
+
+    def conflicts(self, name, scenario):
+        """Scenarios replaying any of the same commands as `scenario`."""
+        available = self.fixtures[name].get("scenarios", {})
+        matches = {entry["match"] for entry in available[scenario]}
+        return {other for other, entries in available.items()
+                if other != scenario and matches & {entry["match"] for entry in entries}}
+
+    def get(self, name, scenarios):
+        key = (name, frozenset(scenarios))
+        if key not in self._memo:
+            fixture = self.fixtures[name]
+            with fixture_host(fixture.get("env", {}).get("package_manager")), \
+                    use_runner(ReplayRunner(fixture, sorted(scenarios))):
+                report = PLATFORMS[name].collect()
+            report.update(system=fixture["os"], release=RELEASES[fixture["os"]], version="simulated")
+            self._memo[key] = report
+        return self._memo[key]
+
+    def __len__(self):
+        return len(self._memo)
+
+
+class Stats:
+    def __init__(self, started):
+        self.started = started
+        self.latencies = {}
+        self.statuses = {}
+        self.timeline = {}  # second -> [sent, ok]
+
+    def record(self, op, seconds, status):
+        ok = isinstance(status, int) and 200 <= status < 300
+        if ok:
+            self.latencies.setdefault(op, []).append(seconds)
+        counts = self.statuses.setdefault(op, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        bucket = self.timeline.setdefault(int(time.monotonic() - self.started), [0, 0])
+        bucket[0] += 1
+        bucket[1] += ok
+
+
+class Simulation:
+    def __init__(self, url, args):
+        self.url = url
+        self.args = args
+        self.reports = Reports()
+        self.blobs = MemoryBlobs()
+        self.stats = Stats(time.monotonic())
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        self.client = httpx.AsyncClient(
+            limits=limits, timeout=httpx.Timeout(30.0, connect=5.0),
+            headers={"x-api-key": API_KEY, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        # Agents queue here rather than in httpcore's pool, whose wait queue
+        # is rescanned on every request and stalls the loop once thousands
+        # of agents retry at once.
+        self.slots = asyncio.Semaphore(args.connections)
+
+    async def post(self, op, path, payload):
+        """
+        POST `payload`, upload blobs it is missing; the status, or "network"
+        on a transport error. Latency is timed once a connection slot is free.
+        """
+        body = encode_body(payload)
+        async with self.slots:
+            started = time.monotonic()
+            try:
+                r = await self.client.post(self.url + path, content=body)
+            except httpx.HTTPError:
+                self.stats.record(op, time.monotonic() - started, "network")
+                return "network"
+            self.stats.record(op, time.monotonic() - started, r.status_code)
+        if r.is_success and op != "blobs":
+            missing = r.json().get("missing_blobs") or []
+            texts = {sha: self.blobs[sha] for sha in missing if sha in self.blobs}
+            if texts:
+                await self.post("blobs", "/blobs", {"blobs": texts})
+        return r.status_code
+
+
+class VirtualAgent:
+    """One simulated machine: its OS, drifting scenarios and acknowledged state."""
+
+    def __init__(self, index, sim, rng):
+        self.machine_id = f"sim-{index:06d}"
+        self.sim = sim
+        self.rng = rng
+        system = rng.choices([o for o, _ in OS_MIX], [w for _, w in OS_MIX])[0]
+        self.platform = next(name for name, f in sim.reports.fixtures.items() if f["os"] == system)
+        self.scenarios = set()
+        for scenario in sim.reports.scenarios(self.platform):
+            if rng.random() < sim.args.scenario_rate:
+                self.toggle(scenario)
+        self.state = MemoryAck()
+        self.failures = 0
+
+    def toggle(self, scenario):
+        if scenario in self.scenarios:
+            self.scenarios.discard(scenario)
+        else:
+            self.scenarios -= self.sim.reports.conflicts(self.platform, scenario)
+            self.scenarios.add(scenario)
+
+    def drift(self):
+        if self.rng.random() < self.sim.args.drift:
+            self.toggle(self.rng.choice(self.sim.reports.scenarios(self.platform)))
+
+    def results(self):
+        report = self.sim.reports.get(self.platform, self.scenarios)
+        return {**report, "machine_id": self.machine_id,
+                "checked_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+
+    async def send(self):
+        """daemon.send with a heartbeat every cycle; True once the backend acknowledged."""
+        results = self.results()
+        delta = self.state.delta(results)
+        if delta is not None:
+            status = await self.sim.post("delta", "/report/delta", offload(delta, self.sim.blobs))
+            if status == 200:
+                self.state.ack(results, delta["version"])
+                return True
+            if status != 409:
+                return False
+        version = self.state.version + 1
+        status = await self.sim.post("report", "/report", offload({**results, "report_version": version}, self.sim.blobs))
+        if status == 200:
+            self.state.ack(results, version)
+            return True
+        return False
+
+    async def run(self):
+        interval = self.sim.args.interval
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        while True:
+            self.drift()
+            if await self.send():
+                self.failures = 0
+                delay = interval * self.rng.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+            else:
+                # reporter.ReportClient's full jitter, scaled down to simulation time.
+                self.failures += 1
+                delay = self.rng.uniform(0, min(self.sim.args.backoff_max, self.sim.args.backoff_base * 2 ** self.failures))
+            await asyncio.sleep(delay)
+
+
+async def storm(args, backend, db_path, port, events):
+    """Stop the backend at --storm-at and restart it --storm-duration seconds later."""
+    await asyncio.sleep(args.storm_at)
+    proc = backend[0]
+    events["stopped"] = time.monotonic()
+    proc.terminate()
+    await asyncio.to_thread(proc.wait, 60)
+    await asyncio.sleep(max(0.0, events["stopped"] + args.storm_duration - time.monotonic()))
+    events["restarting"] = time.monotonic()
+    backend[0], _ = await asyncio.to_thread(start_backend, db_path, port, workers=args.workers)
+    events["ready"] = time.monotonic()
+
+
+def recovery(stats, events, duration):
+    """
+    Seconds from the backend being ready again until acknowledged requests/s,
+    averaged over RECOVERY_WINDOW seconds, is back to 90% of before the storm.
+    """
+    # The second half of the run before the storm, once every agent has started.
+    before = [stats.timeline.get(s, [0, 0])[1] for s in range(int(events["stopped"] - stats.started))]
+    before = before[len(before) // 2:]
+    steady = sum(before) / max(1, len(before))
+    ready = int(events["ready"] - stats.started)
+    after = range(ready, int(duration) + 1)
+    ok = [stats.timeline.get(s, [0, 0])[1] for s in after]
+    window = RECOVERY_WINDOW
+    recovered = next((i for i in range(len(ok) - window + 1) if sum(ok[i:i + window]) >= 0.9 * steady * window), None)
+    return {
+        "steady_ok_per_s": round(steady, 1),
+        "restart_s": round(events["ready"] - events["restarting"], 2),
+        "recovery_s": recovered,
+        "peak_requests_per_s": max((stats.timeline.get(s, [0, 0])[0] for s in after), default=0),
+    }
+
+
+async def simulate(url, args, backend=None, db_path=None, port=None):
+    sim = Simulation(url, args)
+    rng = random.Random(args.seed)
+    agents = [VirtualAgent(i, sim, random.Random(rng.random())) for i in range(args.agents)]
+    tasks = [asyncio.create_task(agent.run()) for agent in agents]
+    events = {}
+    storm_task = None
+    if args.storm_at is not None:
+        storm_task = asyncio.create_task(storm(args, backend, db_path, port, events))
+    await asyncio.sleep(args.duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if storm_task is not None:
+        await storm_task
+    await sim.client.aclose()
+    return sim, agents, events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--interval", type=float, default=15.0, help="seconds between an agent's reports")
+    parser.add_argument("--drift", type=float, default=0.05, help="chance per report that a scenario toggles")
+    parser.add_argument("--scenario-rate", type=float, default=0.2, help="chance each scenario starts active")
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connections shared by the agents")
+    parser.add_argument("--backoff-base", type=float, default=1.0)
+    parser.add_argument("--backoff-max", type=float, default=30.0)
+    parser.add_argument("--storm-at", type=float, help="stop the backend after this many seconds")
+    parser.add_argument("--storm-duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, help="run serve.py with this many workers")
+    parser.add_argument("--url", help="use a running backend instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+    if args.url and args.storm_at is not None:
+        parser.error("--storm-at needs the backend this benchmark starts; drop --url")
+    if args.storm_at is not None and args.storm_at + args.storm_duration >= args.duration:
+        parser.error("the storm must end before --duration")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SYSTEM_UTILITY_STATE_DIR"] = tmp
+        backend, db_path, port, url = [None], Path(tmp) / "simulate.db", None, args.url
+        if url is None:
+            port = free_port()
+            backend[0], url = start_backend(db_path, port, workers=args.workers)
+        try:
+            sim, agents, events = asyncio.run(simulate(url, args, backend, db_path, port))
+        finally:
+            if backend[0] is not None:
+                backend[0].terminate()
+                backend[0].wait(timeout=60)
+
+    stats = sim.stats
+    rows = []
+    for op, counts in sorted(stats.statuses.items()):
+        total = sum(counts.values())
+        rows.append({"operation": op, "requests": total, "per_s": round(total / args.duration, 1),
+                     **harness.latency_summary(stats.latencies.get(op, [])),
+                     "errors": total - sum(n for status, n in counts.items() if status.startswith("2"))})
+    harness.print_table(rows, ["operation", "requests", "per_s", "p50_ms", "p99_ms", "max_ms", "errors"])
+    mix = {}
+    for agent in agents:
+        mix[agent.platform] = mix.get(agent.platform, 0) + 1
+    print(f"{args.agents} agents ({', '.join(f'{n} {name}' for name, n in sorted(mix.items()))}), "
+          f"{len(sim.reports)} distinct reports collected, {len(sim.blobs)} raw blobs, "
+          f"client RSS {harness.rss_mb()} MiB")
+    results = {
+        "operations": rows,
+        "statuses": stats.statuses,
+        "timeline": [{"second": s, "sent": sent, "ok": ok} for s, (sent, ok) in sorted(stats.timeline.items())],
+        "platforms": mix,
+        "client_rss_mb": harness.rss_mb(),
+    }
+    if events.get("ready"):
+        results["storm"] = recovery(stats, events, args.duration)
+        print("storm: " + ", ".join(f"{k} {v}" for k, v in results["storm"].items()))
+    if args.out:
+        harness.save(args.out, "simulate", vars(args), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
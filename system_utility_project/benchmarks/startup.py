@@ -0,0 +1,83 @@
+"""
+Agent import time and cold-start-to-report latency.
+
+    python -m benchmarks.startup [--runs N] [--binary PATH] [--out FILE]
+
+Every sample is a fresh process. Import rows time `python -c "import ..."`
+for the interpreter alone, the agent's entry module as it loads now, and
+the same plus every platform's checks and requests, which is what it
+loaded before those became lazy. The report rows time `--once` against a
+local SQLite backend: first with an empty state directory (every check
+runs, full report) and then repeated with it (nothing due, a heartbeat).
+The checks are this host's real ones. --binary times a PyInstaller build
+instead of `python -m system_utility`.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import harness
+from benchmarks.loadgen import free_port, start_backend
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+IMPORTS = {
+    "interpreter": "pass",
+    "import daemon": "import system_utility.daemon",
+    "eager imports": "import system_utility.daemon, system_utility.checks.linux, system_utility.checks.macos, "
+                     "system_utility.checks.windows, requests",
+}
+
+
+def timed_run(command, env=None):
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=PROJECT_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"{' '.join(command)} failed ({result.returncode}): {result.stderr[-2000:]}")
+    return elapsed, result.stdout
+
+
+def import_row(name, code, runs):
+    samples = [timed_run([sys.executable, "-c", code])[0] for _ in range(runs)]
+    _, out = timed_run([sys.executable, "-c", f"{code}\nimport sys; print(len(sys.modules))"])
+    return {"phase": name, **harness.latency_summary(samples), "modules": int(out.split()[-1])}
+
+
+def report_rows(agent, runs):
+    first, repeat = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, url = start_backend(Path(tmp) / "startup.db", free_port())
+        try:
+            for i in range(runs):
+                env = {**os.environ, "SYSTEM_UTILITY_ENDPOINT": url + "/report",
+                       "SYSTEM_UTILITY_STATE_DIR": str(Path(tmp) / f"state-{i}")}
+                first.append(timed_run([*agent, "--once", "--jitter", "0"], env)[0])
+                repeat.append(timed_run([*agent, "--once", "--jitter", "0"], env)[0])
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+    return [{"phase": "--once, first report", **harness.latency_summary(first)},
+            {"phase": "--once, repeated", **harness.latency_summary(repeat)}]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--binary", help="a frozen agent build to time instead of python -m system_utility")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    rows = [] if args.binary else [import_row(name, code, args.runs) for name, code in IMPORTS.items()]
+    rows += report_rows([args.binary] if args.binary else [sys.executable, "-m", "system_utility"], args.runs)
+    harness.print_table(rows, ["phase", "p50_ms", "p99_ms", "max_ms", "modules"])
+    if args.out:
+        harness.save(args.out, "startup", vars(args), {"phases": rows})
+    return rows
+
+
+if __name__ == "__main__":
+    main()
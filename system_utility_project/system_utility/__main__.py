@@ -0,0 +1,6 @@
+"""`python -m system_utility [--once]`, also the entry point of the PyInstaller build."""
+import sys
+
+from system_utility.daemon import main
+
+sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Raw command output sent by content hash.
+
+Reports carry `raw_sha256` in place of each check's raw output. The text
+is kept in a small on-disk cache and uploaded only when the backend lists
+its hash under `missing_blobs`, which after the first report from any
+machine in the fleet is almost never. Output no longer than a hash is
+left inline.
+"""
+import hashlib
+import json
+import os
+
+from system_utility.utils import state_dir
+
+INLINE_RAW_BYTES = 64
+MAX_CACHED_BLOBS = 256
+
+
+def encode(value):
+    """Canonical text of a raw value; must match system_utility_backend/blobs.py."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BlobCache:
+    """Blob texts by hash, so a spooled report can still answer for its hashes after a restart."""
+
+    def __init__(self, path=None, max_blobs=MAX_CACHED_BLOBS):
+        self.path = path or state_dir() / "blobs"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_blobs = max_blobs
+
+    def put(self, sha, text):
+        target = self.path / sha
+        if target.exists():
+            os.utime(target)
+            return
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, target)
+        self._prune()
+
+    def get(self, sha):
+        try:
+            return (self.path / sha).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _prune(self):
+        entries = sorted(self.path.iterdir(), key=lambda p: p.stat().st_mtime)
+        for old in entries[:max(0, len(entries) - self.max_blobs)]:
+            old.unlink(missing_ok=True)
+
+
+def offload(payload, cache):
+    """
+    Copy of a report or delta with each large `raw` value replaced by its
+    `raw_sha256`; the texts go into `cache`.
+    """
+    if not payload.get("checks"):
+        return payload
+    checks = {}
+    for name, doc in payload["checks"].items():
+        if isinstance(doc, dict) and "raw" in doc:
+            text = encode(doc["raw"])
+            if len(text.encode()) > INLINE_RAW_BYTES:
+                sha = digest(text)
+                cache.put(sha, text)
+                doc = {**{k: v for k, v in doc.items() if k != "raw"}, "raw_sha256": sha}
+        checks[name] = doc
+    return {**payload, "checks": checks}
@@ -0,0 +1,69 @@
+"""On-disk result cache keyed on the mtimes of the files a result depends on."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from system_utility.utils import state_dir
+
+# How long a cached update result stays valid while its inputs are unchanged.
+DEFAULT_TTL = int(os.environ.get("SYSTEM_UTILITY_UPDATE_TTL", 6 * 3600))
+
+_lock = threading.Lock()
+
+def fingerprint(paths):
+    """mtime_ns of every existing path; directories use their own mtime."""
+    fp = {}
+    for p in paths:
+        try:
+            fp[str(p)] = Path(p).stat().st_mtime_ns
+        except OSError:
+            continue
+    return fp
+
+def _cache_file():
+    return state_dir() / "cache.json"
+
+def _load():
+    try:
+        return json.loads(_cache_file().read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _store(data):
+    path = _cache_file()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+def cached(key, paths, compute, ttl=None):
+    """
+    Return the cached result for `key` if neither its TTL has expired nor any
+    of `paths` has changed since it was stored; otherwise run `compute()`.
+    Failed results (timed out, unsupported, or carrying an "error") are
+    returned but not stored, so the next run asks again.
+    """
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    fp = fingerprint(paths)
+    with _lock:
+        entry = _load().get(key)
+    if entry and entry.get("fingerprint") == fp and time.time() - entry.get("stored_at", 0) < ttl:
+        return {**entry["result"], "cached": True}
+
+    result = compute()
+    if not result.get("timed_out") and result.get("supported") and not result.get("error"):
+        with _lock:
+            data = _load()
+            data[key] = {"fingerprint": fp, "stored_at": time.time(), "result": result}
+            _store(data)
+    return result
+
+def invalidate(key=None):
+    with _lock:
+        data = _load()
+        if key is None:
+            data = {}
+        else:
+            data.pop(key, None)
+        _store(data)
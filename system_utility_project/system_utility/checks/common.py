@@ -1,6 +1,20 @@
+import contextvars
 import platform
+import threading
+import time
+from collections import deque
 from datetime import datetime, timezone
 
+from system_utility import instrument
+from system_utility.utils import with_deadline
+
+# Deadline applied to any check without an entry in the module's CHECK_TIMEOUTS.
+DEFAULT_CHECK_TIMEOUT = 60
+MAX_WORKERS = 4
+# Longest sleep/screen-lock timeout the agent itself calls compliant. The
+# backend re-judges reports against its own policy (compliance.py there).
+MAX_SLEEP_SECONDS = 600
+
 def base_system():
     return {
         "system": platform.system(),
@@ -13,3 +27,97 @@ def base_system():
 def any_file_exists(paths):
     from pathlib import Path
     return any(Path(p).exists() for p in paths)
+
+def run_concurrently(checks, timeouts=None, max_workers=MAX_WORKERS, records=None):
+    """
+    Run check callables on at most `max_workers` threads, each against its
+    own deadline, counted from when the check starts running.
+
+    A check that misses its deadline is reported as timed out; the others are
+    not held up by it. Commands a check runs are killed at its deadline (see
+    utils.run_cmd); a check stuck anywhere else is abandoned to its daemon
+    thread, which exits once it returns, and a new thread takes its place so
+    the queued checks still run. A check that raises is reported as
+    unsupported. If `records` is given it is filled with each check's
+    instrument record.
+    """
+    timeouts = timeouts or {}
+    records = {} if records is None else records
+    queue = deque(checks.items())
+    for name in checks:
+        records[name] = instrument.new_record()
+    changed = threading.Condition()
+    deadlines, outcomes, abandoned = {}, {}, set()
+
+    def work():
+        while True:
+            try:
+                name, fn = queue.popleft()
+            except IndexError:
+                return
+            with changed:
+                deadlines[name] = time.monotonic() + timeouts.get(name, DEFAULT_CHECK_TIMEOUT)
+                changed.notify_all()
+            try:
+                outcome = (True, with_deadline(deadlines[name], instrument.timed, fn, records[name]))
+            except Exception as e:
+                outcome = (False, e)
+            with changed:
+                outcomes[name] = outcome
+                changed.notify_all()
+                if name in abandoned:
+                    return  # a replacement thread has taken this one's place
+
+    def start_worker():
+        # Each worker runs in a copy of the caller's context, so a command
+        # runner installed with utils.use_runner reaches the check threads.
+        threading.Thread(target=contextvars.copy_context().run, args=(work,),
+                         name="check-worker", daemon=True).start()
+
+    for _ in range(min(max_workers, len(checks))):
+        start_worker()
+    results = {}
+    with changed:
+        while len(results) < len(checks):
+            now = time.monotonic()
+            for name in checks:
+                if name in results:
+                    continue
+                if name in outcomes:
+                    ok, value = outcomes[name]
+                    results[name] = value if ok else {"supported": False, "error": str(value), "raw": str(value)}
+                elif name in deadlines and now >= deadlines[name]:
+                    # Never block on a hung check: abandon it and keep the pool at full strength.
+                    abandoned.add(name)
+                    results[name] = {
+                        "supported": True,
+                        "timed_out": True,
+                        "error": f"check exceeded {timeouts.get(name, DEFAULT_CHECK_TIMEOUT)}s",
+                        "raw": "",
+                    }
+                    start_worker()
+            running = [deadlines[n] for n in deadlines if n not in results]
+            if len(results) < len(checks):
+                changed.wait(max(0.0, min(running) - now) if running else None)
+    return results
+
+# machine_id function -> its value; the id never changes while the agent runs
+# and on macOS/Windows reading it costs a process spawn.
+_machine_ids = {}
+
+def collect(machine_id, checks, timeouts=None, only=None):
+    """Build the report document, running the selected checks concurrently."""
+    base = base_system()
+    selected = {name: fn for name, fn in checks.items() if only is None or name in only}
+    records = {}
+    started = time.perf_counter()
+    results = run_concurrently(selected, timeouts, records=records)
+    if machine_id not in _machine_ids:
+        _machine_ids[machine_id] = machine_id()
+    return {
+        **base,
+        "machine_id": _machine_ids[machine_id],
+        "checks": results,
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+        "timings": instrument.summary(records, time.perf_counter() - started),
+    }
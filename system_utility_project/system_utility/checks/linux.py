@@ -2,18 +2,25 @@
 import re
 import os
 import json
-import subprocess
-from datetime import datetime, timezone
+import shutil
+import functools
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Tuple
 
-from .common import base_system
+from . import common, probes, systemd
+from .. import cache
 from ..utils import run_cmd
 
+# Read kernel, sysfs and desktop state from files before falling back to
+# commands; set SYSTEM_UTILITY_NATIVE_PROBES=0 to force the command path.
+NATIVE_PROBES = os.environ.get("SYSTEM_UTILITY_NATIVE_PROBES", "1") != "0"
+
 def machine_id() -> str:
     """Get system machine ID."""
     try:
-      
+        if NATIVE_PROBES:
+            return probes.machine_id() or probes.hostname() or "LINUX-UNKNOWN"
+
         if os.path.exists("/etc/machine-id"):
             with open("/etc/machine-id", "r") as f:
                 return f.read().strip()
@@ -25,6 +32,25 @@ def machine_id() -> str:
 
 def disk_encryption() -> Dict[str, Any]:
     """Check disk encryption status."""
+    # Opened dm-crypt mappings come from sysfs; LUKS partitions that are not
+    # opened (which lsblk lists as crypto_LUKS) only from the udev database.
+    luks = probes.luks_partitions() if NATIVE_PROBES else None
+    if luks is not None and probes.sysfs_available():
+        try:
+            crypt = probes.crypt_devices()
+            root_dev = probes.root_source()
+            root_encrypted = probes.is_encrypted(root_dev)
+            return {
+                "supported": True,
+                "status": bool(crypt) or bool(luks) or root_encrypted,
+                "root_encrypted": root_encrypted,
+                "crypt_devices": crypt,
+                "luks_partitions": luks,
+                "raw": f"root={root_dev} luks={','.join(crypt) or '-'} partitions={','.join(luks) or '-'}"
+            }
+        except Exception:
+            pass
+
     try:
        
         out, err, _ = run_cmd(["lsblk", "-o", "FSTYPE,LABEL,MOUNTPOINT", "-l", "-n"])
@@ -38,10 +64,7 @@ def disk_encryption() -> Dict[str, Any]:
      
         root_encrypted = False
         try:
-            root_dev = subprocess.check_output(
-                ["findmnt", "-n", "-o", "SOURCE", "/"],
-                stderr=subprocess.DEVNULL
-            ).decode().strip()
+            root_dev, _, _ = run_cmd(["findmnt", "-n", "-o", "SOURCE", "/"])
             if root_dev:
                 out, _, _ = run_cmd(["lsblk", "-o", "FSTYPE", "-n", "-l", root_dev])
                 root_encrypted = "crypto_LUKS" in out
@@ -57,41 +80,69 @@ def disk_encryption() -> Dict[str, Any]:
     except Exception as e:
         return {"supported": False, "status": None, "error": str(e), "raw": str(e)}
 
+def _check_update(out: str, rc: int) -> Optional[bool]:
+    """dnf/yum check-update: 0 up to date, 100 updates available, anything else failed."""
+    return {0: True, 100: False}.get(rc)
+
+def _pacman_updates(out: str, rc: int) -> Optional[bool]:
+    """pacman -Qu lists upgrades and exits 1 when there are none."""
+    if rc == 0:
+        return not out.strip()
+    return True if rc == 1 and not out.strip() else None
+
+# (name, command, parser of (stdout, exitcode) -> up_to_date, package/metadata db paths).
+# Parsers return None when the query failed, so a failure never reads as up to date.
+PKG_MANAGERS = [
+    ("apt", ["apt", "list", "--upgradable"],
+     lambda out, rc: None if rc != 0 else not any(l and not l.startswith("Listing") for l in out.splitlines()),
+     ["/var/lib/dpkg/status", "/var/lib/apt/lists", "/var/cache/apt/pkgcache.bin"]),
+    ("dnf", ["dnf", "check-update", "--quiet"], _check_update,
+     ["/var/lib/rpm", "/var/lib/rpm/rpmdb.sqlite", "/usr/lib/sysimage/rpm/rpmdb.sqlite", "/var/cache/dnf"]),
+    ("yum", ["yum", "check-update", "--quiet"], _check_update,
+     ["/var/lib/rpm", "/var/lib/rpm/Packages", "/var/cache/yum"]),
+    ("pacman", ["pacman", "-Qu"], _pacman_updates,
+     ["/var/lib/pacman/local", "/var/lib/pacman/sync"]),
+    ("zypper", ["zypper", "--quiet", "list-updates"],
+     lambda out, rc: None if rc != 0 else not any(l.startswith("v ") for l in out.splitlines()),
+     ["/var/lib/rpm", "/usr/lib/sysimage/rpm/rpmdb.sqlite", "/var/cache/zypp/raw"]),
+]
+
+@functools.lru_cache(maxsize=None)
+def package_manager() -> Optional[tuple]:
+    """Detect the host's package manager once per process."""
+    for entry in PKG_MANAGERS:
+        if shutil.which(entry[0]):
+            return entry
+    return None
+
 def os_update_status() -> Dict[str, Any]:
-    """Check for available OS updates."""
-    pkg_managers = [
-   
-        ("apt", "apt list --upgradable 2>/dev/null | wc -l", 
-         lambda x: int(x.strip()) == 1),  # Header line means no updates
-        ("dnf", "dnf check-update --quiet 2>/dev/null; echo $?", 
-         lambda x: x.strip() == "100"),  # 100 means updates available
-        ("yum", "yum check-update --quiet 2>/dev/null; echo $?", 
-         lambda x: x.strip() == "100"),  # 100 means updates available
-        ("pacman", "pacman -Qu | wc -l", 
-         lambda x: int(x.strip()) == 0),  # 0 means no updates
-        ("zypper", "zypper list-updates 2>&1 | grep -v 'No updates' | wc -l", 
-         lambda x: int(x.strip()) == 0)   # 0 means no updates
-    ]
-    
-    for pkg, check_cmd, parse_func in pkg_managers:
-        try:
-            out, _, _ = run_cmd(["bash", "-lc", f"command -v {pkg} >/dev/null && ({check_cmd}) || echo 'not_found'"])
-            if "not_found" not in out:
-                return {
-                    "supported": True,
-                    "up_to_date": parse_func(out),
-                    "package_manager": pkg,
-                    "raw": out.strip()
-                }
-        except Exception as e:
-            continue
-            
-    return {
-        "supported": False, 
-        "up_to_date": None, 
-        "error": "No supported package manager found",
-        "raw": ""
-    }
+    """Check for available OS updates, reusing the cached result while the package db is unchanged."""
+    pm = package_manager()
+    if pm is None:
+        return {
+            "supported": False,
+            "up_to_date": None,
+            "error": "No supported package manager found",
+            "raw": ""
+        }
+    pkg, check_cmd, parse_func, db_paths = pm
+
+    def query():
+        out, err, rc = run_cmd(check_cmd, timeout=240)
+        if rc == 124 and not out:
+            return {"supported": True, "up_to_date": None, "timed_out": True, "package_manager": pkg, "error": err, "raw": err}
+        up_to_date = parse_func(out, rc)
+        if up_to_date is None:
+            return {"supported": True, "up_to_date": None, "package_manager": pkg,
+                    "error": err.strip() or f"{pkg} exited with {rc}", "raw": out.strip() or err.strip()}
+        return {
+            "supported": True,
+            "up_to_date": up_to_date,
+            "package_manager": pkg,
+            "raw": out.strip()
+        }
+
+    return cache.cached(f"os_update:{pkg}", db_paths, query)
 
 def antivirus_status() -> Dict[str, Any]:
     """Check for active antivirus software."""
@@ -106,32 +157,13 @@ def antivirus_status() -> Dict[str, Any]:
         "kaspersky", "kav4fs"
     ]
     
-    # Check running services
-    active_av = []
-    for service in av_services:
-        try:
-            out, _, _ = run_cmd(["systemctl", "is-active", service])
-            if "active" in out.lower():
-                active_av.append(service)
-        except Exception:
-            continue
-    
-    # Check for AppArmor/SELinux
-    security_modules = {}
+    # One batched systemctl query for all units; LSM state comes from sysfs.
     try:
-        # Check AppArmor
-        out, _, _ = run_cmd(["aa-status", "--enabled"])
-        security_modules["apparmor"] = out.strip().lower() == "apparmor is enabled."
+        active_av = systemd.active_units(av_services)
     except Exception:
-        security_modules["apparmor"] = False
-    
-    try:
-        # Check SELinux
-        out, _, _ = run_cmd(["getenforce"])
-        security_modules["selinux"] = out.strip().lower() in ("enforcing", "permissive")
-    except Exception:
-        security_modules["selinux"] = False
-    
+        active_av = []
+    security_modules = systemd.security_modules()
+
     return {
         "supported": True,
         "present": len(active_av) > 0 or any(security_modules.values()),
@@ -155,6 +187,15 @@ def inactivity_sleep() -> Dict[str, Any]:
     
     def check_gnome_settings() -> Tuple[Optional[int], Optional[int]]:
         """Check GNOME power settings."""
+        if NATIVE_PROBES:
+            schema = "org.gnome.settings-daemon.plugins.power"
+            ac = probes.gsettings_get(schema, "sleep-inactive-ac-timeout")
+            dc = probes.gsettings_get(schema, "sleep-inactive-battery-timeout")
+            if isinstance(ac, int) and isinstance(dc, int):
+                return ac, dc
+            if not probes.gsettings_schema_installed(schema):
+                return None, None  # no GNOME here; gsettings would fail too
+            # Otherwise a key was unreadable or system dconf databases apply: ask gsettings.
         try:
             out_ac, _, _ = run_cmd([
                 "gsettings", "get", 
@@ -175,6 +216,14 @@ def inactivity_sleep() -> Dict[str, Any]:
     
     def check_xfce_power() -> Tuple[Optional[int], Optional[int]]:
         """Check XFCE power settings."""
+        if NATIVE_PROBES:
+            ac = probes.xfconf_read("xfce4-power-manager", "/xfce4-power-manager/dpms-on-ac-sleep")
+            dc = probes.xfconf_read("xfce4-power-manager", "/xfce4-power-manager/dpms-on-battery-sleep")
+            if ac is not None and dc is not None and ac.isdigit() and dc.isdigit():
+                return int(ac), int(dc)
+            system_channel = Path("/etc/xdg/xfce4/xfconf/xfce-perchannel-xml/xfce4-power-manager.xml")
+            if not probes.xfconf_channel("xfce4-power-manager").exists() and not system_channel.exists():
+                return None, None  # xfconfd serves these files; nothing to ask it
         try:
             out, _, _ = run_cmd(["xfconf-query", "-c", "xfce4-power-manager", "-p", "/xfce4-power-manager/dpms-on-ac-sleep", "-v"])
             ac = int(out.strip()) if out.strip().isdigit() else None
@@ -191,9 +240,8 @@ def inactivity_sleep() -> Dict[str, Any]:
     if ac is None or dc is None:
         ac, dc = check_systemd_sleep()
     
-    # Check if settings are compliant (≤ 10 minutes = 600 seconds)
-    ac_ok = ac is not None and ac <= 600
-    dc_ok = dc is not None and dc <= 600
+    ac_ok = ac is not None and ac <= common.MAX_SLEEP_SECONDS
+    dc_ok = dc is not None and dc <= common.MAX_SLEEP_SECONDS
     
     return {
         "supported": ac is not None or dc is not None,
@@ -203,17 +251,41 @@ def inactivity_sleep() -> Dict[str, Any]:
         "raw": f"ac={ac} dc={dc}"
     }
 
-def collect() -> Dict[str, Any]:
+CHECKS = {
+    "disk_encryption": disk_encryption,
+    "os_update": os_update_status,
+    "antivirus": antivirus_status,
+    "inactivity_sleep": inactivity_sleep,
+}
+
+# Per-check deadlines in seconds, used by the concurrent collector.
+CHECK_TIMEOUTS = {
+    "disk_encryption": 30,
+    "os_update": 300,
+    "antivirus": 30,
+    "inactivity_sleep": 30,
+}
+
+# Scheduling overrides of schedule.DEFAULT_POLICY, in seconds. Update checks
+# hit the package manager's metadata, so they run rarely and within a budget.
+CHECK_SCHEDULES = {
+    "os_update": {"interval": 4 * 3600, "min_interval": 1800, "max_interval": 12 * 3600, "budget": 30},
+    "disk_encryption": {"max_interval": 6 * 3600},
+    "antivirus": {"max_interval": 3600},
+}
+
+# Files and directories whose changes can alter each check's result; the
+# daemon watches these with inotify and re-runs only the affected checks.
+WATCHES = {
+    "disk_encryption": ["/etc/crypttab", "/etc/fstab", "/dev/mapper", "/run/udev/data"],
+    "os_update": ["/var/lib/dpkg/status", "/var/lib/rpm", "/usr/lib/sysimage/rpm",
+                  "/var/lib/pacman/local"],
+    "antivirus": ["/run/systemd/units", "/etc/systemd/system/multi-user.target.wants"],
+    "inactivity_sleep": ["~/.config/dconf/user", "/etc/dconf/db", "/etc/dconf/profile",
+                         "~/.config/xfce4/xfconf/xfce-perchannel-xml/xfce4-power-manager.xml",
+                         "/etc/systemd/sleep.conf", "/etc/systemd/logind.conf"],
+}
+
+def collect(only=None, timeouts=None) -> Dict[str, Any]:
     """Collect all system information."""
-    base = base_system()
-    return {
-        **base,
-        "machine_id": machine_id(),
-        "checks": {
-            "disk_encryption": disk_encryption(),
-            "os_update": os_update_status(),
-            "antivirus": antivirus_status(),
-            "inactivity_sleep": inactivity_sleep(),
-        },
-        "checked_at": datetime.now(timezone.utc).isoformat()
-    }
+    return common.collect(machine_id, CHECKS, {**CHECK_TIMEOUTS, **(timeouts or {})}, only=only)
@@ -1,7 +1,8 @@
 import re
-from datetime import datetime, timezone
 from pathlib import Path
-from .common import base_system, any_file_exists
+from . import common
+from .common import any_file_exists
+from .. import cache
 from ..utils import run_cmd, parse_first_int_from_line
 
 def machine_id():
@@ -16,10 +17,27 @@ def disk_encryption():
     elif "FileVault is Off" in out: status = False
     return {"supported": True, "status": status, "raw": out}
 
+# Catalog and install receipts that change when updates are fetched or installed.
+UPDATE_STATE_PATHS = [
+    "/Library/Preferences/com.apple.SoftwareUpdate.plist",
+    "/Library/Updates/index.plist",
+    "/System/Library/CoreServices/SystemVersion.plist",
+    "/var/db/softwareupdate/journal.plist",
+]
+
 def os_update_status():
-    out, _, _ = run_cmd(["/usr/sbin/softwareupdate", "-l"])
-    up_to_date = ("No new software available" in out) or ("No updates available" in out)
-    return {"supported": True, "up_to_date": up_to_date, "raw": out}
+    def query():
+        out, err, rc = run_cmd(["/usr/sbin/softwareupdate", "-l"], timeout=540)
+        if rc == 124:
+            return {"supported": True, "up_to_date": None, "timed_out": True, "raw": err}
+        # softwareupdate prints the "no updates" notice on stderr.
+        text = out + "\n" + err
+        up_to_date = ("No new software available" in text) or ("No updates available" in text)
+        if not up_to_date and rc != 0:
+            # Failed without listing anything (no network, catalog error): unknown, not pending.
+            return {"supported": True, "up_to_date": None, "error": err.strip() or f"exit {rc}", "raw": out or err}
+        return {"supported": True, "up_to_date": up_to_date, "raw": out}
+    return cache.cached("os_update:softwareupdate", UPDATE_STATE_PATHS, query)
 
 def antivirus_status():
     common_apps = ["Avast", "Norton", "McAfee", "Kaspersky", "Bitdefender",
@@ -51,7 +69,7 @@ def inactivity_sleep():
         if " displaysleep " in f" {line} ":
             v = parse_first_int_from_line(line)
             if v is not None: display_vals.append(v)
-    def ok(vals): return all(v <= 10 for v in vals) if vals else None
+    def ok(vals): return all(v * 60 <= common.MAX_SLEEP_SECONDS for v in vals) if vals else None
     s_ok = ok(sleep_vals)
     d_ok = ok(display_vals)
     compliant = False if s_ok is False or d_ok is False else True
@@ -60,16 +78,25 @@ def inactivity_sleep():
             "display_sleep_values_minutes": display_vals or None,
             "raw": out}
 
-def collect():
-    base = base_system()
-    return {
-        **base,
-        "machine_id": machine_id(),
-        "checks": {
-            "disk_encryption": disk_encryption(),
-            "os_update": os_update_status(),
-            "antivirus": antivirus_status(),
-            "inactivity_sleep": inactivity_sleep(),
-        },
-        "checked_at": datetime.now(timezone.utc).isoformat()
-    }
+CHECKS = {
+    "disk_encryption": disk_encryption,
+    "os_update": os_update_status,
+    "antivirus": antivirus_status,
+    "inactivity_sleep": inactivity_sleep,
+}
+
+CHECK_TIMEOUTS = {
+    "disk_encryption": 30,
+    "os_update": 600,
+    "antivirus": 30,
+    "inactivity_sleep": 30,
+}
+
+CHECK_SCHEDULES = {
+    "os_update": {"interval": 6 * 3600, "min_interval": 3600, "max_interval": 12 * 3600, "budget": 30},
+    "disk_encryption": {"max_interval": 6 * 3600},
+    "antivirus": {"max_interval": 3600},
+}
+
+def collect(only=None, timeouts=None):
+    return common.collect(machine_id, CHECKS, {**CHECK_TIMEOUTS, **(timeouts or {})}, only=only)
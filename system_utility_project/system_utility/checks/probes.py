@@ -0,0 +1,312 @@
+"""Fork-free Linux probes that read kernel and desktop state straight from files."""
+import os
+import socket
+import struct
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SYS_BLOCK = Path("/sys/block")
+SYS_CLASS_BLOCK = Path("/sys/class/block")
+UDEV_DATA = Path("/run/udev/data")
+
+
+def read_text(path) -> Optional[str]:
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return None
+
+
+def machine_id() -> Optional[str]:
+    return read_text("/etc/machine-id") or read_text("/var/lib/dbus/machine-id")
+
+
+def hostname() -> str:
+    return read_text("/proc/sys/kernel/hostname") or socket.gethostname()
+
+
+def mountinfo(path="/proc/self/mountinfo") -> List[Dict[str, str]]:
+    """Parse mountinfo into dicts with mount_point, fstype and source."""
+    mounts = []
+    try:
+        lines = Path(path).read_text().splitlines()
+    except OSError:
+        return mounts
+    for line in lines:
+        pre, sep, post = line.partition(" - ")
+        if not sep:
+            continue
+        fields, tail = pre.split(), post.split()
+        if len(fields) < 5 or len(tail) < 2:
+            continue
+        mounts.append({
+            # mountinfo escapes spaces and other specials as octal (\040).
+            "mount_point": fields[4].encode().decode("unicode_escape"),
+            "fstype": tail[0],
+            "source": tail[1],
+        })
+    return mounts
+
+
+def root_source() -> Optional[str]:
+    source = None
+    for mount in mountinfo():
+        if mount["mount_point"] == "/":
+            source = mount["source"]  # the last mount on / is the visible one
+    return source
+
+
+def dm_devices() -> Dict[str, Dict[str, str]]:
+    """Device-mapper devices: kernel name (dm-N) -> {"name", "uuid"}."""
+    devices = {}
+    for dm in SYS_BLOCK.glob("dm-*"):
+        devices[dm.name] = {
+            "name": read_text(dm / "dm" / "name") or "",
+            "uuid": read_text(dm / "dm" / "uuid") or "",
+        }
+    return devices
+
+
+def crypt_devices() -> List[str]:
+    """dm-crypt mappings backed by LUKS, by their mapper name."""
+    return [d["name"] for d in dm_devices().values() if d["uuid"].startswith("CRYPT-LUKS")]
+
+
+def luks_partitions() -> Optional[List[str]]:
+    """
+    Block devices holding a LUKS header, opened or not, by kernel name, from
+    the udev database lsblk reads FSTYPE from. None without a udev database
+    (e.g. in a container), where this cannot be told from files.
+    """
+    if not UDEV_DATA.is_dir():
+        return None
+    found = []
+    for dev in SYS_CLASS_BLOCK.glob("*"):
+        number = read_text(dev / "dev")
+        data = read_text(UDEV_DATA / f"b{number}") if number else None
+        if data and "E:ID_FS_TYPE=crypto_LUKS" in data.splitlines():
+            found.append(dev.name)
+    return sorted(found)
+
+
+def _kernel_name(source: str, devices) -> Optional[str]:
+    """Resolve /dev/mapper/NAME, /dev/dm-N or /dev/sdXN to its /sys/block kernel name."""
+    if source.startswith("/dev/mapper/"):
+        wanted = source[len("/dev/mapper/"):]
+        for kname, dev in devices.items():
+            if dev["name"] == wanted:
+                return kname
+    try:
+        return os.path.basename(os.path.realpath(source))
+    except OSError:
+        return None
+
+
+def is_encrypted(source: Optional[str]) -> bool:
+    """True if `source` is, or sits on top of (e.g. LVM on LUKS), a dm-crypt device."""
+    if not source or not source.startswith("/dev/"):
+        return False
+    devices = dm_devices()
+    seen = set()
+    stack = [_kernel_name(source, devices)]
+    while stack:
+        kname = stack.pop()
+        if not kname or kname in seen:
+            continue
+        seen.add(kname)
+        if devices.get(kname, {}).get("uuid", "").startswith("CRYPT-"):
+            return True
+        stack.extend(p.name for p in (SYS_BLOCK / kname / "slaves").glob("*"))
+    return False
+
+
+def sysfs_available() -> bool:
+    return SYS_BLOCK.is_dir() and Path("/proc/self/mountinfo").exists()
+
+
+# ---------------- dconf ----------------
+# dconf keeps settings in GVDB files: a header, then a hash table whose items
+# name their parent item and point at a serialized GVariant.
+GVDB_SIGNATURE = b"GVariant"
+GVDB_HEADER = struct.Struct("<8sIIII")
+GVDB_ITEM = struct.Struct("<IIIHcxII")
+
+GVARIANT_INTS = {b"i": "<i", b"u": "<I", b"x": "<q", b"t": "<Q", b"n": "<h", b"q": "<H", b"y": "<B"}
+
+
+def _gvdb_items(data: bytes):
+    if len(data) < GVDB_HEADER.size:
+        return {}
+    signature, _, _, root_start, root_end = GVDB_HEADER.unpack_from(data)
+    if signature != GVDB_SIGNATURE or root_end > len(data) or root_start + 8 > root_end:
+        return {}
+    n_bloom_words, n_buckets = struct.unpack_from("<II", data, root_start)
+    n_bloom_words &= (1 << 27) - 1
+    items_start = root_start + 8 + 4 * (n_bloom_words + n_buckets)
+    n_items = (root_end - items_start) // GVDB_ITEM.size
+
+    raw = []
+    for i in range(n_items):
+        _, parent, key_start, key_size, kind, value_start, value_end = GVDB_ITEM.unpack_from(
+            data, items_start + i * GVDB_ITEM.size)
+        raw.append((parent, data[key_start:key_start + key_size].decode(errors="replace"),
+                    kind, value_start, value_end))
+
+    def full_key(index, depth=0):
+        parent, key = raw[index][0], raw[index][1]
+        if parent == 0xFFFFFFFF or parent >= len(raw) or depth > 64:
+            return key
+        return full_key(parent, depth + 1) + key
+
+    return {full_key(i): (kind, start, end) for i, (_, _, kind, start, end) in enumerate(raw)}
+
+
+def _gvariant_value(blob: bytes):
+    """Decode a serialized 'v' holding an integer, boolean or string."""
+    sep = blob.rfind(b"\0")
+    if sep < 0:
+        return None
+    value, type_string = blob[:sep], blob[sep + 1:]
+    if type_string in GVARIANT_INTS:
+        fmt = GVARIANT_INTS[type_string]
+        size = struct.calcsize(fmt)
+        return struct.unpack(fmt, value[:size])[0] if len(value) >= size else None
+    if type_string == b"b":
+        return bool(value[:1] == b"\x01")
+    if type_string == b"s":
+        return value.rstrip(b"\0").decode(errors="replace")
+    return None
+
+
+def dconf_user_db() -> Path:
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return Path(config) / "dconf" / "user"
+
+
+def dconf_profile() -> List[str]:
+    """
+    The databases of the user's dconf profile ("user-db:user",
+    "system-db:local", ...), from DCONF_PROFILE or /etc/dconf/profile/user;
+    without one dconf uses the user database alone.
+    """
+    name = os.environ.get("DCONF_PROFILE", "user")
+    if os.path.isabs(name):
+        candidates = [Path(name)]
+    else:
+        data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+        candidates = [Path("/etc/dconf/profile") / name,
+                      *(Path(d) / "dconf" / "profile" / name for d in data_dirs.split(":") if d)]
+    for path in candidates:
+        text = read_text(path)
+        if text is not None:
+            lines = [line.split("#", 1)[0].strip() for line in text.splitlines()]
+            return [line for line in lines if line]
+    return ["user-db:user"]
+
+
+def dconf_user_only() -> bool:
+    """
+    True if the user database alone decides dconf values. System databases
+    (under /etc/dconf/db) can set values and lock keys against the user's,
+    which only dconf itself resolves.
+    """
+    return all(source.startswith("user-db:") for source in dconf_profile())
+
+
+def dconf_read(key: str, db: Optional[Path] = None):
+    """Value of `key` (e.g. /org/gnome/.../sleep-inactive-ac-timeout) from the user's dconf db, or None."""
+    try:
+        data = (db or dconf_user_db()).read_bytes()
+    except OSError:
+        return None
+    item = _gvdb_items(data).get(key)
+    if not item or item[0] != b"v" or item[2] > len(data):
+        return None
+    return _gvariant_value(data[item[1]:item[2]])
+
+
+# ---------------- xfconf ----------------
+def xfconf_channel(channel: str) -> Path:
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return Path(config) / "xfce4" / "xfconf" / "xfce-perchannel-xml" / f"{channel}.xml"
+
+
+def xfconf_read(channel: str, prop: str):
+    """Value of `prop` (e.g. /xfce4-power-manager/dpms-on-ac-sleep) from the channel's XML, or None."""
+    path = xfconf_channel(channel)
+    try:
+        node = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    for name in prop.strip("/").split("/"):
+        node = next((p for p in node.findall("property") if p.get("name") == name), None)
+        if node is None:
+            return None
+    return node.get("value")
+
+
+# ---------------- GSettings schema defaults ----------------
+def _data_dirs() -> List[Path]:
+    dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    return [Path(d) / "glib-2.0" / "schemas" for d in dirs.split(":") if d]
+
+
+def gsettings_schema_installed(schema_id: str) -> bool:
+    return any((d / f"{schema_id}.gschema.xml").exists() for d in _data_dirs())
+
+
+def gsettings_default(schema_id: str, key: str) -> Optional[str]:
+    """
+    A key's default as gsettings would report it when the user never set it:
+    the schema XML default, with vendor .gschema.override files applied in
+    lexical order. None if the schema is not installed.
+    """
+    import configparser
+
+    default = None
+    for directory in _data_dirs():
+        path = directory / f"{schema_id}.gschema.xml"
+        try:
+            root = ET.parse(path).getroot()
+        except (OSError, ET.ParseError):
+            continue
+        for schema in root.iter("schema"):
+            if schema.get("id") != schema_id:
+                continue
+            for node in schema.iter("key"):
+                if node.get("name") == key and node.findtext("default") is not None:
+                    default = node.findtext("default").strip()
+        if default is not None:
+            overrides = sorted(directory.glob("*.gschema.override"))
+            for override in overrides:
+                parser = configparser.ConfigParser(interpolation=None)
+                try:
+                    parser.read(override)
+                except configparser.Error:
+                    continue
+                if parser.has_option(schema_id, key):
+                    default = parser.get(schema_id, key).strip()
+            return default
+    return None
+
+
+def gsettings_get(schema_id: str, key: str):
+    """
+    User value from dconf, else the schema default; None if the schema is
+    not installed, or if the dconf profile has system databases, whose
+    values and locks only the gsettings command applies correctly.
+    """
+    if not dconf_user_only():
+        return None
+    path = "/" + schema_id.replace(".", "/") + "/" + key
+    value = dconf_read(path)
+    if value is not None:
+        return value
+    default = gsettings_default(schema_id, key)
+    if default is None:
+        return None
+    try:
+        return int(default.split()[-1])  # e.g. "1200" or "uint32 1200"
+    except ValueError:
+        return default
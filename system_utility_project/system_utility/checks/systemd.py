@@ -0,0 +1,71 @@
+"""Batched systemd unit state and fork-free LSM state for Linux checks."""
+from pathlib import Path
+from typing import Dict, Iterable
+
+from ..utils import run_cmd
+
+UNIT_PROPERTIES = ("Id", "LoadState", "ActiveState", "SubState")
+
+def _unit_name(name: str) -> str:
+    return name if "." in name else f"{name}.service"
+
+def unit_states(units: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Return systemd properties for many units using a single `systemctl show`.
+
+    Keys are the names as passed in. Template units (`foo@.service`) cannot be
+    queried and units that systemctl could not answer for are reported as
+    `LoadState=not-found`.
+    """
+    names = list(dict.fromkeys(units))
+    queryable = [n for n in names if "@." not in n]
+    states = {n: {"LoadState": "not-found", "ActiveState": "inactive", "SubState": "dead"} for n in names}
+    if not queryable:
+        return states
+
+    out, _, _ = run_cmd(
+        ["systemctl", "show", "--no-pager", "--property=" + ",".join(UNIT_PROPERTIES)]
+        + list(dict.fromkeys(_unit_name(n) for n in queryable)),
+        timeout=15,
+    )
+    # systemctl prints one blank-line separated block per unit; match on Id
+    # rather than position since invalid names are skipped with no block.
+    by_unit = {}
+    for n in queryable:
+        by_unit.setdefault(_unit_name(n), []).append(n)
+    for block in out.split("\n\n"):
+        props = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+        for name in by_unit.get(props.get("Id", ""), []):
+            states[name].update(props)
+    return states
+
+def active_units(units: Iterable[str]) -> list:
+    """Names from `units` whose ActiveState is exactly `active`."""
+    return [n for n, props in unit_states(units).items() if props.get("ActiveState") == "active"]
+
+def _read(path: str) -> str:
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return ""
+
+def apparmor_enabled() -> bool:
+    """AppArmor is enabled when the module says so and it is a loaded LSM."""
+    if _read("/sys/module/apparmor/parameters/enabled") == "Y":
+        return True
+    return "apparmor" in _read("/sys/kernel/security/lsm").split(",")
+
+def selinux_mode() -> str:
+    """`enforcing`, `permissive` or `disabled`, read from selinuxfs."""
+    enforce = _read("/sys/fs/selinux/enforce")
+    if enforce == "1":
+        return "enforcing"
+    if enforce == "0":
+        return "permissive"
+    return "disabled"
+
+def security_modules() -> Dict[str, bool]:
+    return {
+        "apparmor": apparmor_enabled(),
+        "selinux": selinux_mode() in ("enforcing", "permissive"),
+    }
@@ -1,6 +1,6 @@
 import re
-from datetime import datetime, timezone
-from .common import base_system
+from . import common
+from .. import cache
 from ..utils import run_cmd
 
 POWERSHELL = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command"]
@@ -19,14 +19,24 @@ def disk_encryption():
         status = False
     return {"supported": True, "status": status, "raw": out or err}
 
+# Windows Update datastore and log; both are rewritten after a scan or install.
+UPDATE_STATE_PATHS = [
+    r"C:\Windows\SoftwareDistribution\DataStore\DataStore.edb",
+    r"C:\Windows\SoftwareDistribution\ReportingEvents.log",
+    r"C:\Windows\SoftwareDistribution\Download",
+]
+
 def os_update_status():
-    ps = r"(New-Object -ComObject Microsoft.Update.Session).CreateUpdateSearcher().Search(\"IsInstalled=0 and Type='Software'\").Updates.Count"
-    out, err, _ = run_cmd(POWERSHELL + [ps])
-    try:
-        pending = int(out.strip())
-        return {"supported": True, "up_to_date": pending == 0, "pending_count": pending, "raw": out or err}
-    except Exception:
-        return {"supported": True, "up_to_date": None, "raw": out or err}
+    def query():
+        ps = r"(New-Object -ComObject Microsoft.Update.Session).CreateUpdateSearcher().Search(\"IsInstalled=0 and Type='Software'\").Updates.Count"
+        out, err, rc = run_cmd(POWERSHELL + [ps], timeout=540)
+        try:
+            pending = int(out.strip())
+            return {"supported": True, "up_to_date": pending == 0, "pending_count": pending, "raw": out or err}
+        except Exception:
+            return {"supported": True, "up_to_date": None, "timed_out": rc == 124,
+                    "error": err.strip() or f"unparsable update count (exit {rc})", "raw": out or err}
+    return cache.cached("os_update:wuapi", UPDATE_STATE_PATHS, query)
 
 def antivirus_status():
     ps = "Get-MpComputerStatus | Select-Object AMServiceEnabled,AntivirusEnabled,RealTimeProtectionEnabled | ConvertTo-Json"
@@ -62,8 +72,8 @@ def inactivity_sleep():
             sleep_dc = int(line.split()[-2]) if line.split()[-2].isdigit() else None
     
    
-    ac_ok = sleep_ac is not None and sleep_ac <= 600
-    dc_ok = sleep_dc is not None and sleep_dc <= 600
+    ac_ok = sleep_ac is not None and sleep_ac <= common.MAX_SLEEP_SECONDS
+    dc_ok = sleep_dc is not None and sleep_dc <= common.MAX_SLEEP_SECONDS
     
     return {
         "supported": True,
@@ -73,16 +83,26 @@ def inactivity_sleep():
         "raw": out
     }
 
-def collect():
-    base = base_system()
-    return {
-        **base,
-        "machine_id": machine_id(),
-        "checks": {
-            "disk_encryption": disk_encryption(),
-            "os_update": os_update_status(),
-            "antivirus": antivirus_status(),
-            "inactivity_sleep": inactivity_sleep(),
-        },
-        "checked_at": datetime.now(timezone.utc).isoformat()
-    }
+CHECKS = {
+    "disk_encryption": disk_encryption,
+    "os_update": os_update_status,
+    "antivirus": antivirus_status,
+    "inactivity_sleep": inactivity_sleep,
+}
+
+CHECK_TIMEOUTS = {
+    "disk_encryption": 60,
+    "os_update": 600,
+    "antivirus": 60,
+    "inactivity_sleep": 60,
+}
+
+# A Windows Update search takes seconds of CPU and rarely changes.
+CHECK_SCHEDULES = {
+    "os_update": {"interval": 8 * 3600, "min_interval": 3600, "max_interval": 24 * 3600, "budget": 20},
+    "disk_encryption": {"max_interval": 6 * 3600},
+    "antivirus": {"max_interval": 3600},
+}
+
+def collect(only=None, timeouts=None):
+    return common.collect(machine_id, CHECKS, {**CHECK_TIMEOUTS, **(timeouts or {})}, only=only)
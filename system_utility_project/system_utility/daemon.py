@@ -1,19 +1,181 @@
+import argparse
+import random
+import sys
 import time
-from system_utility.main import run_checks
-from system_utility.reporter import report_results
-
-def daemon_loop(interval=1800):  
-    last_results = None
-    while True:
-        results = run_checks()
-        if results != last_results:
-            print("Change detected, reporting...")
-            report_results(results)
-            last_results = results
-        else:
+from datetime import datetime, timezone
+from system_utility.instrument import slowest
+from system_utility.delta import AckState
+from system_utility.main import check_schedules, run_checks, watched_paths
+from system_utility.reporter import preload, report_results, report_delta
+from system_utility.schedule import DEFAULT_POLICY, Scheduler
+
+# Checks whose inputs are watched may back off this far; inotify catches
+# their changes in between, so the scheduled run is only a safety net.
+WATCHED_MAX_INTERVAL = 24 * 3600
+# --once first waits a random 0..ONCE_JITTER seconds, so a fleet whose timers
+# fire on the same minute does not report in the same second.
+ONCE_JITTER = 60
+
+def _merge(results, partial):
+    """Fold a partial run of some checks into the last full results."""
+    merged = {**results, "checks": {**results["checks"], **partial["checks"]}}
+    merged["checked_at"] = partial["checked_at"]
+    # Timings describe the run just made, not the checks carried over.
+    merged["timings"] = partial.get("timings")
+    return merged
+
+def log_timings(results):
+    timings = results.get("timings") or {}
+    slow = ", ".join(f"{name} {ms:.0f}ms" for name, ms in slowest(timings))
+    print(f"Checks took {timings.get('total_ms', 0):.0f}ms" + (f" (slowest: {slow})" if slow else ""))
+
+def schedule_overrides(response):
+    """The per-check schedule overrides the backend returned, if any."""
+    if response is None or not response.ok:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body.get("schedule") if isinstance(body, dict) else None
+
+def apply_schedule(scheduler, response):
+    """Take the backend's schedule overrides; a bad one is reported and ignored, never fatal."""
+    try:
+        scheduler.apply_overrides(schedule_overrides(response))
+    except Exception as e:
+        print(f"Ignoring schedule overrides from the backend: {e!r}")
+
+def send(results, state, heartbeat=False):
+    """
+    Send only what changed since the last acknowledged report.
+
+    An empty delta is skipped unless `heartbeat` is set, in which case it
+    still refreshes the machine's check-in time. Falls back to a full report
+    when there is no acknowledged state or the backend rejects the delta.
+    Returns the backend's last response, or None if nothing was delivered.
+    """
+    delta = state.delta(results)
+    if delta is not None:
+        if not delta["fields"] and not delta["checks"] and not heartbeat:
             print("No changes.")
-        time.sleep(interval)
+            return None
+        print("Change detected, reporting delta..." if delta["checks"] else "Sending heartbeat...")
+        r = report_delta(delta)
+        if r is not None and r.ok:
+            state.ack(results, delta["version"])
+            return r
+        if r is None:
+            return None
+        print(f"Delta rejected ({r.status_code}), sending full report...")
 
-if __name__ == "__main__":
+    version = state.version + 1
+    r = report_results({**results, "report_version": version})
+    if r is not None and r.ok:
+        state.ack(results, version)
+    return r
+
+def daemon_loop(interval=1800, watch=True):
+    """
+    Report the system state, then keep it current.
+
+    Every check runs on its own adaptive schedule (see schedule.Scheduler),
+    which the backend can override in its responses. When `watch` is set and
+    the platform supports it, a change to a check's inputs runs that check
+    at once. A heartbeat goes out at least every `interval` seconds even
+    when no check is due.
+    """
+    preload()
+    watcher = None
+    if watch:
+        from system_utility import watcher as inotify
+        watcher = inotify.create(watched_paths())
+    schedules = check_schedules()
+    if watcher:
+        print("Watching check inputs for changes.")
+        for name in watched_paths():
+            if name in schedules:
+                ceiling = max(schedules[name].get("max_interval", DEFAULT_POLICY["max_interval"]), WATCHED_MAX_INTERVAL)
+                schedules[name] = {**schedules[name], "max_interval": ceiling}
+
+    state = AckState()
+    scheduler = Scheduler(schedules)
+    results = run_checks()
+    log_timings(results)
+    scheduler.record((state.results or {}).get("checks", {}), results["checks"], results.get("timings"))
+    apply_schedule(scheduler, send(results, state, heartbeat=True))
+    next_heartbeat = time.monotonic() + interval
+    try:
+        while True:
+            timeout = min(scheduler.next_due_in(), max(0.0, next_heartbeat - time.monotonic()))
+            if watcher:
+                changed = watcher.wait(timeout)
+            else:
+                time.sleep(timeout)
+                changed = set()
+
+            due = scheduler.due() | changed
+            heartbeat = time.monotonic() >= next_heartbeat
+            if not due and not heartbeat:
+                continue
+            if changed:
+                print(f"{datetime.now(timezone.utc)} - Inputs changed for: {', '.join(sorted(changed))}")
+            if due:
+                partial = run_checks(only=due)
+                log_timings(partial)
+                scheduler.record(results["checks"], partial["checks"], partial.get("timings"))
+                results = _merge(results, partial)
+            r = send(results, state, heartbeat=heartbeat)
+            if heartbeat:
+                next_heartbeat = time.monotonic() + interval
+            apply_schedule(scheduler, r)
+    finally:
+        if watcher:
+            watcher.close()
+
+def run_once(run_all=False):
+    """
+    One pass for cron, launchd or Task Scheduler: run the checks the
+    persisted schedule says are due (all of them with `run_all`, or when
+    nothing has been acknowledged yet), fold them into the last acknowledged
+    results and send the change, or a heartbeat, then exit. Returns True if
+    the backend took it.
+    """
+    preload()
+    state = AckState()
+    scheduler = Scheduler(check_schedules())
+    previous = state.results
+    due = None if run_all or previous is None else scheduler.due()
+    if due is None or due:
+        partial = run_checks(only=due)
+        log_timings(partial)
+        scheduler.record((previous or {}).get("checks", {}), partial["checks"], partial.get("timings"))
+        results = partial if due is None else _merge(previous, partial)
+    else:
+        results = {**previous, "checked_at": datetime.now(timezone.utc).isoformat(), "timings": None}
+    r = send(results, state, heartbeat=True)
+    apply_schedule(scheduler, r)
+    return r is not None and r.ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report this machine's security checks to the backend.")
+    parser.add_argument("--once", action="store_true",
+                        help="run the due checks, report and exit (for cron, launchd or Task Scheduler)")
+    parser.add_argument("--all", action="store_true", help="with --once, run every check whether due or not")
+    parser.add_argument("--jitter", type=float, default=ONCE_JITTER,
+                        help="with --once, first wait a random 0..N seconds (default %(default)s, 0 to start at once)")
+    parser.add_argument("--interval", type=int, default=1800, help="seconds between heartbeats")
+    parser.add_argument("--no-watch", action="store_true", help="do not watch check inputs for changes")
+    args = parser.parse_args(argv)
+    if args.once:
+        if args.jitter > 0:
+            time.sleep(random.uniform(0, args.jitter))
+        # Check threads are daemons and their commands die at the check
+        # deadline, so a hung check cannot hold the process open past here.
+        return 0 if run_once(run_all=args.all) else 1
     print("Starting system utility daemon...")
-    daemon_loop()
+    daemon_loop(interval=args.interval, watch=not args.no_watch)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
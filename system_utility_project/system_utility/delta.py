@@ -0,0 +1,63 @@
+"""Per-check structural diff against the last report the backend acknowledged."""
+import json
+import os
+
+from system_utility.utils import state_dir
+
+# Fields that change on every run without the system state changing.
+VOLATILE_FIELDS = {"checked_at", "cached"}
+# Top-level report fields that are sent in a delta when they change.
+HEADER_FIELDS = ("system", "release", "version", "arch")
+
+def strip_volatile(doc):
+    if isinstance(doc, dict):
+        return {k: strip_volatile(v) for k, v in doc.items() if k not in VOLATILE_FIELDS}
+    if isinstance(doc, list):
+        return [strip_volatile(v) for v in doc]
+    return doc
+
+def diff(previous, current):
+    """Return the header fields and whole check sub-documents that differ."""
+    fields = {k: current.get(k) for k in HEADER_FIELDS if previous.get(k) != current.get(k)}
+    prev_checks = previous.get("checks", {})
+    checks = {
+        name: doc for name, doc in current.get("checks", {}).items()
+        if strip_volatile(prev_checks.get(name)) != strip_volatile(doc)
+    }
+    return fields, checks
+
+class AckState:
+    """The last acknowledged report and its version, persisted across restarts."""
+
+    def __init__(self, path=None):
+        self.path = path or state_dir() / "last_report.json"
+        self.version = 0
+        self.results = None
+        try:
+            saved = json.loads(self.path.read_text())
+            self.version = saved["version"]
+            self.results = saved["results"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def delta(self, results):
+        """Versioned delta against the acknowledged state, or None if a full report is needed."""
+        if self.results is None or self.results.get("machine_id") != results.get("machine_id"):
+            return None
+        fields, checks = diff(self.results, results)
+        return {
+            "machine_id": results.get("machine_id"),
+            "base_version": self.version,
+            "version": self.version + 1,
+            "fields": fields,
+            "checks": checks,
+            "checked_at": results.get("checked_at"),
+            "timings": results.get("timings"),
+        }
+
+    def ack(self, results, version):
+        self.results = results
+        self.version = version
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": version, "results": results}))
+        os.replace(tmp, self.path)
@@ -0,0 +1,54 @@
+"""Wall-time accounting for checks and the commands they run, sent as a report's `timings`."""
+import contextvars
+import os
+import time
+
+# The record of the check running in the current thread, if any.
+_current = contextvars.ContextVar("check_record", default=None)
+
+def new_record():
+    return {"ms": None, "commands": []}
+
+def command_name(cmd):
+    """argv[0] without its directory, which keeps backend labels low-cardinality."""
+    first = cmd[0] if isinstance(cmd, (list, tuple)) and cmd else str(cmd).split(" ", 1)[0]
+    return os.path.basename(str(first))
+
+def record_command(cmd, seconds, rc, timed_out, out_bytes):
+    """Called by run_cmd; a command run outside a timed check is not recorded."""
+    record = _current.get()
+    if record is None:
+        return
+    entry = {"cmd": command_name(cmd), "ms": round(seconds * 1000, 2), "rc": rc, "bytes": out_bytes}
+    if timed_out:
+        entry["timed_out"] = True
+    record["commands"].append(entry)
+
+def timed(fn, record):
+    """Run `fn` in the calling thread, filling `record` with its wall time and commands."""
+    token = _current.set(record)
+    started = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        record["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        _current.reset(token)
+
+def summary(records, total_seconds):
+    """
+    The compact `timings` section: total wall time and, per check, its own
+    wall time and the commands it ran. A check abandoned at its deadline has
+    no wall time of its own and is marked timed out.
+    """
+    checks = {}
+    for name, record in records.items():
+        entry = {"ms": record["ms"], "commands": list(record["commands"])}
+        if record["ms"] is None:
+            entry["timed_out"] = True
+        checks[name] = entry
+    return {"total_ms": round(total_seconds * 1000, 2), "checks": checks}
+
+def slowest(timings, n=3):
+    """The `n` slowest checks as (name, ms), for log lines."""
+    finished = [(name, t["ms"]) for name, t in timings.get("checks", {}).items() if t.get("ms") is not None]
+    return sorted(finished, key=lambda item: item[1], reverse=True)[:n]
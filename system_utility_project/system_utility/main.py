@@ -1,17 +1,48 @@
-
 import platform
-from system_utility.checks import macos, linux, windows
 
-def run_checks():
-    system = platform.system()
+
+def platform_module(system=None):
+    """
+    The check module for `system` (default: this host), or None if there is
+    none. Imported on first use, so a host never loads another OS's checks
+    and a per-OS frozen build can leave them out.
+    """
+    system = system or platform.system()
     if system == "Darwin":
-        return macos.collect()
+        from system_utility.checks import macos as module
     elif system == "Linux":
-        return linux.collect()
+        from system_utility.checks import linux as module
     elif system == "Windows":
-        return windows.collect()
+        from system_utility.checks import windows as module
     else:
-        raise NotImplementedError(f"Unsupported system: {system}")
+        return None
+    return module
+
+
+def run_checks(only=None, timeouts=None):
+    """
+    Run the platform's checks concurrently and return the report document.
+
+    `only` restricts the run to the named checks; `timeouts` overrides the
+    per-check deadlines (seconds) declared by the platform module.
+    """
+    module = platform_module()
+    if module is None:
+        raise NotImplementedError(f"Unsupported system: {platform.system()}")
+    return module.collect(only=only, timeouts=timeouts)
+
+
+def check_schedules():
+    """Per-check schedule policies declared by the current platform's module."""
+    module = platform_module()
+    if module is None:
+        return {}
+    return {name: getattr(module, "CHECK_SCHEDULES", {}).get(name, {}) for name in module.CHECKS}
+
+
+def watched_paths():
+    """Per-check input paths for the current platform, or {} if it has none."""
+    return getattr(platform_module(), "WATCHES", {})
 
 
 def get_system_report():
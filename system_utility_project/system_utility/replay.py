@@ -0,0 +1,75 @@
+"""
+Replay recorded command output in place of running commands.
+
+A fixture is JSON listing commands by `match`, a prefix of the space-joined
+argv, with the recorded out/err/rc and the wall time it took on the source
+host (`ms`). Named `scenarios` hold entries that replace the baseline ones
+with the same `match` (or add to them), e.g. FileVault off or an update
+check that timed out, so one recording covers a fleet's worth of states.
+
+    with utils.use_runner(ReplayRunner(load_fixture(path), ["filevault_off"])):
+        report = macos.collect()
+
+Checks that read files rather than run commands (Linux native probes, the
+update cache) are not covered and need their own switches.
+"""
+import json
+import shlex
+import time
+from pathlib import Path
+
+
+def load_fixture(path):
+    return json.loads(Path(path).read_text())
+
+
+def scenario_commands(fixture, scenarios=()):
+    """The fixture's baseline commands with `scenarios` applied in order."""
+    commands = {entry["match"]: entry for entry in fixture["commands"]}
+    available = fixture.get("scenarios", {})
+    for name in scenarios:
+        if name not in available:
+            raise ValueError(f"unknown scenario {name!r}; fixture has {sorted(available)}")
+        for entry in available[name]:
+            commands[entry["match"]] = entry
+    return list(commands.values())
+
+
+class ReplayRunner:
+    """
+    A command runner for utils.use_runner answering from a fixture. The
+    longest matching prefix wins; unknown commands fail like a missing
+    binary. With `latency` the recorded wall time is slept, otherwise
+    replies are instant. A recording that took longer than the command's
+    timeout times out as run_cmd would: after the timeout, with exit 124.
+    """
+
+    def __init__(self, fixture, scenarios=(), latency=False):
+        self.scenarios = tuple(scenarios)
+        self.commands = sorted(scenario_commands(fixture, self.scenarios),
+                               key=lambda c: len(c["match"]), reverse=True)
+        self.latency = latency
+        self.calls = []
+        self.unmatched = set()
+
+    def lookup(self, cmd):
+        line = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
+        for entry in self.commands:
+            if line.startswith(entry["match"]):
+                return entry
+        self.unmatched.add(line)
+        return None
+
+    def __call__(self, cmd, timeout=None):
+        entry = self.lookup(cmd)
+        self.calls.append(cmd)
+        if entry is None:
+            program = cmd[0] if isinstance(cmd, (list, tuple)) else (shlex.split(str(cmd)) or [""])[0]
+            return "", f"{program}: command not found", 127
+        seconds = entry.get("ms", 0) / 1000
+        timed_out = timeout is not None and seconds > timeout
+        if self.latency:
+            time.sleep(timeout if timed_out else seconds)
+        if timed_out:
+            return "", f"timed out after {timeout}s", 124
+        return entry.get("out", "").strip(), entry.get("err", "").strip(), entry.get("rc", 0)
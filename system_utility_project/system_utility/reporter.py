@@ -1,21 +1,205 @@
-import requests
-from system_utility.main import get_system_report  
+from system_utility.blobs import BlobCache, offload
+from system_utility.main import get_system_report
+from system_utility.utils import state_dir
 import datetime
+import gzip
+import importlib
+import json
+import os
+import random
+import threading
+import time
 
-API_ENDPOINT = "http://127.0.0.1:8001/report"  
+API_ENDPOINT = os.environ.get("SYSTEM_UTILITY_ENDPOINT", "http://127.0.0.1:8001/report")
+DELTA_ENDPOINT = API_ENDPOINT + "/delta"
+BLOBS_ENDPOINT = API_ENDPOINT.rsplit("/", 1)[0] + "/blobs"
 API_KEY = "MY_TEST_API_KEY"
 
-def report_results(results):
-    headers = {"x-api-key": API_KEY}
-    try:
-        r = requests.post(API_ENDPOINT, json=results, headers=headers, timeout=10)
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+MAX_SPOOL_FILES = 100
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+
+
+def retryable(status_code):
+    """429 and every 5xx mean "try again later" rather than "this report is wrong"."""
+    return status_code == 429 or status_code >= 500
+
+
+def preload():
+    """
+    Import requests on a background thread so it overlaps the checks. With
+    urllib3 and certifi it is most of the agent's import time, and is
+    otherwise imported when the first report is sent.
+    """
+    threading.Thread(target=importlib.import_module, args=("requests",), name="preload", daemon=True).start()
+
+
+def encode_body(payload):
+    """Compact JSON, gzip-compressed, as sent on the wire."""
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=6)
+
+
+class ReportClient:
+    """
+    Keep-alive, gzip-compressing client for the backend.
+
+    Full reports that fail to send are kept in a bounded on-disk spool and
+    replayed oldest-first. After a failure, further attempts wait an
+    exponentially growing, fully jittered delay so that a fleet coming back
+    after an outage does not reconnect all at once. The backoff is kept in
+    the state directory, so it also holds across `--once` runs. Raw outputs
+    the backend reports missing are uploaded from the blob cache after each
+    response.
+    """
+
+    def __init__(self, spool_dir=None, max_spool=MAX_SPOOL_FILES, backoff_path=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.headers.update({
+            "x-api-key": API_KEY,
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        self.spool_dir = spool_dir or state_dir() / "spool"
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.max_spool = max_spool
+        self.blobs = BlobCache()
+        self.backoff_path = backoff_path or state_dir() / "backoff.json"
+        self.failures, self.retry_at = self._load_backoff()
+
+    def _post(self, url, payload):
+        return self.session.post(url, data=encode_body(payload), timeout=REQUEST_TIMEOUT)
+
+    def _load_backoff(self):
+        """(failures, retry_at) as saved; retry_at is wall-clock time and capped in case the clock moved back."""
+        try:
+            saved = json.loads(self.backoff_path.read_text())
+            return int(saved["failures"]), min(float(saved["retry_at"]), time.time() + BACKOFF_MAX)
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0, 0.0
+
+    def _save_backoff(self):
+        tmp = self.backoff_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"failures": self.failures, "retry_at": self.retry_at}))
+        os.replace(tmp, self.backoff_path)
+
+    def _failed(self):
+        self.failures += 1
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.failures))
+        self.retry_at = time.time() + delay
+        self._save_backoff()
+
+    def _succeeded(self):
+        if self.failures or self.retry_at:
+            self.failures = 0
+            self.retry_at = 0.0
+            self._save_backoff()
+
+    def send(self, url, payload):
+        """POST `payload`; returns the response, or None on network error or while backing off."""
+        import requests
+
+        if time.time() < self.retry_at:
+            return None
+        try:
+            r = self._post(url, payload)
+        except requests.RequestException as e:
+            print(f"{datetime.datetime.now()} - Request to {url} failed: {e}")
+            self._failed()
+            return None
+        if retryable(r.status_code):
+            self._failed()
+        else:
+            self._succeeded()
+        if r.ok:
+            self._upload_missing(r)
+        return r
+
+    def _upload_missing(self, r):
+        """Upload the raw outputs the backend listed under `missing_blobs`."""
+        import requests
+
+        try:
+            missing = r.json().get("missing_blobs") or []
+        except (ValueError, AttributeError):
+            return
+        texts = {sha: text for sha in missing if (text := self.blobs.get(sha)) is not None}
+        if not texts:
+            return
+        try:
+            self._post(BLOBS_ENDPOINT, {"blobs": texts})
+        except requests.RequestException as e:
+            print(f"{datetime.datetime.now()} - Uploading {len(texts)} raw outputs failed: {e}")
+
+    def spool(self, payload):
+        name = f"{time.time_ns()}.json.gz"
+        tmp = self.spool_dir / (name + ".tmp")
+        tmp.write_bytes(gzip.compress(json.dumps(payload).encode()))
+        os.replace(tmp, self.spool_dir / name)
+        spooled = sorted(self.spool_dir.glob("*.json.gz"))
+        for old in spooled[:max(0, len(spooled) - self.max_spool)]:
+            old.unlink(missing_ok=True)
+
+    def drain(self):
+        """Replay spooled reports oldest-first; stops at the first failure."""
+        for path in sorted(self.spool_dir.glob("*.json.gz")):
+            try:
+                payload = json.loads(gzip.decompress(path.read_bytes()))
+            except (OSError, ValueError):
+                path.unlink(missing_ok=True)
+                continue
+            r = self.send(API_ENDPOINT, payload)
+            if r is None or retryable(r.status_code):
+                return False
+            path.unlink(missing_ok=True)
+        return True
+
+    def report(self, results):
+        """Send a full report, spooling it if it cannot be delivered now."""
+        if not self.drain():
+            self.spool(results)
+            print(f"{datetime.datetime.now()} - Backend unavailable, report spooled")
+            return None
+        r = self.send(API_ENDPOINT, results)
+        if r is None or retryable(r.status_code):
+            self.spool(results)
+            print(f"{datetime.datetime.now()} - Reporting failed, report spooled")
+            return None
         print(f"{datetime.datetime.now()} - Reported results: {r.status_code}")
-    except Exception as e:
-        print(f"{datetime.datetime.now()} - Reporting failed: {e}")
+        return r
+
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = ReportClient()
+    return _client
+
+
+def report_results(results):
+    """POST a full report; returns the response, or None if it was spooled for retry."""
+    client = get_client()
+    return client.report(offload(results, client.blobs))
+
+
+def report_delta(delta):
+    """POST a versioned delta; a 409 response means the backend needs a full report."""
+    client = get_client()
+    r = client.send(DELTA_ENDPOINT, offload(delta, client.blobs))
+    if r is not None:
+        print(f"{datetime.datetime.now()} - Reported delta ({len(delta['checks'])} checks): {r.status_code}")
+    return r
 
 
 def run_daemon():
-    system_data = get_system_report()  
+    system_data = get_system_report()
     system_data["checked_at"] = str(datetime.datetime.utcnow())
     report_results(system_data)
 
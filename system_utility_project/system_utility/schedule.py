@@ -0,0 +1,148 @@
+"""Per-check adaptive scheduling for the daemon."""
+import json
+import math
+import os
+import random
+import time
+
+from system_utility.delta import strip_volatile
+from system_utility.utils import state_dir
+
+# Defaults in seconds; platform modules refine them through CHECK_SCHEDULES
+# and the backend can override any of them per check.
+DEFAULT_POLICY = {
+    "interval": 1800,      # starting interval for a check with no history
+    "min_interval": 300,   # re-probe this soon after a change
+    "max_interval": 2 * 3600,  # ceiling for a long-stable check
+    "jitter": 0.1,         # +/- fraction applied to each interval
+    "budget": None,        # max seconds of check wall time per hour
+}
+POLICY_KEYS = tuple(DEFAULT_POLICY)
+BACKOFF_FACTOR = 1.5
+
+
+def valid_override(key, value):
+    """
+    Intervals must be positive numbers and jitter a fraction in [0, 1);
+    only `budget` may be None (no budget).
+    """
+    if key == "budget" and value is None:
+        return True
+    if key not in POLICY_KEYS or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if not math.isfinite(value):
+        return False
+    return 0 <= value < 1 if key == "jitter" else value > 0
+
+
+def policy_for(check, schedules, overrides=None):
+    policy = {**DEFAULT_POLICY, **schedules.get(check, {})}
+    check_overrides = (overrides or {}).get(check)
+    for key, value in (check_overrides if isinstance(check_overrides, dict) else {}).items():
+        if valid_override(key, value):
+            policy[key] = value
+    policy["min_interval"] = min(policy["min_interval"], policy["max_interval"])
+    return policy
+
+
+class Scheduler:
+    """
+    Decides which checks are due.
+
+    A check whose result is unchanged backs off geometrically up to its
+    max_interval; one that just changed drops to min_interval so it is
+    probed again soon. A check that costs more than its budget (seconds per
+    hour) is stretched until it fits. Every interval gets jitter so a fleet
+    does not probe in lockstep.
+    """
+
+    def __init__(self, schedules, path=None, clock=time.time, rng=None):
+        self.schedules = schedules
+        self.path = path or state_dir() / "schedule.json"
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.overrides = {}
+        self.checks = {}  # name -> {"interval", "next_due", "stable", "cost"}
+        try:
+            saved = json.loads(self.path.read_text())
+            self.overrides = saved.get("overrides", {})
+            self.checks = saved.get("checks", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def policy(self, check):
+        return policy_for(check, self.schedules, self.overrides)
+
+    def _jittered(self, interval, policy):
+        jitter = policy["jitter"] or 0
+        return interval * (1 + self.rng.uniform(-jitter, jitter))
+
+    def _effective(self, interval, cost, policy):
+        interval = max(policy["min_interval"], min(policy["max_interval"], interval))
+        if policy["budget"] and cost:
+            interval = max(interval, cost * 3600 / policy["budget"])
+        return interval
+
+    def due(self, now=None):
+        """Checks whose next run time has passed (or that were never run)."""
+        now = self.clock() if now is None else now
+        return {name for name in self.schedules
+                if self.checks.get(name, {}).get("next_due", 0) <= now}
+
+    def next_due_in(self, now=None):
+        now = self.clock() if now is None else now
+        times = [self.checks.get(name, {}).get("next_due", 0) for name in self.schedules]
+        return max(0.0, min(times) - now) if times else None
+
+    def record(self, previous, current, timings=None, now=None):
+        """
+        Update each check that ran in `current` (a report's checks) against
+        its `previous` result and schedule its next run.
+        """
+        now = self.clock() if now is None else now
+        timings = (timings or {}).get("checks", {})
+        for name, doc in current.items():
+            policy = self.policy(name)
+            state = self.checks.setdefault(name, {"interval": policy["interval"], "stable": 0, "cost": 0.0})
+            ms = (timings.get(name) or {}).get("ms")
+            if ms is not None:
+                state["cost"] = round(ms / 1000 if not state["cost"] else 0.7 * state["cost"] + 0.3 * ms / 1000, 4)
+
+            if isinstance(doc, dict) and doc.get("timed_out"):
+                interval = state["interval"]  # no verdict; neither back off nor hurry
+            elif name in previous and strip_volatile(previous[name]) != strip_volatile(doc):
+                state["stable"] = 0
+                interval = policy["min_interval"]
+            elif name in previous:
+                state["stable"] += 1
+                interval = state["interval"] * BACKOFF_FACTOR
+            else:
+                interval = policy["interval"]
+            state["interval"] = round(self._effective(interval, state["cost"], policy), 1)
+            state["next_due"] = now + self._jittered(state["interval"], policy)
+        self.save()
+
+    def apply_overrides(self, overrides):
+        """
+        Take the backend's per-check overrides ({check: {key: value}}); {}
+        clears them and None (an older backend) leaves them as they are.
+        An interval override takes effect at once; a shorter max_interval
+        also pulls in a run scheduled beyond it.
+        """
+        if not isinstance(overrides, dict) or overrides == self.overrides:
+            return False
+        self.overrides = {c: o for c, o in overrides.items() if isinstance(o, dict)}
+        now = self.clock()
+        for name, state in self.checks.items():
+            policy = self.policy(name)
+            if name in self.overrides and "interval" in self.overrides[name]:
+                state["interval"] = policy["interval"]
+            state["interval"] = self._effective(state["interval"], state.get("cost", 0), policy)
+            state["next_due"] = min(state.get("next_due", 0), now + state["interval"])
+        self.save()
+        return True
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"overrides": self.overrides, "checks": self.checks}))
+        os.replace(tmp, self.path)
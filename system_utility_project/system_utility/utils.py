@@ -1,19 +1,78 @@
+import contextlib
+import contextvars
+import os
 import subprocess
 import re
+import time
 
-def run_cmd(cmd):
-    """Run a system command and return (stdout, stderr, exitcode)."""
+from system_utility import instrument
+
+# The command runner for the current context, a callable (cmd, timeout) ->
+# (stdout, stderr, exitcode); None runs commands for real. use_runner()
+# installs one, e.g. system_utility.replay.ReplayRunner to drive the checks
+# of any platform from recorded output.
+_runner = contextvars.ContextVar("command_runner", default=None)
+# time.monotonic() by which the check running in this context must finish;
+# run_cmd never lets a command outlive it.
+_deadline = contextvars.ContextVar("check_deadline", default=None)
+
+@contextlib.contextmanager
+def use_runner(runner):
+    """Send every run_cmd in this context (and the check threads it starts) to `runner`."""
+    token = _runner.set(runner)
+    try:
+        yield runner
+    finally:
+        _runner.reset(token)
+
+def with_deadline(deadline, fn, *args):
+    """Call fn(*args) with every run_cmd inside it bounded by `deadline` (time.monotonic())."""
+    token = _deadline.set(deadline)
+    try:
+        return fn(*args)
+    finally:
+        _deadline.reset(token)
+
+def _subprocess(cmd, timeout=None):
     try:
         result = subprocess.run(
             cmd,
             capture_output=True,
             text=True,
-            check=False
+            check=False,
+            timeout=timeout
         )
         return result.stdout.strip(), result.stderr.strip(), result.returncode
+    except subprocess.TimeoutExpired:
+        return "", f"timed out after {timeout}s", 124
     except Exception as e:
         return "", str(e), 1
 
+def run_cmd(cmd, timeout=None):
+    """
+    Run a system command and return (stdout, stderr, exitcode); exit code
+    124 means it timed out. Inside a check the command is also killed at
+    the check's deadline, and not started once that has passed.
+    """
+    deadline = _deadline.get()
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            instrument.record_command(cmd, 0.0, 124, True, 0)
+            return "", "check deadline passed", 124
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    started = time.perf_counter()
+    out, err, rc = (_runner.get() or _subprocess)(cmd, timeout)
+    instrument.record_command(cmd, time.perf_counter() - started, rc, rc == 124, len(out))
+    return out, err, rc
+
 def parse_first_int_from_line(line):
     m = re.search(r"(\d+)", line)
     return int(m.group(1)) if m else None
+
+def state_dir():
+    """Directory for the agent's on-disk state (caches, spool, last report)."""
+    from pathlib import Path
+    path = Path(os.environ.get("SYSTEM_UTILITY_STATE_DIR", Path.home() / ".system_utility"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
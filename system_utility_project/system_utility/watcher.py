@@ -0,0 +1,126 @@
+"""inotify-based change watcher used by the daemon on Linux."""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Events that arrive within this window of the first one are reported together,
+# so a package transaction touching many files triggers a single re-run.
+DEBOUNCE_SECONDS = 2.0
+
+def _libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+class Watcher:
+    """
+    Watch the input files of each check and report which checks saw changes.
+
+    `watches` maps a check name to the paths it depends on. Directories are
+    watched directly; files are watched through their parent directory and
+    matched by name, so editors and package managers that replace files by
+    rename are still seen. Paths that do not exist are skipped.
+    """
+
+    def __init__(self, watches):
+        self._libc = _libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # wd -> list of (check name, file name or None for the whole directory)
+        self._targets = {}
+        for check, paths in watches.items():
+            for path in paths:
+                self._add(check, Path(os.path.expanduser(str(path))))
+
+    def _add(self, check, path):
+        if path.is_dir():
+            directory, name = path, None
+        elif path.parent.is_dir():
+            directory, name = path.parent, path.name
+        else:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            return
+        self._targets.setdefault(wd, []).append((check, name))
+
+    @property
+    def active(self):
+        return bool(self._targets)
+
+    def _drain(self):
+        changed = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return changed
+                raise
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(buf):
+                wd, _, _, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                for check, wanted in self._targets.get(wd, []):
+                    if wanted is None or wanted == name:
+                        changed.add(check)
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds; return the set of checks whose inputs changed."""
+        deadline = time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return changed
+            changed |= self._drain()
+        settle = time.monotonic() + DEBOUNCE_SECONDS
+        while (remaining := settle - time.monotonic()) > 0:
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if ready:
+                changed |= self._drain()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def create(watches):
+    """Return a Watcher, or None when inotify is unavailable or nothing could be watched."""
+    try:
+        watcher = Watcher(watches)
+    except (OSError, AttributeError):
+        return None
+    if not watcher.active:
+        watcher.close()
+        return None
+    return watcher